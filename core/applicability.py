@@ -0,0 +1,34 @@
+"""
+Which policies apply to a user: the policies assigned to the user's
+department, each with its ACTIVE template. The per-department lists live in
+``dept_policy_cache``, which signals invalidate when assignments change or a
+template is activated, so resolving any number of users costs a query for
+their departments and one pass over the cached lists.
+"""
+from .cache import dept_policy_cache
+from .models import User
+from .services import chunked
+
+RESOLVE_BATCH_SIZE = 5000
+
+
+def effective_policies(users):
+    """
+    {user_id: [effective policy, ...]} for (user_id, dept_id) pairs. The
+    lists are shared with the cache and must not be modified.
+    """
+    users = list(users)
+    by_dept = dept_policy_cache.get_many({dept_id for _, dept_id in users})
+    return {user_id: by_dept.get(dept_id, []) for user_id, dept_id in users}
+
+
+def resolve_effective_policies(user_ids, org_id=None, batch_size=RESOLVE_BATCH_SIZE):
+    """
+    Effective policies of the users with the given ids, restricted to an org
+    when ``org_id`` is set; ids that match no user are left out
+    """
+    users = User.objects.all() if org_id is None else User.objects.filter(org_id=org_id)
+    pairs = []
+    for batch in chunked(user_ids, batch_size):
+        pairs.extend(users.filter(id__in=batch).values_list('id', 'dept_id'))
+    return effective_policies(pairs)
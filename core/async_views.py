@@ -0,0 +1,192 @@
+"""
+Async read endpoints for the hot polling paths, served under /api/v1/async/.
+
+They answer the same questions as the DRF routes without holding a worker
+thread per request while the database works, using the async ORM when the
+project runs under ASGI. Results are read as values() rows and paged with
+an opaque keyset cursor in the same ordering as the sync routes.
+"""
+import base64
+import functools
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .cache import active_template_cache
+from .models import Policy, PolicyAcknowledgment
+from .tenancy import arequest_org_id
+
+POLICY_FIELDS = ('id', 'name', 'org_id', 'description', 'compliance_framework', 'enforcement_type')
+PENDING_ACKNOWLEDGMENT_FIELDS = (
+    'id', 'policy_id', 'policy__name', 'policy_template_id', 'policy_template__version',
+    'requested_at', 'due_at', 'is_recurring'
+)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def cursor_value(value):
+    # Full precision: DjangoJSONEncoder would truncate datetimes to milliseconds
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps([cursor_value(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise BadRequest('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise BadRequest('Invalid cursor')
+    return values
+
+
+def after_cursor(ordering, values):
+    """
+    Rows strictly after ``values`` in ``ordering`` (all ascending), as a
+    predicate the ordering's composite index can seek on
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        step = Q(**{f'{field}__gt': values[i]}, **dict(zip(ordering[:i], values[:i])))
+        condition |= step
+    return condition
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+    except ValueError:
+        raise BadRequest('page_size must be an integer')
+    if size < 1:
+        raise BadRequest('page_size must be positive')
+    return min(size, settings.API_MAX_PAGE_SIZE)
+
+
+async def keyset_page(request, queryset, ordering):
+    """
+    One page of ``queryset`` rows as {'next': url or None, 'results': [...]}
+    """
+    size = page_size(request)
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get('cursor')
+    try:
+        if cursor:
+            queryset = queryset.filter(after_cursor(ordering, decode_cursor(cursor, ordering)))
+        rows = [row async for row in queryset[:size + 1].aiterator()]
+    except (DjangoValidationError, ValueError):
+        raise BadRequest('Invalid cursor')
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        params = request.GET.copy()
+        params['cursor'] = encode_cursor([rows[-1][field] for field in ordering])
+        next_url = request.build_absolute_uri(f'{request.path}?{urlencode(params)}')
+    return {'next': next_url, 'results': rows}
+
+
+def org_required(view):
+    """
+    Refuse requests without an org, like the DRF routes refuse anonymous ones
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await arequest_org_id(request) is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def bad_request_response(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return wrapper
+
+
+@require_GET
+@org_required
+@bad_request_response
+async def policy_list(request):
+    """
+    Policies with their ACTIVE template, in the shape of GET /api/v1/policy/
+    """
+    policies = Policy.objects.for_org(await arequest_org_id(request)).values(*POLICY_FIELDS)
+    page = await keyset_page(request, policies, ('id',))
+    templates = await sync_to_async(active_template_cache.get_many)(
+        [row['id'] for row in page['results']]
+    )
+    page['results'] = [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'org': row['org_id'],
+            'description': row['description'],
+            'compliance_framework': row['compliance_framework'],
+            'enforcement_type': row['enforcement_type'],
+            'active_template': templates.get(row['id']),
+        }
+        for row in page['results']
+    ]
+    return JsonResponse(page)
+
+
+@require_GET
+@org_required
+async def active_template(request, policy_id):
+    """
+    The serialized ACTIVE template of one policy, straight from the cache
+    """
+    if not await Policy.objects.for_org(await arequest_org_id(request)).filter(id=policy_id).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    templates = await sync_to_async(active_template_cache.get_many)([policy_id])
+    if policy_id not in templates:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if templates[policy_id] is None:
+        return JsonResponse({'error': 'No active policy template found for this policy'}, status=404)
+    return JsonResponse(templates[policy_id])
+
+
+@require_GET
+@org_required
+@bad_request_response
+async def pending_acknowledgments(request, user_id):
+    """
+    A user's open acknowledgment requests, oldest first
+    """
+    acknowledgments = PolicyAcknowledgment.objects.for_org(await arequest_org_id(request)).filter(
+        user_id=user_id,
+        is_acknowledged=False,
+        expired_at__isnull=True
+    ).values(*PENDING_ACKNOWLEDGMENT_FIELDS)
+    page = await keyset_page(request, acknowledgments, ('requested_at', 'id'))
+    page['results'] = [
+        {
+            'id': row['id'],
+            'policy': row['policy_id'],
+            'policy_name': row['policy__name'],
+            'policy_template': row['policy_template_id'],
+            'template_version': row['policy_template__version'],
+            'requested_at': row['requested_at'],
+            'due_at': row['due_at'],
+            'is_recurring': row['is_recurring'],
+        }
+        for row in page['results']
+    ]
+    return JsonResponse(page)
@@ -0,0 +1,348 @@
+import io
+import json
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import prefetch_related_objects
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from .cache import active_template_cache
+from .fastserialization import RowSerializer, render_json
+from .models import (Dept,
+                     DeptPolicy,
+                     Policy,
+                     PolicyAcknowledgment,
+                     PolicyAcknowledgmentStep,
+                     PolicyStep,
+                     PolicyTemplate,
+                     TemplateStatus,
+                     User)
+from .serializers import DeptPolicySerializer, PolicyAcknowledgmentSerializer, PolicyTemplateReadSerializer
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list, or None when empty
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies):
+    """
+    p50/p95/p99/mean in milliseconds of latencies given in seconds
+    """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None}
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+    }
+
+
+@contextmanager
+def seeded_database(dataset):
+    """
+    Run the block against a throwaway test database seeded by seed_data
+    with the ``dataset`` options
+    """
+    old_name = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        call_command('seed_data', stdout=io.StringIO(), **dataset)
+        active_template_cache.clear()
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+# Acknowledgments per request of the bulk-acknowledge scenario
+BULK_ACKNOWLEDGE_ITEMS = 100
+
+
+class ApiBenchmark:
+    """
+    Times each endpoint scenario in process with the Django test client.
+
+    Every scenario has a setup step, run untimed before each request, that
+    returns the (path, payload) to send and creates whatever the request
+    consumes, e.g. a fresh DRAFT template to activate, so iterations are
+    independent and repeatable. Only the request itself is timed; its
+    queries are counted with CaptureQueriesContext.
+    """
+
+    scenarios = [
+        ('policy-list', 'get', 200),
+        ('policy-retrieve', 'get', 200),
+        ('policytemplate-list', 'get', 200),
+        ('policytemplate-create', 'post', 201),
+        ('policytemplate-activate', 'post', 200),
+        ('policyacknowledgment-create', 'post', 201),
+        ('policyacknowledgment-acknowledge', 'put', 200),
+        ('policyacknowledgment-bulk-acknowledge', 'post', 200),
+        ('deptpolicy-list', 'get', 200),
+        ('deptpolicy-create', 'post', 201),
+    ]
+
+    def __init__(self, client):
+        self.client = client
+        self.created_users = 0
+        self.policy_ids = list(
+            Policy.objects.filter(
+                policytemplate__status=TemplateStatus.ACTIVE
+            ).order_by('id').values_list('id', flat=True)
+        )
+        self.user = User.objects.order_by('id').first()
+        self.dept_id = Dept.objects.order_by('id').values_list('id', flat=True).first()
+        if not self.policy_ids or self.user is None or self.dept_id is None:
+            raise ValueError('The dataset needs at least one user, one dept and one policy with an ACTIVE template')
+
+    def policy_id(self, i):
+        return self.policy_ids[i % len(self.policy_ids)]
+
+    def setup_policy_list(self, i):
+        return '/api/v1/policy/', None
+
+    def setup_policy_retrieve(self, i):
+        return f'/api/v1/policy/{self.policy_id(i)}/', None
+
+    def setup_policytemplate_list(self, i):
+        return '/api/v1/policytemplate/', None
+
+    def setup_policytemplate_create(self, i):
+        return '/api/v1/policytemplate/', {
+            'policy_id': str(self.policy_id(i)),
+            'version': f'90.{i}.0',
+            'steps': [
+                {
+                    'name': f'Benchmark step {s}',
+                    'description': 'step',
+                    'fields': [
+                        {'field_name': f'Field {f}', 'field_key': f'field_{f}', 'field_value_type': 'STRING'}
+                        for f in range(2)
+                    ],
+                }
+                for s in range(3)
+            ],
+        }
+
+    def setup_policytemplate_activate(self, i):
+        template = PolicyTemplate.objects.create(policy_id=self.policy_id(i), version=f'91.{i}.0')
+        PolicyStep.objects.create(policy_template=template, name='Benchmark step', description='step')
+        return f'/api/v1/policytemplate/{template.id}/activate/', {
+            'approved_by': str(self.user.id),
+            'migration': 'keep',
+        }
+
+    def new_user(self):
+        self.created_users += 1
+        return User.objects.create(
+            username=f'benchmark-{self.created_users}',
+            email=f'benchmark-{self.created_users}@example.com',
+            org_id=self.user.org_id,
+            dept_id=self.dept_id
+        )
+
+    def setup_policyacknowledgment_create(self, i):
+        return '/api/v1/policy-acknowledgments/', {
+            'policy_id': str(self.policy_id(i)),
+            'user': str(self.new_user().id),
+        }
+
+    def setup_policyacknowledgment_acknowledge(self, i):
+        response = self.client.post('/api/v1/policy-acknowledgments/', {
+            'policy_id': str(self.policy_id(i)),
+            'user': str(self.new_user().id),
+        }, content_type='application/json')
+        acknowledgment_id = response.json()['id']
+        PolicyAcknowledgmentStep.objects.filter(
+            policy_acknowledgment_id=acknowledgment_id
+        ).update(is_acknowledged=True)
+        return f'/api/v1/policy-acknowledgments/{acknowledgment_id}/acknowledge/', None
+
+    def setup_policyacknowledgment_bulk_acknowledge(self, i):
+        policy_id = self.policy_id(i)
+        template_id, org_id = PolicyTemplate.objects.filter(
+            policy_id=policy_id, status=TemplateStatus.ACTIVE
+        ).values_list('id', 'policy__org_id').get()
+        users = User.objects.bulk_create([
+            User(
+                username=f'benchmark-bulk-{i}-{n}',
+                email=f'benchmark-bulk-{i}-{n}@example.com',
+                org_id=org_id,
+                dept_id=self.dept_id
+            )
+            for n in range(BULK_ACKNOWLEDGE_ITEMS)
+        ])
+        acknowledgments = PolicyAcknowledgment.objects.bulk_create([
+            PolicyAcknowledgment(
+                policy_template_id=template_id,
+                policy_id=policy_id,
+                org_id=org_id,
+                user_id=user.id
+            )
+            for user in users
+        ])
+        return '/api/v1/policy-acknowledgments/bulk-acknowledge/', {
+            'items': [str(acknowledgment.id) for acknowledgment in acknowledgments],
+        }
+
+    def setup_deptpolicy_list(self, i):
+        return '/api/v1/dept-policies/', None
+
+    def setup_deptpolicy_create(self, i):
+        policy_id = self.policy_id(i)
+        dept = Dept.objects.create(
+            name=f'Benchmark dept {i}',
+            org_id=Policy.objects.values_list('org_id', flat=True).get(id=policy_id)
+        )
+        return '/api/v1/dept-policies/', {'dept_id': str(dept.id), 'policy_id': str(policy_id)}
+
+    def run(self, names=None, iterations=50, warmup=5):
+        """
+        {scenario: result} for the named scenarios (default: all). Raises
+        RuntimeError when a request returns an unexpected status.
+        """
+        return {
+            name: self.run_scenario(name, method, expected_status, iterations, warmup)
+            for name, method, expected_status in self.scenarios
+            if names is None or name in names
+        }
+
+    def run_scenario(self, name, method, expected_status, iterations, warmup):
+        setup = getattr(self, f"setup_{name.replace('-', '_')}")
+        send = getattr(self.client, method)
+        latencies = []
+        queries = []
+        for i in range(warmup + iterations):
+            path, payload = setup(i)
+            kwargs = {'data': json.dumps(payload), 'content_type': 'application/json'} if payload else {}
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = send(path, **kwargs)
+                elapsed = time.perf_counter() - started
+            if response.status_code != expected_status:
+                raise RuntimeError(
+                    f'{name}: {method.upper()} {path} returned {response.status_code}: '
+                    f'{response.content[:500]!r}'
+                )
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries.append(len(captured.captured_queries))
+        return {
+            'iterations': iterations,
+            **latency_summary(latencies),
+            'throughput_rps': round(len(latencies) / sum(latencies), 1) if latencies else None,
+            'queries': max(queries) if queries else None,
+            'queries_min': min(queries) if queries else None,
+        }
+
+
+def compare_to_baseline(results, baseline, threshold=0.2):
+    """
+    Regressions of ``results`` against ``baseline`` (both {scenario: result}).
+    A scenario regresses when it runs more queries than in the baseline, or
+    when its p95 latency exceeds the baseline's by more than ``threshold``.
+    Scenarios missing from either side are skipped.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if reference.get('queries') is not None and result['queries'] > reference['queries']:
+            regressions.append(
+                f"{name}: {result['queries']} queries, baseline {reference['queries']}"
+            )
+        if reference.get('p95_ms') and result['p95_ms'] > reference['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']} ms, baseline {reference['p95_ms']} ms "
+                f"(+{(result['p95_ms'] / reference['p95_ms'] - 1) * 100:.0f}%, threshold {threshold * 100:.0f}%)"
+            )
+    return regressions
+
+
+class SerializationBenchmark:
+    """
+    Rows per second turned from a queryset into response JSON by the DRF
+    serializer and JSONRenderer ("drf") and by the compiled RowSerializer and
+    render_json ("fast"), over the same rows. Both run their own queries,
+    since skipping model instances is part of the saving; the outputs are
+    compared byte for byte before anything is timed.
+    """
+
+    cases = ['policyacknowledgment', 'policytemplate', 'deptpolicy']
+
+    def __init__(self, rows=1000):
+        self.rows = rows
+
+    def queryset_policyacknowledgment(self):
+        return PolicyAcknowledgment.objects.order_by('requested_at', 'id'), PolicyAcknowledgmentSerializer
+
+    def queryset_policytemplate(self):
+        return PolicyTemplate.objects.order_by('id'), PolicyTemplateReadSerializer
+
+    def queryset_deptpolicy(self):
+        return DeptPolicy.objects.order_by('id'), DeptPolicySerializer
+
+    def drf(self, queryset, serializer_class):
+        instances = list(queryset.select_related(*self.select_related(serializer_class)))
+        if serializer_class is PolicyTemplateReadSerializer:
+            prefetch_related_objects(instances, 'policystep_set', 'policystep_set__policystepfield_set')
+        return JSONRenderer().render(serializer_class(instances, many=True).data)
+
+    def fast(self, queryset, row_serializer):
+        data = row_serializer.serialize(list(queryset.values(*row_serializer.lookups)))
+        if row_serializer.serializer_class is DeptPolicySerializer:
+            templates = active_template_cache.get_many([row['policy']['id'] for row in data])
+            templates = {str(policy_id): template for policy_id, template in templates.items()}
+            for row in data:
+                row['policy']['active_template'] = templates.get(row['policy']['id'])
+        return render_json(data)
+
+    def select_related(self, serializer_class):
+        return ('dept', 'policy') if serializer_class is DeptPolicySerializer else ()
+
+    def run(self, names=None, iterations=20):
+        """
+        {case: {'rows': n, 'drf_rows_per_s': ..., 'fast_rows_per_s': ..., 'speedup': ...}}.
+        Raises RuntimeError when the two paths disagree.
+        """
+        results = {}
+        for name in self.cases:
+            if names is not None and name not in names:
+                continue
+            queryset, serializer_class = getattr(self, f'queryset_{name}')()
+            queryset = queryset[:self.rows]
+            row_serializer = RowSerializer(serializer_class)
+            expected = self.drf(queryset, serializer_class)
+            if self.fast(queryset, row_serializer) != expected:
+                raise RuntimeError(f'{name}: the fast path output differs from the DRF serializer')
+            rows = queryset.count()
+            timings = {}
+            for label, serialize, argument in (
+                ('drf', self.drf, serializer_class),
+                ('fast', self.fast, row_serializer),
+            ):
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    serialize(queryset, argument)
+                elapsed = time.perf_counter() - started
+                timings[label] = rows * iterations / elapsed if elapsed else None
+            results[name] = {
+                'rows': rows,
+                'drf_rows_per_s': round(timings['drf']),
+                'fast_rows_per_s': round(timings['fast']),
+                'speedup': round(timings['fast'] / timings['drf'], 2),
+            }
+        return results
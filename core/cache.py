@@ -0,0 +1,255 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+LOCK_STRIPES = 64
+
+
+class LRUBackend:
+    """
+    Process-local LRU store with a size limit and per-entry timeout. Entries
+    are not shared between processes, so invalidation only reaches the
+    process that performs it; the timeout bounds staleness elsewhere.
+    """
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires is not None and expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, expire=True):
+        expires = time.monotonic() + self.timeout if self.timeout and expire else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Store entries in one of the configured Django caches, shared between processes
+    """
+
+    def __init__(self, alias='default', timeout=300):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get_many(self, keys):
+        return self.cache.get_many(list(keys))
+
+    def set_many(self, mapping, expire=True):
+        self.cache.set_many(mapping, timeout=self.timeout if expire else None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class GenerationalCache:
+    """
+    Read-through cache of one value per UUID key, e.g. the serialized ACTIVE
+    template of each policy.
+
+    Entries are keyed by id and a per-id generation; invalidation writes a
+    new generation, so a load that raced with an activation can only ever
+    populate a key that is no longer read. Concurrent misses for the same id
+    in one process wait on a striped lock and load once.
+    """
+
+    def __init__(self, backend, loader, prefix):
+        self.backend = backend
+        self.loader = loader
+        self.prefix = prefix
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation_key(self, key_id):
+        return f'{self.prefix}:{key_id}:generation'
+
+    def data_keys(self, ids, versions):
+        unversioned = [i for i in ids if i not in versions]
+        generations = self.backend.get_many([self.generation_key(i) for i in unversioned]) if unversioned else {}
+        return {
+            key_id: (
+                f'{self.prefix}:{key_id}:v{versions[key_id]}' if key_id in versions
+                else f'{self.prefix}:{key_id}:{generations.get(self.generation_key(key_id), 0)}'
+            )
+            for key_id in ids
+        }
+
+    def get(self, key_id, default=None, version=None):
+        versions = {key_id: version} if version is not None else None
+        return self.get_many([key_id], versions).get(uuid.UUID(str(key_id)), default)
+
+    def get_many(self, ids, versions=None):
+        """
+        Map each id the loader knows to its value, e.g. each existing policy
+        to its serialized ACTIVE template or None; unknown ids are left out.
+        Raises ValueError for ids that are not UUIDs.
+
+        ``versions`` maps ids to a version the caller read from the database,
+        e.g. Policy.revision; their entries are keyed on it rather than on the
+        generation, so a per-process entry older than that version is never
+        served.
+        """
+        ids = list(dict.fromkeys(uuid.UUID(str(i)) for i in ids))
+        versions = {uuid.UUID(str(i)): version for i, version in (versions or {}).items()}
+        keys = self.data_keys(ids, versions)
+        found = self.backend.get_many(keys.values())
+        result = {i: found[keys[i]]['value'] for i in ids if keys[i] in found}
+        missing = [i for i in ids if keys[i] not in found]
+        self.count(hits=len(result))
+        if missing:
+            result.update(self.load(missing, keys))
+        return result
+
+    def load(self, ids, keys):
+        locks = sorted(
+            {id(lock): lock for lock in (self.lock_for(i) for i in ids)}.values(),
+            key=id
+        )
+        for lock in locks:
+            lock.acquire()
+        try:
+            # Another thread may have loaded some of them while we waited
+            found = self.backend.get_many([keys[i] for i in ids])
+            result = {i: found[keys[i]]['value'] for i in ids if keys[i] in found}
+            missing = [i for i in ids if keys[i] not in found]
+            self.count(hits=len(result), misses=len(missing))
+            if missing:
+                loaded = self.loader(missing)
+                self.backend.set_many({
+                    keys[i]: {'value': payload} for i, payload in loaded.items()
+                })
+                result.update(loaded)
+            return result
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def lock_for(self, key_id):
+        return self._locks[hash(str(key_id)) % LOCK_STRIPES]
+
+    def invalidate(self, key_id):
+        self.invalidate_many([key_id])
+
+    def invalidate_many(self, ids):
+        # Generations never time out, or an expired one could resurrect generation 0
+        generation = time.time_ns()
+        self.backend.set_many({self.generation_key(i): generation for i in ids}, expire=False)
+        self.count(invalidations=len(ids))
+
+    def count(self, hits=0, misses=0, invalidations=0):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+            self.invalidations += invalidations
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else None,
+            }
+
+    def clear(self):
+        self.backend.clear()
+        with self._stats_lock:
+            self.hits = self.misses = self.invalidations = 0
+
+
+def load_active_templates(policy_ids):
+    """
+    Serialize the ACTIVE template of each existing policy in a constant number of queries
+    """
+    from .models import Policy
+    from .serializers import PolicyTemplateReadSerializer
+
+    policies = Policy.objects.filter(id__in=policy_ids).only('id').with_active_template()
+    return {
+        policy.id: (
+            dict(PolicyTemplateReadSerializer(policy.active_templates[0]).data)
+            if policy.active_templates else None
+        )
+        for policy in policies
+    }
+
+
+def load_dept_policies(dept_ids):
+    """
+    The policies assigned to each department with their ACTIVE template, in
+    two queries; departments without policies map to an empty list
+    """
+    from .models import DeptPolicy, PolicyTemplate, TemplateStatus
+
+    assignments = list(
+        DeptPolicy.objects.filter(dept_id__in=dept_ids).order_by('policy__name', 'policy_id').values_list(
+            'dept_id', 'policy_id', 'policy__name', 'policy__enforcement_type'
+        )
+    )
+    active_templates = {
+        policy_id: (template_id, version)
+        for policy_id, template_id, version in PolicyTemplate.objects.filter(
+            policy_id__in={policy_id for _, policy_id, _, _ in assignments},
+            status=TemplateStatus.ACTIVE
+        ).values_list('policy_id', 'id', 'version')
+    }
+    result = {dept_id: [] for dept_id in dept_ids}
+    for dept_id, policy_id, policy_name, enforcement_type in assignments:
+        template_id, version = active_templates.get(policy_id, (None, None))
+        result[dept_id].append({
+            'policy': str(policy_id),
+            'policy_name': policy_name,
+            'enforcement_type': enforcement_type,
+            'policy_template': str(template_id) if template_id else None,
+            'template_version': version,
+        })
+    return result
+
+
+def build_cache(setting, loader, prefix):
+    options = getattr(settings, setting, {})
+    timeout = options.get('TIMEOUT', 300)
+    if options.get('BACKEND', 'lru') == 'django':
+        backend = DjangoCacheBackend(options.get('CACHE_ALIAS', 'default'), timeout)
+    else:
+        backend = LRUBackend(options.get('MAX_ENTRIES', 1024), timeout)
+    return GenerationalCache(backend, loader, prefix)
+
+
+active_template_cache = build_cache('ACTIVE_TEMPLATE_CACHE', load_active_templates, 'active-template')
+# Department id -> effective policies, for core.applicability
+dept_policy_cache = build_cache('DEPT_POLICY_CACHE', load_dept_policies, 'dept-policies')
@@ -0,0 +1,114 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ComplianceSummary, PolicyAcknowledgment
+
+SUMMARY_COUNTERS = ('requested_count', 'acknowledged_count', 'expired_count')
+
+
+def summary_keys(acknowledgments):
+    """
+    (org_id, dept_id, policy_id, policy_template_id) of each acknowledgment in the queryset
+    """
+    return acknowledgments.values_list(
+        'org_id',
+        'user__dept_id',
+        'policy_id',
+        'policy_template_id'
+    )
+
+
+def summary_counts(acknowledgments):
+    """
+    (key, count) pairs for the queryset, grouped in SQL rather than in Python
+    """
+    rows = acknowledgments.values_list(
+        'org_id',
+        'user__dept_id',
+        'policy_id',
+        'policy_template_id'
+    ).annotate(total=Count('id')).order_by()
+    return [(row[:4], row[4]) for row in rows]
+
+
+def increment_summary(field, keys, amount=1):
+    """
+    Add ``amount`` to ``field`` of the summary row for every key, creating
+    rows as needed. Keys are grouped first so each distinct summary row costs
+    a single UPDATE. Call inside the transaction that changes the acknowledgments.
+    """
+    increment_summary_counts(field, Counter(keys).items(), amount)
+
+
+def increment_summary_counts(field, counts, amount=1):
+    """
+    Like increment_summary, for keys that are already grouped into (key, count) pairs
+    """
+    assert field in SUMMARY_COUNTERS, f'Unknown counter {field}'
+    now = timezone.now()
+    for (org_id, dept_id, policy_id, policy_template_id), count in counts:
+        key = {
+            'org_id': org_id,
+            'dept_id': dept_id,
+            'policy_id': policy_id,
+            'policy_template_id': policy_template_id,
+        }
+        # Clamped like the create below, so a drifted row cannot fail the write
+        delta = {field: Greatest(F(field) + count * amount, 0), 'updated_at': now}
+        if ComplianceSummary.objects.filter(**key).update(**delta):
+            continue
+        try:
+            with transaction.atomic():
+                ComplianceSummary.objects.create(**key, **{field: max(count * amount, 0)})
+        except IntegrityError:
+            # Created concurrently by another transaction
+            ComplianceSummary.objects.filter(**key).update(**delta)
+
+
+def rebuild_compliance_summary(org_id=None):
+    """
+    Recompute the summary from PolicyAcknowledgment, for one org or all of them.
+    Returns the number of summary rows written.
+    """
+    # Expired requests and acknowledgments since renewed are no longer current
+    current = Q(expired_at__isnull=True)
+    acknowledgments = PolicyAcknowledgment.objects.all()
+    summaries = ComplianceSummary.objects.all()
+    if org_id:
+        acknowledgments = acknowledgments.filter(org_id=org_id)
+        summaries = summaries.filter(org_id=org_id)
+
+    now = timezone.now()
+    rows = acknowledgments.values(
+        'org_id',
+        'user__dept_id',
+        'policy_id',
+        'policy_template_id'
+    ).annotate(
+        requested=Count('id', filter=current),
+        acknowledged=Count('id', filter=current & Q(is_acknowledged=True)),
+        expired=Count('id', filter=Q(is_acknowledged=False, expired_at__lte=now))
+    ).order_by()
+
+    with transaction.atomic():
+        summaries.delete()
+        created = ComplianceSummary.objects.bulk_create(
+            (
+                ComplianceSummary(
+                    org_id=row['org_id'],
+                    dept_id=row['user__dept_id'],
+                    policy_id=row['policy_id'],
+                    policy_template_id=row['policy_template_id'],
+                    requested_count=row['requested'],
+                    acknowledged_count=row['acknowledged'],
+                    expired_count=row['expired']
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000
+        )
+    return len(created)
@@ -0,0 +1,56 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# Postgres serialization_failure and deadlock_detected
+RETRYABLE_PGCODES = {'40001', '40P01'}
+# SQLite reports lock contention as an OperationalError with one of these messages
+RETRYABLE_SQLITE_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_retryable(error):
+    cause = error.__cause__
+    if getattr(cause, 'pgcode', None) in RETRYABLE_PGCODES:
+        return True
+    return any(message in str(error) for message in RETRYABLE_SQLITE_MESSAGES)
+
+
+def retry_on_conflict(func=None, attempts=None, base_delay=0.01):
+    """
+    Re-run a function that opens its own transaction when the database
+    aborts it for a serialization failure, a deadlock or lock contention,
+    backing off exponentially with jitter between attempts. Inside an outer
+    atomic block nothing is retried: the outer transaction is already
+    doomed and has to be retried as a whole by its owner.
+    """
+    if func is None:
+        return functools.partial(retry_on_conflict, attempts=attempts, base_delay=base_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tries = attempts or getattr(settings, 'TRANSACTION_RETRY_ATTEMPTS', 5)
+        for attempt in range(1, tries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == tries or connection.in_atomic_block or not is_retryable(e):
+                    raise
+                time.sleep(base_delay * 2 ** (attempt - 1) * (1 + random.random()))
+    return wrapper
+
+
+def lock_policy(queryset, policy_id):
+    """
+    Lock one policy row for the rest of the transaction and return it.
+    FOR NO KEY UPDATE where supported, so inserts referencing the policy
+    are not blocked; a no-op on backends without row locks such as SQLite,
+    which serialize writers anyway.
+    """
+    if connection.features.has_select_for_update:
+        queryset = queryset.select_for_update(
+            no_key=connection.features.has_select_for_no_key_update
+        )
+    return queryset.get(id=policy_id)
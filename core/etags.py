@@ -0,0 +1,75 @@
+import hashlib
+
+from django.db.models import CharField, Count, Max, Min
+from django.db.models.functions import Cast
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over version metadata plus everything else that shapes the body
+    """
+    digest = hashlib.sha1(repr((
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        parts
+    )).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def queryset_version(queryset):
+    """
+    (row count, latest updated_at) of a queryset, from a single aggregate query
+    """
+    version = queryset.order_by().aggregate(count=Count('id'), latest=Max('updated_at'))
+    return version['count'], version['latest']
+
+
+def page_version(queryset):
+    """
+    Like queryset_version for one page of a keyset-paginated queryset, in a
+    single aggregate query. The first and last ids catch rows shifting into
+    or out of the page when another row is added or deleted.
+    """
+    version = queryset.aggregate(
+        count=Count('id'),
+        latest=Max('updated_at'),
+        # As text: PostgreSQL has no MIN/MAX over uuid
+        first=Min(Cast('id', CharField())),
+        last=Max(Cast('id', CharField()))
+    )
+    return version['count'], version['latest'], version['first'], version['last']
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve with 304 Not Modified when If-None-Match matches
+    the ETag from get_list_etag / get_retrieve_etag, without serializing the body
+    """
+
+    def get_list_etag(self, request):
+        return None
+
+    def get_retrieve_etag(self, request):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_etag(request), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_retrieve_etag(request), super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, etag, handler, request, *args, **kwargs):
+        if etag and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = handler(request, *args, **kwargs)
+        if etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
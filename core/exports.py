@@ -0,0 +1,174 @@
+import csv
+import datetime
+import uuid
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import PolicyAcknowledgment
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_STATUSES = ('pending', 'acknowledged', 'expired')
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+# (output column, ORM lookup) pairs; one row per acknowledgment step field value
+EXPORT_COLUMNS = [
+    ('acknowledgment_id', 'id'),
+    ('org_id', 'org_id'),
+    ('policy_id', 'policy_id'),
+    ('policy_name', 'policy__name'),
+    ('template_version', 'policy_template__version'),
+    ('user_id', 'user_id'),
+    ('user_email', 'user__email'),
+    ('is_acknowledged', 'is_acknowledged'),
+    ('requested_at', 'requested_at'),
+    ('acknowledged_at', 'acknowledged_at'),
+    ('due_at', 'due_at'),
+    ('expired_at', 'expired_at'),
+    ('step_id', 'policyacknowledgmentstep__policy_step_id'),
+    ('step_name', 'policyacknowledgmentstep__policy_step__name'),
+    ('step_is_acknowledged', 'policyacknowledgmentstep__is_acknowledged'),
+    ('step_report_document', 'policyacknowledgmentstep__step_report_document'),
+    ('field_key', 'policyacknowledgmentstep__policystepfieldvalue__policy_step_field__field_key'),
+    ('field_value_type', 'policyacknowledgmentstep__policystepfieldvalue__policy_step_field__field_value_type'),
+    ('field_value', 'policyacknowledgmentstep__policystepfieldvalue__field_value'),
+]
+
+
+def parse_export_filters(params):
+    """
+    Validate export filters from query parameters or command options.
+    Raises ValueError naming the offending parameter.
+    """
+    filters = {'status': params.get('status')}
+    for name in ('org_id', 'policy_id'):
+        value = params.get(name)
+        try:
+            filters[name] = uuid.UUID(str(value)) if value else None
+        except ValueError:
+            raise ValueError(f'{name} must be a UUID')
+    if filters['status'] and filters['status'] not in EXPORT_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(EXPORT_STATUSES)}")
+    for name in ('requested_after', 'requested_before'):
+        value = params.get(name)
+        if not value:
+            filters[name] = None
+            continue
+        try:
+            parsed = parse_datetime(value) or parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+        if not isinstance(parsed, datetime.datetime):
+            parsed = datetime.datetime.combine(parsed, datetime.time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        filters[name] = parsed
+    return filters
+
+
+def export_queryset(org_id=None, policy_id=None, requested_after=None, requested_before=None, status=None):
+    """
+    Flat tuples of acknowledgments joined to their steps and field values.
+    Acknowledgments without steps or values still yield one row (LEFT JOIN).
+    """
+    queryset = PolicyAcknowledgment.objects.all()
+    if org_id:
+        queryset = queryset.filter(org_id=org_id)
+    if policy_id:
+        queryset = queryset.filter(policy_id=policy_id)
+    if requested_after:
+        queryset = queryset.filter(requested_at__gte=requested_after)
+    if requested_before:
+        queryset = queryset.filter(requested_at__lt=requested_before)
+    if status:
+        now = timezone.now()
+        if status == 'acknowledged':
+            queryset = queryset.filter(is_acknowledged=True)
+        elif status == 'expired':
+            queryset = queryset.filter(is_acknowledged=False, expired_at__lte=now)
+        else:
+            queryset = queryset.filter(
+                Q(expired_at__isnull=True) | Q(expired_at__gt=now),
+                is_acknowledged=False
+            )
+    return queryset.order_by().values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+
+
+class Echo:
+    """
+    File-like object whose write() returns the value, for streaming csv.writer output
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode_ndjson(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def encode_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        )
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_file_info(export_format='ndjson', compress=False):
+    """
+    (content type, file name) of an export in the given format
+    """
+    if compress:
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return content_type, f'acknowledgments.{export_format}' + ('.gz' if compress else '')
+
+
+def stream_export(queryset, export_format='ndjson', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Encoded byte chunks for the export; rows are read with a server-side
+    cursor where the backend supports it, so memory use stays constant.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    encode = encode_csv if export_format == 'csv' else encode_ndjson
+    chunks = buffered(line.encode('utf-8') for line in encode(rows))
+    return gzip_stream(chunks) if compress else chunks
+
+
+def buffered(chunks, size=EXPORT_BUFFER_BYTES):
+    """
+    Coalesce small per-row chunks into blocks of roughly ``size`` bytes
+    """
+    buffer = []
+    buffered_bytes = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_bytes += len(chunk)
+        if buffered_bytes >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered_bytes = 0
+    if buffer:
+        yield b''.join(buffer)
@@ -0,0 +1,251 @@
+"""
+Read-only fast path for the large list endpoints.
+
+A DRF ModelSerializer builds a model instance per row and walks a field
+object graph per value. ``RowSerializer`` compiles a serializer class once
+into a generated function turning one ``values()`` row into the dict the
+serializer would produce, with each field's encoder resolved ahead of time.
+Nested serializers become joined columns, nested lists one grouped query per
+level. ``FastJSONRenderer`` then dumps the result with orjson when it is
+installed and a reused stdlib encoder otherwise. Responses are byte-for-byte
+those of the DRF serializers and JSONRenderer; set
+``FAST_LIST_SERIALIZATION = False`` to go back to them.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DRF_DATETIME = serializers.DateTimeField()
+DRF_ENCODER = encoders.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, separators=(',', ':'), check_circular=False
+)
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+
+def fast_serialization_enabled():
+    return (
+        getattr(settings, 'FAST_LIST_SERIALIZATION', True)
+        and api_settings.DATETIME_FORMAT == ISO_8601
+    )
+
+
+def encode_uuid(value):
+    return None if value is None else str(value)
+
+
+def encode_datetime(value, tz):
+    """
+    DateTimeField.to_representation for aware datetimes, without the field
+    """
+    if value is None:
+        return None
+    if tz is None or not isinstance(value, datetime.datetime) or timezone.is_naive(value):
+        return DRF_DATETIME.to_representation(value)
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class NestedRows:
+    """
+    The rows of a reverse relation (``many=True`` nested serializer),
+    fetched for a whole page of parents with one query and grouped by parent
+    """
+
+    def __init__(self, model, related_field, serializer):
+        self.model = model
+        self.related_field = related_field
+        self.serializer = serializer
+
+    def fetch(self, parent_ids):
+        if not parent_ids:
+            return {}
+        rows = list(
+            self.model.objects.filter(**{f'{self.related_field.name}__in': parent_ids}).values(
+                *dict.fromkeys((*self.serializer.lookups, self.related_field.name))
+            )
+        )
+        grouped = {}
+        for row, data in zip(rows, self.serializer.serialize(rows)):
+            grouped.setdefault(row[self.related_field.name], []).append(data)
+        return grouped
+
+
+class RowSerializer:
+    """
+    A ModelSerializer class compiled for ``values()`` rows. ``lookups`` are
+    the values() lookups a row needs; SerializerMethodFields are emitted as
+    None for the caller to fill in. A ``selection`` (see core.fieldsets)
+    compiles the serializer with only the selected fields and expansions.
+    """
+
+    def __init__(self, serializer_class, selection=None):
+        self.serializer_class = serializer_class
+        self.selection = selection
+        self.model = serializer_class.Meta.model
+        self.lookups = [self.model._meta.pk.name]
+        self.nested = {}
+        self.namespace = {'encode_uuid': encode_uuid, 'encode_datetime': encode_datetime}
+        serializer = serializer_class() if selection is None else serializer_class(selection=selection)
+        body = self.compile_object(serializer, self.model, '')
+        self.lookups = list(dict.fromkeys(self.lookups))
+        source = f'def build(r, nested, tz):\n    return {body}\n'
+        exec(compile(source, f'<RowSerializer {serializer_class.__name__}>', 'exec'), self.namespace)
+        self.build = self.namespace['build']
+
+    def compile_object(self, serializer, model, prefix):
+        items = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            items.append(f'{name!r}: {self.compile_field(field, model, prefix)}')
+        return '{' + ', '.join(items) + '}'
+
+    def compile_field(self, field, model, prefix):
+        if isinstance(field, serializers.SerializerMethodField):
+            return 'None'
+        if field.source == '*' or isinstance(field, serializers.ManyRelatedField):
+            raise ImproperlyConfigured(f'RowSerializer cannot compile field {field.field_name!r}')
+        lookup = prefix + field.source.replace('.', '__')
+
+        if isinstance(field, serializers.ListSerializer):
+            relation = next(
+                (rel for rel in model._meta.related_objects if rel.get_accessor_name() == field.source),
+                None
+            )
+            if relation is None or prefix:
+                raise ImproperlyConfigured(f'RowSerializer cannot compile field {field.field_name!r}')
+            name = f'n{len(self.nested)}'
+            self.nested[name] = NestedRows(
+                relation.related_model, relation.field,
+                RowSerializer(type(field.child), getattr(field.child, 'selection', None))
+            )
+            return f'nested[{name!r}].get(r[{model._meta.pk.name!r}], [])'
+        if isinstance(field, serializers.Serializer):
+            related_model = model._meta.get_field(field.source).related_model
+            pk_lookup = f'{lookup}__{related_model._meta.pk.name}'
+            self.lookups.append(pk_lookup)
+            body = self.compile_object(field, related_model, f'{lookup}__')
+            return f'None if r[{pk_lookup!r}] is None else {body}'
+
+        self.lookups.append(lookup)
+        value = f'r[{lookup!r}]'
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            related_pk = model._meta.get_field(field.source).related_model._meta.pk
+            return f'encode_uuid({value})' if related_pk.get_internal_type() == 'UUIDField' else value
+        if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+            return f'encode_uuid({value})'
+        if isinstance(field, serializers.DateTimeField):
+            return f'encode_datetime({value}, tz)'
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return value
+        raise ImproperlyConfigured(f'RowSerializer cannot compile field {field.field_name!r}')
+
+    def serialize(self, rows):
+        """
+        The serializer's representation of each ``values()`` row
+        """
+        pk_name = self.model._meta.pk.name
+        nested = {
+            name: relation.fetch([row[pk_name] for row in rows])
+            for name, relation in self.nested.items()
+        }
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        build = self.build
+        return [build(row, nested, tz) for row in rows]
+
+
+def render_json(data):
+    """
+    Compact, UTF-8 JSON of ``data`` as JSONRenderer would produce it
+    """
+    if orjson is not None:
+        try:
+            rendered = orjson.dumps(
+                data,
+                default=DRF_ENCODER.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS
+                | orjson.OPT_PASSTHROUGH_DATACLASS
+            )
+        except TypeError:
+            pass
+        else:
+            return rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    rendered = DRF_ENCODER.encode(data)
+    return rendered.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with a reused encoder, or orjson when installed. Requests
+    for indented output and non-default JSON settings go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return render_json(data)
+
+
+# Compiled once per serializer class and field selection, on first use.
+# Selections come from query strings, so only the first few are kept.
+ROW_SERIALIZERS = {}
+ROW_SERIALIZERS_MAX = 256
+
+
+class FastListMixin:
+    """
+    Serves ``list`` from ``values()`` rows through a RowSerializer compiled
+    from ``serializer_class``, paginated exactly like the DRF path
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if not fast_serialization_enabled():
+            return super().list(request, *args, **kwargs)
+        row_serializer = self.get_row_serializer()
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        rows = queryset.values(*row_serializer.lookups)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.fill_method_fields(row_serializer.serialize(page), page))
+        rows = list(rows)
+        return Response(self.fill_method_fields(row_serializer.serialize(rows), rows))
+
+    def get_row_serializer(self):
+        serializer_class = self.get_serializer_class()
+        selection = getattr(self, 'field_selection', None)
+        key = (serializer_class, None if selection is None else selection.key)
+        if key in ROW_SERIALIZERS:
+            return ROW_SERIALIZERS[key]
+        row_serializer = RowSerializer(serializer_class, selection)
+        if len(ROW_SERIALIZERS) < ROW_SERIALIZERS_MAX:
+            ROW_SERIALIZERS[key] = row_serializer
+        return row_serializer
+
+    def fill_method_fields(self, data, rows):
+        """
+        Set the SerializerMethodField values RowSerializer leaves as None in
+        ``data``, the serialized ``rows``
+        """
+        return data
@@ -0,0 +1,244 @@
+"""
+Sparse fieldsets and expansion control for read responses.
+
+``?fields=id,name,policy.name`` limits a response to the listed fields, with
+dotted paths reaching into nested objects. ``?expand=policy,steps.fields``
+lists the relations to embed: once it is given, a nested object that is not
+listed collapses to its primary key, and nested lists and embedded templates
+that are not listed are left out. Without either parameter responses are
+unchanged. The selection also shapes the query: only the selected columns
+are loaded and only the expanded relations are joined or prefetched.
+"""
+from django.db.models import Prefetch
+from django.db.models.fields.related import ForeignObjectRel
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_paths(value):
+    if value is None:
+        return None
+    return frozenset(path.strip() for path in value.split(',') if path.strip())
+
+
+def head_names(paths):
+    return {path.split('.', 1)[0] for path in paths}
+
+
+def sub_paths(paths, name):
+    prefix = f'{name}.'
+    return frozenset(path[len(prefix):] for path in paths if path.startswith(prefix))
+
+
+class FieldSelection:
+    """
+    Parsed ``fields`` and ``expand`` paths; None means no restriction
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+        self.field_names = head_names(fields) if fields is not None else None
+        self.expand_names = head_names(expand) if expand is not None else set()
+        # fields=policy.name embeds policy whatever expand says
+        if fields is not None:
+            self.expand_names |= {path.split('.', 1)[0] for path in fields if '.' in path}
+
+    @classmethod
+    def from_params(cls, params):
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        return cls(parse_paths(params.get('fields')), parse_paths(params.get('expand')))
+
+    @property
+    def key(self):
+        return self.fields, self.expand
+
+    def includes(self, name):
+        return self.field_names is None or name in self.field_names
+
+    def expands(self, name):
+        return self.expand is None or name in self.expand_names
+
+    def child(self, name):
+        fields = sub_paths(self.fields, name) if self.fields is not None else None
+        return FieldSelection(
+            fields or None,
+            sub_paths(self.expand, name) if self.expand is not None else None
+        )
+
+    def prune(self, data):
+        """
+        Apply the selection to an already serialized dict, such as a cached
+        template, where list values are the expandable relations
+        """
+        if data is None or (self.fields is None and self.expand is None):
+            return data
+        pruned = {}
+        for name, value in data.items():
+            if not self.includes(name):
+                continue
+            if isinstance(value, list):
+                if not self.expands(name):
+                    continue
+                value = [self.child(name).prune(item) for item in value]
+            pruned[name] = value
+        return pruned
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying a FieldSelection passed as ``selection``.
+    Nested serializers are expandable, as are the method fields named in
+    ``expandable_fields``, whose cache lookups are keyed on the columns in
+    ``cache_key_fields``.
+    """
+    expandable_fields = ()
+    cache_key_fields = ()
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selection = selection
+        if selection is not None:
+            self.apply_selection(selection)
+
+    def apply_selection(self, selection):
+        fields = self.fields
+        expandable = {
+            name for name, field in fields.items()
+            if isinstance(field, serializers.BaseSerializer) or name in self.expandable_fields
+        }
+        if selection.field_names is not None and selection.field_names - set(fields):
+            raise ValidationError({'fields': [
+                f'Unknown field: {name}' for name in sorted(selection.field_names - set(fields))
+            ]})
+        if selection.expand_names - expandable:
+            raise ValidationError({'expand': [
+                f'Not expandable: {name}' for name in sorted(selection.expand_names - expandable)
+            ]})
+
+        for name in list(fields):
+            field = fields[name]
+            if not selection.includes(name) or field.write_only:
+                if not field.write_only:
+                    del fields[name]
+                continue
+            if name not in expandable:
+                continue
+            source = {} if field.source == name else {'source': field.source}
+            if not selection.expands(name):
+                if isinstance(field, serializers.ListSerializer) or not isinstance(field, serializers.BaseSerializer):
+                    del fields[name]
+                else:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **source)
+            elif isinstance(field, serializers.ListSerializer):
+                fields[name] = type(field.child)(
+                    many=True, read_only=True, selection=selection.child(name), **source
+                )
+            elif isinstance(field, serializers.BaseSerializer):
+                fields[name] = type(field)(read_only=True, selection=selection.child(name), **source)
+
+
+def plan_queryset(queryset, serializer):
+    """
+    ``queryset`` restricted to the columns, joins and prefetches the fields of
+    ``serializer`` read; unchanged when a field's source is not a model field,
+    and with every column when a method field may read any of them
+    """
+    plan = QueryPlan()
+    if not plan.walk(serializer, queryset.model, ''):
+        return queryset
+    return plan.apply(queryset.select_related(None).prefetch_related(None))
+
+
+class QueryPlan:
+    def __init__(self):
+        self.only = []
+        self.select = []
+        self.prefetch = []
+        self.all_columns = False
+
+    def apply(self, queryset):
+        # select_related() without arguments would follow every foreign key
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset if self.all_columns else queryset.only(*self.only)
+
+    def walk(self, serializer, model, prefix):
+        self.only.append(prefix + model._meta.pk.name)
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                # Expandable method fields read the cache, others any column
+                if field.field_name not in getattr(serializer, 'expandable_fields', ()):
+                    self.all_columns = True
+                else:
+                    self.only.extend(prefix + name for name in getattr(serializer, 'cache_key_fields', ()))
+                continue
+            if field.source == '*':
+                return False
+            if isinstance(field, serializers.ListSerializer):
+                relation = next(
+                    (rel for rel in model._meta.related_objects if rel.get_accessor_name() == field.source),
+                    None
+                )
+                if relation is None:
+                    return False
+                child = QueryPlan()
+                if not child.walk(field.child, relation.related_model, ''):
+                    return False
+                child.only.append(relation.field.name)
+                children = child.apply(relation.related_model._default_manager.all())
+                self.prefetch.append(Prefetch(prefix + field.source, queryset=children))
+                continue
+
+            parts = field.source.split('.')
+            current = model
+            for i, part in enumerate(parts):
+                try:
+                    model_field = current._meta.get_field(part)
+                except Exception:
+                    return False
+                if isinstance(model_field, ForeignObjectRel) or model_field.many_to_many:
+                    return False
+                path = prefix + '__'.join(parts[:i + 1])
+                if model_field.is_relation and (i < len(parts) - 1 or isinstance(field, serializers.BaseSerializer)):
+                    self.only.append(path)
+                    self.select.append(path)
+                    current = model_field.related_model
+                elif i == len(parts) - 1:
+                    self.only.append(path)
+                else:
+                    # Attribute of a plain column, e.g. a property
+                    return False
+            if isinstance(field, serializers.BaseSerializer):
+                if not self.walk(field, current, prefix + '__'.join(parts) + '__'):
+                    return False
+        return True
+
+
+class FieldSelectionMixin:
+    """
+    Viewset mixin reading ``?fields=`` and ``?expand=`` on GET requests,
+    passing them to the serializer and planning the queryset to match
+    """
+
+    @cached_property
+    def field_selection(self):
+        if self.request.method != 'GET':
+            return None
+        return FieldSelection.from_params(self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.field_selection is not None:
+            kwargs.setdefault('selection', self.field_selection)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.field_selection is None:
+            return queryset
+        return plan_queryset(queryset, self.get_serializer())
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import PendingAcknowledgment, PolicyAcknowledgment
+
+INBOX_BATCH_SIZE = 1000
+
+
+def inbox_entry(acknowledgment, policy_name, template_version, steps_total):
+    """
+    Inbox row for a newly created acknowledgment whose policy name, template
+    version and step count the caller already has at hand
+    """
+    return PendingAcknowledgment(
+        acknowledgment_id=acknowledgment.id,
+        user_id=acknowledgment.user_id,
+        policy_id=acknowledgment.policy_id,
+        policy_template_id=acknowledgment.policy_template_id,
+        policy_name=policy_name,
+        template_version=template_version,
+        requested_at=acknowledgment.requested_at,
+        due_at=acknowledgment.due_at,
+        steps_total=steps_total
+    )
+
+
+def add_to_inbox(entries):
+    PendingAcknowledgment.objects.bulk_create(entries, batch_size=INBOX_BATCH_SIZE)
+
+
+def remove_from_inbox(acknowledgment_ids):
+    """
+    Drop the rows of acknowledgments that were acknowledged or expired.
+    ``acknowledgment_ids`` may be a list or a values queryset.
+    """
+    PendingAcknowledgment.objects.filter(acknowledgment_id__in=acknowledgment_ids).delete()
+
+
+def update_inbox_progress(acknowledgment_id, steps_acknowledged):
+    PendingAcknowledgment.objects.filter(acknowledgment_id=acknowledgment_id).update(
+        steps_acknowledged=steps_acknowledged
+    )
+
+
+def refresh_inbox(acknowledgment_ids):
+    """
+    Re-derive the rows of specific acknowledgments after an arbitrary update
+    """
+    remove_from_inbox(acknowledgment_ids)
+    add_to_inbox(open_inbox_entries(PolicyAcknowledgment.objects.filter(id__in=acknowledgment_ids)))
+
+
+def open_inbox_entries(acknowledgments):
+    """
+    Inbox rows for the open requests in the queryset, read with one grouped query
+    """
+    rows = acknowledgments.filter(
+        is_acknowledged=False,
+        expired_at__isnull=True
+    ).values(
+        'id', 'user_id', 'policy_id', 'policy_template_id', 'policy__name',
+        'policy_template__version', 'requested_at', 'due_at'
+    ).annotate(
+        steps_total=Count('policyacknowledgmentstep'),
+        steps_acknowledged=Count(
+            'policyacknowledgmentstep',
+            filter=Q(policyacknowledgmentstep__is_acknowledged=True)
+        )
+    ).order_by()
+    return (
+        PendingAcknowledgment(
+            acknowledgment_id=row['id'],
+            user_id=row['user_id'],
+            policy_id=row['policy_id'],
+            policy_template_id=row['policy_template_id'],
+            policy_name=row['policy__name'],
+            template_version=row['policy_template__version'],
+            requested_at=row['requested_at'],
+            due_at=row['due_at'],
+            steps_total=row['steps_total'],
+            steps_acknowledged=row['steps_acknowledged']
+        )
+        for row in rows.iterator()
+    )
+
+
+def rebuild_inbox(user_id=None):
+    """
+    Recompute the inbox from PolicyAcknowledgment, for one user or everyone.
+    Returns the number of rows written.
+    """
+    acknowledgments = PolicyAcknowledgment.objects.all()
+    entries = PendingAcknowledgment.objects.all()
+    if user_id:
+        acknowledgments = acknowledgments.filter(user_id=user_id)
+        entries = entries.filter(user_id=user_id)
+    with transaction.atomic():
+        entries.delete()
+        created = PendingAcknowledgment.objects.bulk_create(
+            open_inbox_entries(acknowledgments),
+            batch_size=INBOX_BATCH_SIZE
+        )
+    return len(created)
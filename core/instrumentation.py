@@ -0,0 +1,298 @@
+"""
+Opt-in per-request query and latency metrics.
+
+QueryMetricsMiddleware wraps every database execution of a request with
+``connection.execute_wrapper`` to count queries, time them and fingerprint
+them, so repeated statements (the signature of an N+1) show up per endpoint.
+Each response gets a ``Server-Timing`` header and a structured log line on
+the ``core.metrics`` logger, requests over their query or latency budget are
+flagged, and rolling histograms per endpoint are kept in process for the
+``/api/v1/_metrics`` endpoint. Enable it with ``REQUEST_METRICS['ENABLED']``.
+"""
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('core.metrics')
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, *(?:%s|\?))*\)', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def metrics_settings():
+    options = {
+        'ENABLED': False,
+        'QUERY_BUDGET': 20,
+        'LATENCY_BUDGET_MS': 500,
+        'BUDGETS': {},
+        'WINDOW_SECONDS': 300,
+        'SLOTS': 30,
+        'MAX_DUPLICATES_LOGGED': 5,
+    }
+    options.update(getattr(settings, 'REQUEST_METRICS', {}))
+    return options
+
+
+def fingerprint(sql):
+    """
+    SQL with literals and IN lists collapsed, so the same statement issued
+    with different parameters maps to one fingerprint
+    """
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """
+    ``execute_wrapper`` callable accumulating the queries of one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+class RollingHistogram:
+    """
+    Bucketed counts over a sliding window, kept as ``slots`` time slices so
+    old observations age out without storing them individually
+    """
+
+    def __init__(self, buckets, window_seconds=300, slots=30):
+        self.buckets = tuple(buckets)
+        self.slot_seconds = window_seconds / slots
+        self.slots = deque(maxlen=slots)
+        self.lock = threading.Lock()
+
+    def current_slot(self, now):
+        start = now - now % self.slot_seconds
+        if not self.slots or self.slots[-1]['start'] != start:
+            self.slots.append({'start': start, 'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0})
+        return self.slots[-1]
+
+    def observe(self, value, now=None):
+        with self.lock:
+            slot = self.current_slot(time.time() if now is None else now)
+            slot['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            slot['count'] += 1
+            slot['sum'] += value
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        horizon = now - self.slot_seconds * self.slots.maxlen
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0
+        value_sum = 0.0
+        with self.lock:
+            for slot in self.slots:
+                if slot['start'] <= horizon:
+                    continue
+                counts = [a + b for a, b in zip(counts, slot['counts'])]
+                total += slot['count']
+                value_sum += slot['sum']
+        return {
+            'count': total,
+            'mean': round(value_sum / total, 2) if total else None,
+            'p50': self.quantile(counts, total, 0.50),
+            'p95': self.quantile(counts, total, 0.95),
+            'p99': self.quantile(counts, total, 0.99),
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(self.buckets, counts)},
+                'le_inf': counts[-1],
+            },
+        }
+
+    def quantile(self, counts, total, fraction):
+        """
+        Upper bound of the bucket holding the quantile; None past the last bound
+        """
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= fraction * total:
+                return bound
+        return None
+
+
+class MetricsRegistry:
+    def __init__(self, window_seconds=300, slots=30):
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def endpoint(self, name):
+        with self.lock:
+            if name not in self.endpoints:
+                self.endpoints[name] = {
+                    'latency_ms': RollingHistogram(LATENCY_BUCKETS_MS, self.window_seconds, self.slots),
+                    'db_ms': RollingHistogram(LATENCY_BUCKETS_MS, self.window_seconds, self.slots),
+                    'serialize_ms': RollingHistogram(LATENCY_BUCKETS_MS, self.window_seconds, self.slots),
+                    'queries': RollingHistogram(QUERY_BUCKETS, self.window_seconds, self.slots),
+                    'requests': 0,
+                    'over_budget': 0,
+                    'with_duplicate_queries': 0,
+                }
+            return self.endpoints[name]
+
+    def record(self, name, sample):
+        metrics = self.endpoint(name)
+        for key in ('latency_ms', 'db_ms', 'serialize_ms', 'queries'):
+            metrics[key].observe(sample[key])
+        with self.lock:
+            metrics['requests'] += 1
+            metrics['over_budget'] += bool(sample['over_budget'])
+            metrics['with_duplicate_queries'] += bool(sample['duplicate_queries'])
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = dict(self.endpoints)
+        return {
+            'window_seconds': self.window_seconds,
+            'endpoints': {
+                name: {
+                    key: value.snapshot() if isinstance(value, RollingHistogram) else value
+                    for key, value in metrics.items()
+                }
+                for name, metrics in sorted(endpoints.items())
+            },
+        }
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+_options = metrics_settings()
+registry = MetricsRegistry(_options['WINDOW_SECONDS'], _options['SLOTS'])
+
+
+def endpoint_name(request):
+    """
+    ``METHOD view-name`` for routed requests, e.g. ``POST policytemplate-activate``
+    """
+    match = request.resolver_match
+    if match is None:
+        return f'{request.method} unresolved'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class QueryMetricsMiddleware:
+    """
+    Records query count, SQL time, render (serialization) time and duplicate
+    query fingerprints of every request. Raises MiddlewareNotUsed unless
+    ``REQUEST_METRICS['ENABLED']`` is set, so it costs nothing when off.
+    """
+
+    def __init__(self, get_response):
+        self.options = metrics_settings()
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._metrics_render = 0.0
+        started = time.perf_counter()
+        with self.wrap_connections(recorder):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        sample = self.sample(request, response, recorder, total)
+        registry.record(sample['endpoint'], sample)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={sample["db_ms"]};desc="{sample["queries"]} queries"',
+            f'serialize;dur={sample["serialize_ms"]}',
+            f'app;dur={max(sample["latency_ms"] - sample["db_ms"] - sample["serialize_ms"], 0):.2f}',
+            f'total;dur={sample["latency_ms"]}',
+        ])
+        logger.log(
+            logging.WARNING if sample['over_budget'] else logging.INFO,
+            json.dumps(sample, default=str)
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook; time the render itself
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def wrap_connections(self, recorder):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def budgets(self, endpoint):
+        """
+        (query budget, latency budget in ms) of an endpoint. ``BUDGETS`` may
+        key overrides by ``METHOD view-name`` or by view name alone.
+        """
+        budgets = self.options['BUDGETS']
+        budget = budgets.get(endpoint) or budgets.get(endpoint.split(' ', 1)[-1], {})
+        return (
+            budget.get('queries', self.options['QUERY_BUDGET']),
+            budget.get('latency_ms', self.options['LATENCY_BUDGET_MS']),
+        )
+
+    def sample(self, request, response, recorder, total):
+        endpoint = endpoint_name(request)
+        query_budget, latency_budget = self.budgets(endpoint)
+        latency_ms = round(total * 1000, 2)
+        over_budget = []
+        if query_budget is not None and recorder.count > query_budget:
+            over_budget.append('queries')
+        if latency_budget is not None and latency_ms > latency_budget:
+            over_budget.append('latency')
+        duplicates = recorder.duplicates()
+        return {
+            'endpoint': endpoint,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'serialize_ms': round(request._metrics_render * 1000, 2),
+            'latency_ms': latency_ms,
+            'duplicate_queries': [
+                {'fingerprint': sql[:300], 'count': count}
+                for sql, count in duplicates[:self.options['MAX_DUPLICATES_LOGGED']]
+            ],
+            'over_budget': over_budget,
+        }
+
@@ -0,0 +1,339 @@
+"""
+Database-backed background jobs, so long operations need no broker and do
+not hold a web worker. ``enqueue`` stores a Job row; workers started by
+``run_worker`` claim ready rows, run the handler registered for their
+``kind`` and record the result or error.
+
+A claim is a lease: the job stays invisible to other workers until its
+``visible_at``, which the claiming worker keeps pushing forward while the
+job runs. The job of a worker that died becomes claimable again once the
+lease runs out. Failures are retried with exponential backoff until
+``max_attempts`` attempts have been made, except JobError and the other
+PERMANENT_ERRORS, which no retry can fix.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .compliance import rebuild_compliance_summary
+from .exports import EXPORT_FORMATS, export_file_info, export_queryset, parse_export_filters, stream_export
+from .models import Job, JobStatus, Policy, PolicyTemplate, User
+from .services import BULK_CREATE_BATCH_SIZE, MigrationMode, activate_template, run_acknowledgment_campaign
+
+logger = logging.getLogger('core.jobs')
+
+JOB_HANDLERS = {}
+
+
+class JobError(Exception):
+    """
+    Raised by handlers for failures that retrying cannot fix
+    """
+
+
+PERMANENT_ERRORS = (JobError, ObjectDoesNotExist, DjangoValidationError, ValidationError)
+
+
+def jobs_settings():
+    options = {
+        'POOL': 'thread',
+        'CONCURRENCY': 4,
+        'VISIBILITY_TIMEOUT': 300,
+        'POLL_INTERVAL': 1.0,
+        'MAX_ATTEMPTS': 3,
+        'RETRY_DELAY': 10,
+        'EXPORT_DIR': Path(settings.BASE_DIR) / 'exports',
+    }
+    options.update(getattr(settings, 'JOBS', {}))
+    return options
+
+
+def job_handler(kind):
+    """
+    Register the decorated function as the handler of ``kind`` jobs. It is
+    called with the Job and returns a JSON-serializable result.
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, org_id=None, max_attempts=None):
+    """
+    Store a QUEUED job for the workers and return it. Inside a transaction
+    the job only becomes claimable once the transaction commits.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        org_id=org_id,
+        max_attempts=max_attempts or jobs_settings()['MAX_ATTEMPTS']
+    )
+
+
+def claim_jobs(worker_id, limit=1, visibility_timeout=None, now=None):
+    """
+    Lease up to ``limit`` claimable jobs to the worker and return their ids,
+    oldest first. Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED
+    where supported, so concurrent workers never claim the same job; SQLite
+    serializes the claiming transactions instead. Jobs whose lease ran out
+    on their last attempt are failed rather than claimed.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=visibility_timeout or jobs_settings()['VISIBILITY_TIMEOUT'])
+    with transaction.atomic():
+        claimable = Job.objects.filter(
+            status__in=[JobStatus.QUEUED, JobStatus.RUNNING],
+            visible_at__lte=now
+        )
+        claimable.filter(status=JobStatus.RUNNING, attempts__gte=F('max_attempts')).update(
+            status=JobStatus.FAILED,
+            error='Visibility timeout expired on the last attempt',
+            locked_by='',
+            finished_at=now
+        )
+        batch = claimable.order_by('visible_at')
+        if connection.features.has_select_for_update_skip_locked:
+            batch = batch.select_for_update(skip_locked=True)
+        ids = list(batch.values_list('id', flat=True)[:limit])
+        if ids:
+            Job.objects.filter(id__in=ids).update(
+                status=JobStatus.RUNNING,
+                attempts=F('attempts') + 1,
+                locked_by=worker_id,
+                visible_at=now + lease,
+                started_at=now
+            )
+    return ids
+
+
+def extend_leases(job_ids, worker_id, visibility_timeout=None):
+    """
+    Push back the lease of the worker's running jobs; returns how many it still holds
+    """
+    lease = timedelta(seconds=visibility_timeout or jobs_settings()['VISIBILITY_TIMEOUT'])
+    return Job.objects.filter(id__in=job_ids, status=JobStatus.RUNNING, locked_by=worker_id).update(
+        visible_at=timezone.now() + lease
+    )
+
+
+def run_job(job_id, worker_id):
+    """
+    Run one job claimed by the worker and record the outcome. Returns the
+    job's new status, or None when the lease was lost to another worker,
+    in which case the outcome is discarded.
+    """
+    job = Job.objects.get(id=job_id)
+    # The attempt number tells this lease apart from a later one of the same worker
+    lease = Job.objects.filter(id=job.id, status=JobStatus.RUNNING, locked_by=worker_id, attempts=job.attempts)
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            raise JobError(f'Unknown job kind: {job.kind}')
+        result = handler(job)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        if isinstance(e, PERMANENT_ERRORS) or job.attempts >= job.max_attempts:
+            logger.warning('Job %s (%s) failed: %s', job.id, job.kind, error, exc_info=not isinstance(e, JobError))
+            updated = lease.update(status=JobStatus.FAILED, error=error, locked_by='', finished_at=timezone.now())
+            return JobStatus.FAILED if updated else None
+        delay = jobs_settings()['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+        logger.info('Job %s (%s) failed, retrying in %ss: %s', job.id, job.kind, delay, error, exc_info=True)
+        updated = lease.update(
+            status=JobStatus.QUEUED,
+            error=error,
+            locked_by='',
+            visible_at=timezone.now() + timedelta(seconds=delay)
+        )
+        return JobStatus.QUEUED if updated else None
+
+    updated = lease.update(status=JobStatus.SUCCEEDED, result=result, error='', locked_by='', finished_at=timezone.now())
+    return JobStatus.SUCCEEDED if updated else None
+
+
+def execute_job(job_id, worker_id):
+    """
+    run_job on a pool thread or process, which owns its database connection
+    """
+    try:
+        return run_job(job_id, worker_id)
+    finally:
+        connection.close()
+
+
+class Worker:
+    """
+    Claims jobs and runs them in a pool of ``concurrency`` threads or
+    processes, renewing the leases of the running ones every third of the
+    visibility timeout. ``stop()`` lets the running jobs finish and returns.
+    """
+
+    def __init__(self, pool='thread', concurrency=4, visibility_timeout=300, poll_interval=1.0, worker_id=None):
+        if pool not in ('thread', 'process'):
+            raise ValueError("pool must be 'thread' or 'process'")
+        self.pool = pool
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+        self.counts = Counter()
+
+    def executor(self):
+        if self.pool == 'process':
+            # Spawned children set Django up from scratch instead of sharing
+            # the parent's database connections as forked ones would
+            return ProcessPoolExecutor(
+                self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """
+        Process jobs until stopped, or with ``burst`` until none is claimable.
+        Returns the counts of the outcomes.
+        """
+        running = {}
+        renewed = time.monotonic()
+        with self.executor() as executor:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(running)
+                claimed = claim_jobs(self.worker_id, free, self.visibility_timeout) if free else []
+                for job_id in claimed:
+                    running[executor.submit(execute_job, job_id, self.worker_id)] = job_id
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if not claimed or len(running) == self.concurrency:
+                    done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self.collect(running, done)
+                if time.monotonic() - renewed >= self.visibility_timeout / 3:
+                    extend_leases(list(running.values()), self.worker_id, self.visibility_timeout)
+                    renewed = time.monotonic()
+            self.collect(running, wait(running).done)
+        connection.close()
+        return dict(self.counts)
+
+    def collect(self, running, done):
+        for future in done:
+            job_id = running.pop(future)
+            try:
+                outcome = future.result()
+            except Exception:
+                # The job could not even be loaded; its lease runs out and it is retried
+                logger.exception('Worker %s could not run job %s', self.worker_id, job_id)
+                outcome = 'ERROR'
+            if outcome == JobStatus.QUEUED:
+                outcome = 'RETRIED'
+            self.counts[outcome or 'LOST'] += 1
+
+
+def payload_value(job, name, default=None, required=False):
+    if required and job.payload.get(name) is None:
+        raise JobError(f'Payload is missing {name}')
+    return job.payload.get(name, default)
+
+
+@job_handler('acknowledgment_campaign')
+def acknowledgment_campaign_job(job):
+    policy_id = payload_value(job, 'policy_id', required=True)
+    if not Policy.objects.for_org(job.org_id).filter(id=policy_id).exists():
+        raise JobError('Policy not found')
+    due_at = payload_value(job, 'due_at')
+    result = run_acknowledgment_campaign(
+        policy_id,
+        is_recurring=payload_value(job, 'is_recurring', False),
+        due_at=parse_datetime(due_at) if due_at else None,
+        batch_size=payload_value(job, 'batch_size', BULK_CREATE_BATCH_SIZE)
+    )
+    if result is None:
+        raise JobError('No active policy template found for this policy')
+    return result
+
+
+@job_handler('activate_template')
+def activate_template_job(job):
+    from .serializers import PolicyTemplateReadSerializer
+
+    template_id = payload_value(job, 'template_id', required=True)
+    if not PolicyTemplate.objects.for_org(job.org_id).filter(id=template_id).exists():
+        raise JobError('Policy template not found')
+    migration = payload_value(job, 'migration', MigrationMode.KEEP)
+    if migration not in MigrationMode.choices:
+        raise JobError(f"migration must be one of {', '.join(MigrationMode.choices)}")
+    approved_by = User.objects.get(id=payload_value(job, 'approved_by', required=True))
+    template, migrated = activate_template(template_id, approved_by, migration)
+    return {**PolicyTemplateReadSerializer(template).data, 'migration': migrated}
+
+
+@job_handler('rebuild_compliance_summary')
+def rebuild_compliance_summary_job(job):
+    return {'rows': rebuild_compliance_summary(job.org_id)}
+
+
+@job_handler('export')
+def export_job(job):
+    """
+    Write the export to EXPORT_DIR, under a temporary name until complete so
+    a retried attempt never serves a partial file
+    """
+    export_format = payload_value(job, 'output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise JobError(f"output must be one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        filters = parse_export_filters(job.payload)
+    except ValueError as e:
+        raise JobError(str(e))
+    if job.org_id is not None:
+        filters['org_id'] = job.org_id
+    compress = bool(payload_value(job, 'gzip', False))
+    content_type, filename = export_file_info(export_format, compress)
+
+    export_dir = Path(jobs_settings()['EXPORT_DIR'])
+    export_dir.mkdir(parents=True, exist_ok=True)
+    file_name = f'{job.id}-{filename}'
+    partial = export_dir / f'{file_name}.partial'
+    size = 0
+    with open(partial, 'wb') as f:
+        for chunk in stream_export(export_queryset(**filters), export_format, compress):
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(partial, export_dir / file_name)
+    return {'file': file_name, 'filename': filename, 'content_type': content_type, 'bytes': size}
+
+
+def export_path(job):
+    """
+    Path of the file a succeeded export job wrote, or None
+    """
+    if job.kind != 'export' or job.status != JobStatus.SUCCEEDED or not job.result:
+        return None
+    path = Path(jobs_settings()['EXPORT_DIR']) / Path(job.result['file']).name
+    return path if path.exists() else None
@@ -0,0 +1,108 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from core.benchmarking import ApiBenchmark, compare_to_baseline, seeded_database
+
+DATASET_OPTIONS = ('orgs', 'users_per_org', 'depts_per_org', 'policies', 'steps_per_template',
+                   'fields_per_step', 'ack_density', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic dataset into a throwaway test database, measures latency '
+        'percentiles, throughput and query counts of the main API endpoints, and '
+        'optionally compares them against a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, default=2)
+        parser.add_argument('--users-per-org', type=int, default=200)
+        parser.add_argument('--depts-per-org', type=int, default=5)
+        parser.add_argument('--policies', type=int, default=10, help='Policies per org')
+        parser.add_argument('--steps-per-template', type=int, default=3)
+        parser.add_argument('--fields-per-step', type=int, default=2)
+        parser.add_argument('--ack-density', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario')
+        parser.add_argument('--scenario', action='append',
+                            choices=[name for name, _, _ in ApiBenchmark.scenarios],
+                            help='Scenario to run; repeat for several (default: all)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Baseline JSON to compare against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to --baseline instead of comparing')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 latency increase over the baseline, as a fraction')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be positive and --warmup not negative')
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline needs --baseline')
+        dataset = {name: options[name] for name in DATASET_OPTIONS}
+
+        baseline = None
+        if options['baseline'] and not options['save_baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline['meta']['dataset'] != dataset:
+                raise CommandError(
+                    f"Baseline was recorded with dataset {baseline['meta']['dataset']}; "
+                    'rerun with the same options or save a new baseline'
+                )
+
+        results = self.benchmark(dataset, options)
+        report = {
+            'meta': {
+                'recorded_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'dataset': dataset,
+            },
+            'results': results,
+        }
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<38} p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                f"p99 {result['p99_ms']:>8} ms  {result['throughput_rps']:>8} req/s  "
+                f"{result['queries']:>3} queries"
+            )
+
+        if options['output']:
+            self.write_json(options['output'], report)
+        if options['save_baseline']:
+            self.write_json(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+        elif baseline is not None:
+            regressions = compare_to_baseline(results, baseline['results'], options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def benchmark(self, dataset, options):
+        """
+        Run the scenarios against a freshly created and seeded test database
+        """
+        try:
+            with seeded_database(dataset):
+                benchmark = ApiBenchmark(Client())
+                return benchmark.run(options['scenario'], options['iterations'], options['warmup'])
+        except (RuntimeError, ValueError) as e:
+            raise CommandError(str(e))
+
+    def write_json(self, path, report):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
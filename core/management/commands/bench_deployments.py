@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarking import latency_summary
+from core.models import Policy, PolicyAcknowledgment, TemplateStatus
+
+# (sync route, async route) pairs answering the same read
+ENDPOINTS = {
+    'policy-list': ('/api/v1/policy/', '/api/v1/async/policy/'),
+    'active-template': (
+        '/api/v1/policy/{policy_id}/policytemplate/',
+        '/api/v1/async/policy/{policy_id}/active-template/',
+    ),
+    'pending-acknowledgments': (
+        '/api/v1/policy-acknowledgments/?user_id={user_id}&pending=1',
+        '/api/v1/async/users/{user_id}/pending-acknowledgments/',
+    ),
+}
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def connection_worker(host, port, request, deadline, latencies, counters):
+    """
+    Issue requests back to back on one keep-alive connection until the
+    deadline, reconnecting whenever the server closes it
+    """
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            counters['errors' if status >= 400 else 'ok'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            counters['errors'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, concurrency, duration):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+        'Accept: application/json\r\nConnection: keep-alive\r\n\r\n'
+    ).encode()
+    latencies = []
+    counters = {'ok': 0, 'errors': 0}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        connection_worker(parts.hostname, parts.port or 80, request, deadline, latencies, counters)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.monotonic() - started
+    summary = latency_summary(latencies)
+    return {
+        'requests': counters['ok'] + counters['errors'],
+        'errors': counters['errors'],
+        'rps': round(counters['ok'] / elapsed, 1),
+        'p50_ms': summary['p50_ms'],
+        'p99_ms': summary['p99_ms'],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares requests/s and p99 latency of the hot read paths between a WSGI '
+        'deployment serving the sync routes and an ASGI deployment serving the async '
+        'routes. Both servers must already be running against the same database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                            help='Endpoint to benchmark; repeat for several (default: all)')
+        parser.add_argument('--concurrency', type=int, default=1000,
+                            help='Concurrent keep-alive connections')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds per run')
+        parser.add_argument('--policy-id', help='Defaults to a policy with an ACTIVE template')
+        parser.add_argument('--user-id', help='Defaults to a user with open requests')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+        params = {
+            'policy_id': options['policy_id'] or Policy.objects.filter(
+                policytemplate__status=TemplateStatus.ACTIVE
+            ).values_list('id', flat=True).first(),
+            'user_id': options['user_id'] or PolicyAcknowledgment.objects.filter(
+                is_acknowledged=False,
+                expired_at__isnull=True
+            ).values_list('user_id', flat=True).first(),
+        }
+        endpoints = options['endpoint'] or list(ENDPOINTS)
+        for name in endpoints:
+            for key, value in params.items():
+                if f'{{{key}}}' in ENDPOINTS[name][0] and value is None:
+                    raise CommandError(f'No data for {name}; seed the database or pass --{key.replace("_", "-")}')
+
+        results = []
+        for name in endpoints:
+            for deployment, base_url, route in (
+                ('wsgi', options['wsgi_url'], ENDPOINTS[name][0]),
+                ('asgi', options['asgi_url'], ENDPOINTS[name][1]),
+            ):
+                url = base_url.rstrip('/') + route.format(**params)
+                result = asyncio.run(run_load(url, options['concurrency'], options['duration']))
+                results.append({'endpoint': name, 'deployment': deployment, 'url': url, **result})
+                if not options['json']:
+                    self.stdout.write(
+                        f"{name:<24} {deployment:<5} {result['rps']:>9} req/s  "
+                        f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+                        f"errors {result['errors']}/{result['requests']}"
+                    )
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,130 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmarking import seeded_database
+from core.models import (DeptPolicy,
+                         PolicyTemplate,
+                         PolicyAcknowledgment,
+                         TemplateStatus)
+
+# (model, constraint name) pairs that back the hot queries below
+HOT_QUERY_CONSTRAINTS = [
+    (PolicyTemplate, 'unique_active_template_per_policy'),
+    (PolicyAcknowledgment, 'unique_open_acknowledgment_per_user_policy'),
+    (DeptPolicy, 'unique_dept_policy'),
+]
+
+
+def remove_constraint(editor, model, name):
+    """
+    Drop one of the model's constraints. SQLite rebuilds the table from the
+    model's current options, so they must no longer list it, as they would
+    in a migration.
+    """
+    constraints = model._meta.constraints
+    model._meta.constraints = [c for c in constraints if c.name != name]
+    try:
+        editor.remove_constraint(model, next(c for c in constraints if c.name == name))
+    finally:
+        model._meta.constraints = constraints
+
+
+DATASET_OPTIONS = ('orgs', 'users_per_org', 'depts_per_org', 'policies', 'ack_density', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic dataset into a throwaway test database and prints '
+        'EXPLAIN output and mean latency for the hot lookups, on the current '
+        'schema and on the schema and query shapes they replaced'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, default=2)
+        parser.add_argument('--users-per-org', type=int, default=500)
+        parser.add_argument('--depts-per-org', type=int, default=5)
+        parser.add_argument('--policies', type=int, default=20, help='Policies per org')
+        parser.add_argument('--ack-density', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--output', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive')
+        # An ACTIVE and an ARCHIVED template per policy, as after a re-activation
+        dataset = {'templates_per_policy': 2, **{name: options[name] for name in DATASET_OPTIONS}}
+
+        lines = []
+        try:
+            with seeded_database(dataset):
+                lines.append(f'-- {connection.vendor}, dataset {dataset}')
+                sample = PolicyAcknowledgment.objects.values('user_id', 'policy_id').first()
+                dept_policy = DeptPolicy.objects.values('dept_id', 'policy_id').first()
+                if not sample or not dept_policy:
+                    raise CommandError('The dataset has no acknowledgments to explain; raise --ack-density')
+
+                after = self.measure(self.queries(sample, dept_policy), options['iterations'])
+                # The database is thrown away afterwards, so the old schema is
+                # restored in place rather than inside a transaction
+                with connection.schema_editor() as editor:
+                    for model, name in HOT_QUERY_CONSTRAINTS:
+                        remove_constraint(editor, model, name)
+                    editor.alter_unique_together(PolicyTemplate, [], [('policy', 'status')])
+                before = self.measure(
+                    self.queries(sample, dept_policy, through_template=True), options['iterations']
+                )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        lines += self.report('before (unique_together (policy, status), no partial indexes)', before)
+        lines += self.report('after (partial unique constraints)', after)
+        self.stdout.write('\n'.join(lines))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+
+    def queries(self, sample, dept_policy, through_template=False):
+        """
+        The hot lookups; ``through_template`` is the open-acknowledgment check
+        as it was written before acknowledgments carried their policy
+        """
+        open_policy = (
+            {'policy_template__policy_id': sample['policy_id']} if through_template
+            else {'policy_id': sample['policy_id']}
+        )
+        return {
+            'active template': lambda: PolicyTemplate.objects.filter(
+                policy_id=sample['policy_id'],
+                status=TemplateStatus.ACTIVE
+            ),
+            'open acknowledgment': lambda: PolicyAcknowledgment.objects.filter(
+                user_id=sample['user_id'],
+                is_acknowledged=False,
+                expired_at__isnull=True,
+                **open_policy
+            ),
+            'dept policy': lambda: DeptPolicy.objects.filter(
+                dept_id=dept_policy['dept_id'],
+                policy_id=dept_policy['policy_id']
+            ),
+        }
+
+    def measure(self, queries, iterations):
+        results = {}
+        for name, build in queries.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                build().exists()
+            mean_ms = (time.perf_counter() - started) * 1000 / iterations
+            results[name] = (mean_ms, build().explain())
+        return results
+
+    def report(self, label, results):
+        lines = [f'== {label}']
+        for name, (mean_ms, plan) in results.items():
+            lines.append(f'-- {name}: {mean_ms:.3f} ms/query')
+            lines.append(plan)
+        return lines
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import (EXPORT_FORMATS,
+                          EXPORT_STATUSES,
+                          EXPORT_CHUNK_SIZE,
+                          export_queryset,
+                          parse_export_filters,
+                          stream_export)
+
+
+class Command(BaseCommand):
+    help = 'Streams acknowledgments with their steps and field values as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org-id')
+        parser.add_argument('--policy-id')
+        parser.add_argument('--requested-after', help='ISO 8601 date or datetime (inclusive)')
+        parser.add_argument('--requested-before', help='ISO 8601 date or datetime (exclusive)')
+        parser.add_argument('--status', choices=EXPORT_STATUSES)
+        # Named like the ?output= parameter of the export endpoint
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('--file', help='File to write to; defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = stream_export(
+            export_queryset(**filters),
+            options['output'],
+            options['gzip'],
+            options['chunk_size']
+        )
+        if options['file']:
+            with open(options['file'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
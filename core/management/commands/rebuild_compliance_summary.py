@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.compliance import rebuild_compliance_summary
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the compliance summary counters from acknowledgments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org-id', help='Only rebuild the rows of this org')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_compliance_summary(options['org_id'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} compliance summary rows in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.inbox import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-user inbox of pending acknowledgments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', help='Only rebuild the rows of this user')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_inbox(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} inbox rows in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,54 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jobs import Worker, jobs_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs (campaigns, activations, exports, summary '
+        'rebuilds) in a thread or process pool. Safe to run in several processes at once.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = jobs_settings()
+        parser.add_argument('--pool', choices=['thread', 'process'], default=defaults['POOL'])
+        parser.add_argument('--concurrency', type=int, default=defaults['CONCURRENCY'],
+                            help='Jobs run at once')
+        parser.add_argument('--visibility-timeout', type=float, default=defaults['VISIBILITY_TIMEOUT'],
+                            help='Seconds a claimed job stays hidden from other workers unless renewed')
+        parser.add_argument('--poll-interval', type=float, default=defaults['POLL_INTERVAL'],
+                            help='Seconds to sleep between polls when no job is ready')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is ready instead of waiting for more')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive')
+        if options['visibility_timeout'] <= 0 or options['poll_interval'] <= 0:
+            raise CommandError('--visibility-timeout and --poll-interval must be positive')
+
+        worker = Worker(
+            pool=options['pool'],
+            concurrency=options['concurrency'],
+            visibility_timeout=options['visibility_timeout'],
+            poll_interval=options['poll_interval']
+        )
+        # Finish the running jobs on Ctrl-C or SIGTERM rather than abandoning
+        # them to the visibility timeout
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+
+        self.stdout.write(
+            f"Worker {worker.worker_id} running up to {options['concurrency']} jobs "
+            f"in a {options['pool']} pool"
+        )
+        started = time.perf_counter()
+        counts = worker.run(burst=options['burst'])
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {outcome.lower()}' for outcome, count in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stopped after {elapsed:.2f}s: {summary or 'no jobs run'}"
+        ))
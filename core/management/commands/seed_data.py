@@ -1,21 +1,259 @@
 # management/commands/seed_policies.py
 
-from django.core.management.base import BaseCommand
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.hashers import make_password
+from core.compliance import rebuild_compliance_summary
+from core.inbox import rebuild_inbox
+from core.submissions import field_value_columns
 from core.models import (
     Org, Dept, User, Policy, PolicyTemplate, PolicyStep,
     PolicyStepField, PolicyAcknowledgment, PolicyAcknowledgmentStep,
-    PolicyStepFieldValue
+    PolicyStepFieldValue, TemplateStatus, FieldValueType, DeptPolicy
 )
 
+# Parents are listed before children so every flush satisfies foreign keys
+SYNTHETIC_MODELS = [
+    Org, Dept, User, Policy, DeptPolicy, PolicyTemplate, PolicyStep,
+    PolicyStepField, PolicyAcknowledgment, PolicyAcknowledgmentStep,
+    PolicyStepFieldValue
+]
+
+
+class BulkWriter:
+    """
+    Buffers unsaved model instances and writes them with bulk_create once any
+    buffer reaches chunk_size, reporting per-model row counts and throughput.
+    """
+
+    def __init__(self, stdout, chunk_size):
+        self.stdout = stdout
+        self.chunk_size = chunk_size
+        self.buffers = {model: [] for model in SYNTHETIC_MODELS}
+        self.counts = {model: 0 for model in SYNTHETIC_MODELS}
+        self.started = time.perf_counter()
+
+    def add(self, obj):
+        buffer = self.buffers[type(obj)]
+        buffer.append(obj)
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for model, buffer in self.buffers.items():
+            if not buffer:
+                continue
+            model.objects.bulk_create(buffer, batch_size=self.chunk_size)
+            self.counts[model] += len(buffer)
+            buffer.clear()
+        self.stdout.write(
+            f'  {self.total:,} rows written ({self.throughput:,.0f} rows/s)'
+        )
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def throughput(self):
+        return self.total / max(time.perf_counter() - self.started, 1e-9)
+
+
 class Command(BaseCommand):
-    help = 'Seeds the database with two SOC2 policies and related data'
+    help = (
+        'Seeds the database with two SOC2 policies and related data, or with '
+        'a deterministic synthetic dataset when --orgs is given'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, help='Number of synthetic orgs to generate')
+        parser.add_argument('--users-per-org', type=int, default=100)
+        parser.add_argument('--depts-per-org', type=int, default=5)
+        parser.add_argument('--policies', type=int, default=10, help='Policies per org')
+        parser.add_argument('--templates-per-policy', type=int, default=1)
+        parser.add_argument('--steps-per-template', type=int, default=3)
+        parser.add_argument('--fields-per-step', type=int, default=2)
+        parser.add_argument(
+            '--ack-density', type=float, default=0.5,
+            help='Probability that a user has an acknowledgment request for a policy'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000)
 
     @transaction.atomic
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
+        if options['orgs'] is None:
+            self.seed_sample()
+        else:
+            self.seed_synthetic(options)
+
+    def seed_synthetic(self, options):
+        for name in ('orgs', 'users_per_org', 'depts_per_org', 'templates_per_policy', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be positive')
+        if not 0 <= options['ack_density'] <= 1:
+            raise CommandError('--ack-density must be between 0 and 1')
+
+        rng = random.Random(options['seed'])
+        writer = BulkWriter(self.stdout, options['chunk_size'])
+        now = timezone.now()
+        # Hashing is deliberately slow; every synthetic user shares one hash
+        password = make_password('password')
+        field_types = list(FieldValueType.values)
+
+        def new_id():
+            return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+        self.stdout.write(f'Seeding {options["orgs"]} synthetic orgs (seed={options["seed"]})...')
+
+        for org_index in range(options['orgs']):
+            org = Org(id=new_id(), name=f'Org {org_index}', domain=f'org{org_index}.example.com')
+            writer.add(org)
+
+            depts = [
+                Dept(id=new_id(), org_id=org.id, name=f'Org {org_index} Dept {i}')
+                for i in range(options['depts_per_org'])
+            ]
+            for dept in depts:
+                writer.add(dept)
+
+            users = []
+            for user_index in range(options['users_per_org']):
+                username = f'org{org_index}-user{user_index}'
+                user = User(
+                    id=new_id(),
+                    username=username,
+                    email=f'{username}@org{org_index}.example.com',
+                    password=password,
+                    org_id=org.id,
+                    dept_id=rng.choice(depts).id
+                )
+                users.append(user)
+                writer.add(user)
+
+            for policy_index in range(options['policies']):
+                policy = Policy(
+                    id=new_id(),
+                    name=f'Org {org_index} Policy {policy_index}',
+                    org_id=org.id,
+                    description=f'Synthetic policy {policy_index}',
+                    enforcement_type=rng.choice(['MANDATORY', 'RECOMMENDED', 'OPTIONAL'])
+                )
+                writer.add(policy)
+
+                assigned_depts = {
+                    dept.id for dept in rng.sample(depts, rng.randint(1, len(depts)))
+                }
+                for dept_id in assigned_depts:
+                    writer.add(DeptPolicy(id=new_id(), dept_id=dept_id, policy_id=policy.id))
+
+                # The newest template is ACTIVE, older versions are ARCHIVED
+                template_count = options['templates_per_policy']
+                for template_index in range(template_count):
+                    is_active = template_index == template_count - 1
+                    template = PolicyTemplate(
+                        id=new_id(),
+                        policy_id=policy.id,
+                        version=f'{template_index + 1}.0.0',
+                        status=TemplateStatus.ACTIVE if is_active else TemplateStatus.ARCHIVED,
+                        approved_by_id=users[0].id
+                    )
+                    writer.add(template)
+
+                    steps = []
+                    for step_index in range(options['steps_per_template']):
+                        step = PolicyStep(
+                            id=new_id(),
+                            policy_template_id=template.id,
+                            name=f'Step {step_index}',
+                            description=f'Synthetic step {step_index}'
+                        )
+                        writer.add(step)
+                        fields = [
+                            PolicyStepField(
+                                id=new_id(),
+                                policy_step_id=step.id,
+                                field_name=f'Field {field_index}',
+                                field_key=f'field_{field_index}',
+                                field_value_type=rng.choice(field_types)
+                            )
+                            for field_index in range(options['fields_per_step'])
+                        ]
+                        for field in fields:
+                            writer.add(field)
+                        steps.append((step, fields))
+
+                    if not is_active:
+                        continue
+                    for user in users:
+                        if user.dept_id in assigned_depts and rng.random() < options['ack_density']:
+                            self.add_synthetic_acknowledgment(writer, rng, new_id, now, template, user, steps)
+
+        writer.flush()
+        rebuild_compliance_summary()
+        rebuild_inbox()
+        elapsed = time.perf_counter() - writer.started
+        for model, count in writer.counts.items():
+            self.stdout.write(f'  {model.__name__}: {count:,}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {writer.total:,} rows in {elapsed:.1f}s ({writer.throughput:,.0f} rows/s)'
+        ))
+
+    def add_synthetic_acknowledgment(self, writer, rng, new_id, now, template, user, steps):
+        is_acknowledged = rng.random() < 0.6
+        expired = not is_acknowledged and rng.random() < 0.2
+        acknowledgment = PolicyAcknowledgment(
+            id=new_id(),
+            policy_template_id=template.id,
+            policy_id=template.policy_id,
+            org_id=user.org_id,
+            user_id=user.id,
+            is_acknowledged=is_acknowledged,
+            acknowledged_at=now - timedelta(days=rng.randint(0, 365)) if is_acknowledged else None,
+            due_at=now + timedelta(days=rng.randint(-30, 365)),
+            expired_at=now - timedelta(days=rng.randint(1, 30)) if expired else None,
+            is_recurring=rng.random() < 0.3
+        )
+        writer.add(acknowledgment)
+
+        for step, fields in steps:
+            step_done = is_acknowledged or rng.random() < 0.3
+            ack_step = PolicyAcknowledgmentStep(
+                id=new_id(),
+                policy_acknowledgment_id=acknowledgment.id,
+                policy_step_id=step.id,
+                is_acknowledged=step_done
+            )
+            writer.add(ack_step)
+            if not step_done:
+                continue
+            for field in fields:
+                writer.add(PolicyStepFieldValue(
+                    id=new_id(),
+                    policy_acknowledgment_step_id=ack_step.id,
+                    policy_step_field_id=field.id,
+                    **field_value_columns(
+                        field.field_value_type,
+                        self.synthetic_field_value(rng, field.field_value_type, now)
+                    )
+                ))
+
+    def synthetic_field_value(self, rng, field_value_type, now):
+        if field_value_type == FieldValueType.NUMBER:
+            return rng.randint(0, 100)
+        if field_value_type == FieldValueType.BOOLEAN:
+            return rng.choice([True, False])
+        if field_value_type == FieldValueType.DATETIME:
+            return (now - timedelta(days=rng.randint(0, 365))).isoformat()
+        return f'value-{rng.randint(0, 9999)}'
+
+    def seed_sample(self):
         self.stdout.write('Starting to seed policy data...')
 
         # Create Organization
@@ -25,8 +263,8 @@ class Command(BaseCommand):
         )
 
         # Create Departments
-        it_dept = Dept.objects.create(name='IT')
-        hr_dept = Dept.objects.create(name='HR')
+        it_dept = Dept.objects.create(name='IT', org=org)
+        hr_dept = Dept.objects.create(name='HR', org=org)
 
         # Create Users
         admin_user = User.objects.create(
@@ -160,10 +398,12 @@ class Command(BaseCommand):
             # Create sample acknowledgment for normal user
             acknowledgment = PolicyAcknowledgment.objects.create(
                 policy_template=template,
+                policy=policy,
+                org=org,
                 user=normal_user,
                 is_acknowledged=False,
                 requested_at=timezone.now(),
-                expired_at=timezone.now() + timedelta(days=30),
+                due_at=timezone.now() + timedelta(days=30),
                 is_recurring=True,
                 is_user_initiated=False
             )
@@ -177,4 +417,6 @@ class Command(BaseCommand):
                     is_acknowledged=False
                 )
 
+        rebuild_compliance_summary()
+        rebuild_inbox()
         self.stdout.write(self.style.SUCCESS('Successfully seeded policy data'))
\ No newline at end of file
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sweeper import SWEEP_BATCH_SIZE, sweep_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Expires acknowledgment requests past their due date and re-issues '
+        'recurring ones. Safe to run in several processes at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running as a worker, polling for due rows'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=30,
+            help='Seconds to sleep between polls when nothing is due (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        try:
+            while True:
+                self.sweep(options['batch_size'])
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping sweeper')
+
+    def sweep(self, batch_size):
+        """
+        Process batches until nothing is due, then report throughput
+        """
+        started = time.perf_counter()
+        totals = {'claimed': 0, 'expired': 0, 'reissued': 0}
+        while True:
+            result = sweep_batch(batch_size)
+            if not result['claimed']:
+                break
+            for key, value in result.items():
+                totals[key] += value
+
+        if totals['claimed']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Swept {totals['claimed']} rows ({totals['expired']} expired, "
+                f"{totals['reissued']} re-issued) in {elapsed:.2f}s "
+                f"({totals['claimed'] / elapsed:,.0f} rows/s)"
+            ))
+        else:
+            self.stdout.write('Nothing due')
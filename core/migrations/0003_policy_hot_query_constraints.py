@@ -0,0 +1,87 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_acknowledgment_policy(apps, schema_editor):
+    PolicyAcknowledgment = apps.get_model('core', 'PolicyAcknowledgment')
+    PolicyTemplate = apps.get_model('core', 'PolicyTemplate')
+    PolicyAcknowledgment.objects.filter(policy__isnull=True).update(
+        policy_id=Subquery(
+            PolicyTemplate.objects.filter(
+                id=OuterRef('policy_template_id')
+            ).values('policy_id')[:1]
+        )
+    )
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Resolve rows that would violate the new unique constraints: duplicate
+    DeptPolicy rows are deleted and surplus open acknowledgments are expired,
+    keeping the most recently requested one.
+    """
+    DeptPolicy = apps.get_model('core', 'DeptPolicy')
+    PolicyAcknowledgment = apps.get_model('core', 'PolicyAcknowledgment')
+
+    duplicate_pairs = DeptPolicy.objects.values('dept_id', 'policy_id').annotate(
+        total=Count('id')
+    ).filter(total__gt=1)
+    for pair in duplicate_pairs:
+        rows = DeptPolicy.objects.filter(dept_id=pair['dept_id'], policy_id=pair['policy_id'])
+        keep = rows.values_list('id', flat=True).first()
+        rows.exclude(id=keep).delete()
+
+    open_acknowledgments = PolicyAcknowledgment.objects.filter(
+        is_acknowledged=False,
+        expired_at__isnull=True
+    )
+    duplicate_pairs = open_acknowledgments.values('user_id', 'policy_id').annotate(
+        total=Count('id')
+    ).filter(total__gt=1)
+    now = django.utils.timezone.now()
+    for pair in duplicate_pairs:
+        rows = open_acknowledgments.filter(user_id=pair['user_id'], policy_id=pair['policy_id'])
+        keep = rows.order_by('-requested_at').values_list('id', flat=True).first()
+        rows.exclude(id=keep).update(expired_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_policy_compliance_framework_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='policytemplate',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='policyacknowledgment',
+            name='policy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='core.policy'),
+        ),
+        migrations.RunPython(backfill_acknowledgment_policy, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='policyacknowledgment',
+            name='policy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.policy'),
+        ),
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='deptpolicy',
+            constraint=models.UniqueConstraint(fields=('dept', 'policy'), name='unique_dept_policy'),
+        ),
+        migrations.AddConstraint(
+            model_name='policyacknowledgment',
+            constraint=models.UniqueConstraint(condition=models.Q(('expired_at__isnull', True), ('is_acknowledged', False)), fields=('user', 'policy'), name='unique_open_acknowledgment_per_user_policy'),
+        ),
+        migrations.AddConstraint(
+            model_name='policytemplate',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ACTIVE')), fields=('policy',), name='unique_active_template_per_policy'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_policy_hot_query_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='policyacknowledgment',
+            index=models.Index(fields=['requested_at', 'id'], name='ack_requested_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_acknowledgment_pagination_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('requested_count', models.PositiveIntegerField(default=0)),
+                ('acknowledged_count', models.PositiveIntegerField(default=0)),
+                ('expired_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dept', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.dept')),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.org')),
+                ('policy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.policy')),
+                ('policy_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.policytemplate')),
+            ],
+            options={
+                'verbose_name_plural': 'Compliance Summaries',
+                'constraints': [models.UniqueConstraint(fields=('org', 'dept', 'policy', 'policy_template'), name='unique_compliance_summary_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_compliance_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policyacknowledgment',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='policyacknowledgment',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['due_at'], name='ack_due_at_unexpired_idx'),
+        ),
+    ]
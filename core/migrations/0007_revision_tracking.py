@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_acknowledgment_due_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policy',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='policy',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='policytemplate',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='policytemplate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='policy',
+            index=models.Index(fields=['updated_at'], name='policy_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policytemplate',
+            index=models.Index(fields=['updated_at'], name='template_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_revision_tracking'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='policystepfieldvalue',
+            constraint=models.UniqueConstraint(fields=('policy_acknowledgment_step', 'policy_step_field'), name='unique_step_field_value'),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:54
+
+from decimal import Decimal, InvalidOperation
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def parse_number(text):
+    try:
+        number = Decimal(text.strip())
+    except InvalidOperation:
+        return None
+    # core.submissions.NUMBER_INTEGER_DIGITS; longer values keep only their text
+    if not number.is_finite() or (number and number.adjusted() >= 18):
+        return None
+    try:
+        return number.quantize(Decimal('1e-10'))
+    except InvalidOperation:
+        return None
+
+
+def parse_bool(text):
+    return {'true': True, 'false': False}.get(text.strip().lower())
+
+
+def parse_datetime_value(text):
+    try:
+        parsed = parse_datetime(text.strip())
+    except ValueError:
+        return None
+    if parsed is not None and django.utils.timezone.is_naive(parsed):
+        parsed = django.utils.timezone.make_aware(parsed)
+    return parsed
+
+
+PARSERS = {
+    'NUMBER': ('value_number', parse_number),
+    'BOOLEAN': ('value_bool', parse_bool),
+    'STRING': ('value_text', lambda text: text),
+    'DATETIME': ('value_datetime', parse_datetime_value),
+}
+
+
+def backfill_typed_values(apps, schema_editor):
+    """
+    Fill the typed column of existing values from their text, in primary key
+    order and fixed-size batches so large tables are never loaded at once.
+    Text that does not parse as the field's type leaves the column NULL.
+    """
+    PolicyStepFieldValue = apps.get_model('core', 'PolicyStepFieldValue')
+    last_id = None
+    while True:
+        batch = PolicyStepFieldValue.objects.order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        rows = list(batch.values_list('id', 'field_value', 'policy_step_field__field_value_type')[:BACKFILL_BATCH_SIZE])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        by_column = {}
+        for value_id, text, field_value_type in rows:
+            column, parse = PARSERS.get(field_value_type, PARSERS['STRING'])
+            typed = parse(text)
+            if typed is not None:
+                by_column.setdefault(column, []).append(
+                    PolicyStepFieldValue(id=value_id, **{column: typed})
+                )
+        for column, values in by_column.items():
+            PolicyStepFieldValue.objects.bulk_update(values, [column])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_step_field_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policystepfieldvalue',
+            name='value_bool',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='policystepfieldvalue',
+            name='value_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='policystepfieldvalue',
+            name='value_number',
+            field=models.DecimalField(blank=True, decimal_places=10, max_digits=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='policystepfieldvalue',
+            name='value_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        # Backfill before building the indexes so they are written once
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='policystepfieldvalue',
+            index=models.Index(condition=models.Q(('value_number__isnull', False)), fields=['policy_step_field', 'value_number'], name='field_value_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policystepfieldvalue',
+            index=models.Index(condition=models.Q(('value_datetime__isnull', False)), fields=['policy_step_field', 'value_datetime'], name='field_value_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policystepfieldvalue',
+            index=models.Index(condition=models.Q(('value_bool__isnull', False)), fields=['policy_step_field', 'value_bool'], name='field_value_bool_idx'),
+        ),
+    ]
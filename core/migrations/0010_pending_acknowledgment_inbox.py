@@ -0,0 +1,71 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_inbox(apps, schema_editor):
+    PolicyAcknowledgment = apps.get_model('core', 'PolicyAcknowledgment')
+    PendingAcknowledgment = apps.get_model('core', 'PendingAcknowledgment')
+    rows = PolicyAcknowledgment.objects.filter(
+        is_acknowledged=False,
+        expired_at__isnull=True
+    ).values(
+        'id', 'user_id', 'policy_id', 'policy_template_id', 'policy__name',
+        'policy_template__version', 'requested_at', 'due_at'
+    ).annotate(
+        steps_total=Count('policyacknowledgmentstep'),
+        steps_acknowledged=Count(
+            'policyacknowledgmentstep',
+            filter=Q(policyacknowledgmentstep__is_acknowledged=True)
+        )
+    ).order_by()
+    PendingAcknowledgment.objects.bulk_create(
+        (
+            PendingAcknowledgment(
+                acknowledgment_id=row['id'],
+                user_id=row['user_id'],
+                policy_id=row['policy_id'],
+                policy_template_id=row['policy_template_id'],
+                policy_name=row['policy__name'],
+                template_version=row['policy_template__version'],
+                requested_at=row['requested_at'],
+                due_at=row['due_at'],
+                steps_total=row['steps_total'],
+                steps_acknowledged=row['steps_acknowledged']
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_typed_field_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAcknowledgment',
+            fields=[
+                ('acknowledgment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.policyacknowledgment')),
+                ('policy_name', models.CharField(max_length=512)),
+                ('template_version', models.CharField(max_length=10)),
+                ('requested_at', models.DateTimeField()),
+                ('due_at', models.DateTimeField(blank=True, null=True)),
+                ('steps_total', models.PositiveIntegerField(default=0)),
+                ('steps_acknowledged', models.PositiveIntegerField(default=0)),
+                ('policy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.policy')),
+                ('policy_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.policytemplate')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'requested_at', 'acknowledgment'], name='inbox_user_requested_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_orgs(apps, schema_editor):
+    Org = apps.get_model('core', 'Org')
+    Dept = apps.get_model('core', 'Dept')
+    DeptPolicy = apps.get_model('core', 'DeptPolicy')
+    User = apps.get_model('core', 'User')
+    PolicyAcknowledgment = apps.get_model('core', 'PolicyAcknowledgment')
+
+    # A department belongs to the org of its users, failing that of its policies
+    Dept.objects.update(org_id=Subquery(
+        User.objects.filter(dept_id=OuterRef('pk')).values('org_id')[:1]
+    ))
+    Dept.objects.filter(org__isnull=True).update(org_id=Subquery(
+        DeptPolicy.objects.filter(dept_id=OuterRef('pk')).values('policy__org_id')[:1]
+    ))
+    # One UPDATE per tenant keeps each statement to that tenant's rows
+    for org_id in Org.objects.values_list('id', flat=True):
+        PolicyAcknowledgment.objects.filter(policy__org_id=org_id).update(org_id=org_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_pending_acknowledgment_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dept',
+            name='org',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.org'),
+        ),
+        migrations.AddField(
+            model_name='policyacknowledgment',
+            name='org',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.org'),
+        ),
+        migrations.RunPython(backfill_orgs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='policyacknowledgment',
+            name='org',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.org'),
+        ),
+        migrations.AddIndex(
+            model_name='policy',
+            index=models.Index(fields=['org', 'id'], name='policy_org_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policyacknowledgment',
+            index=models.Index(fields=['org', 'requested_at', 'id'], name='ack_org_requested_at_id_idx'),
+        ),
+    ]
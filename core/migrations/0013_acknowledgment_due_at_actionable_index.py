@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='policyacknowledgment',
+            name='ack_due_at_unexpired_idx',
+        ),
+        migrations.AddIndex(
+            model_name='policyacknowledgment',
+            index=models.Index(condition=models.Q(models.Q(('is_acknowledged', False), ('is_recurring', True), _connector='OR'), ('expired_at__isnull', True)), fields=['due_at'], name='ack_due_at_actionable_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:10
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def recount_current_requests(apps, schema_editor):
+    """
+    requested_count and acknowledged_count now leave out expired, reissued and
+    renewed requests; recompute them for the existing summary rows
+    """
+    PolicyAcknowledgment = apps.get_model('core', 'PolicyAcknowledgment')
+    ComplianceSummary = apps.get_model('core', 'ComplianceSummary')
+    rows = PolicyAcknowledgment.objects.values(
+        'org_id', 'user__dept_id', 'policy_id', 'policy_template_id'
+    ).annotate(
+        requested=Count('id', filter=Q(expired_at__isnull=True)),
+        acknowledged=Count('id', filter=Q(expired_at__isnull=True, is_acknowledged=True))
+    ).order_by()
+    for row in rows.iterator():
+        ComplianceSummary.objects.filter(
+            org_id=row['org_id'],
+            dept_id=row['user__dept_id'],
+            policy_id=row['policy_id'],
+            policy_template_id=row['policy_template_id']
+        ).update(requested_count=row['requested'], acknowledged_count=row['acknowledged'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_acknowledgment_due_at_actionable_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_current_requests, migrations.RunPython.noop),
+    ]
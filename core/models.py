@@ -1,4 +1,6 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 import uuid
 # Create your models here.
@@ -17,6 +19,23 @@ class TemplateStatus(models.TextChoices):
     ACTIVE = 'ACTIVE', 'Active'
     ARCHIVED = 'ARCHIVED', 'Archived'
 
+class JobStatus(models.TextChoices):
+    QUEUED = 'QUEUED', 'Queued'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+class OrgScopedQuerySet(models.QuerySet):
+    def for_org(self, org_id):
+        """
+        Rows of one tenant, following the model's ``org_lookup``; every row
+        when ``org_id`` is None, which only management commands and jobs
+        pass, since API requests always carry an org
+        """
+        if org_id is None:
+            return self
+        return self.filter(**{self.model.org_lookup: org_id})
+
 class Org(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
@@ -27,8 +46,14 @@ class Org(models.Model):
 
 class Dept(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # NULL only for departments created before tenancy that no user or
+    # assigned policy ties to an org; those are visible to unscoped requests only
+    org = models.ForeignKey(Org, null=True, blank=True, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
 
+    org_lookup = 'org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
     def __str__(self)-> str:
         return f"{self.id} - {self.name}"
 
@@ -41,6 +66,35 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+def bump_revision(model, ids):
+    """
+    Increment ``revision`` and touch ``updated_at`` of the given rows with one UPDATE
+    """
+    return model.objects.filter(id__in=ids).update(
+        revision=models.F('revision') + 1,
+        updated_at=timezone.now()
+    )
+
+def active_template_prefetch(lookup='policytemplate_set'):
+    """
+    Prefetch the ACTIVE template of each policy, with its steps and step
+    fields, into ``active_templates`` so serializers can skip per-row queries.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=PolicyTemplate.objects.filter(
+            status=TemplateStatus.ACTIVE
+        ).prefetch_related(
+            'policystep_set',
+            'policystep_set__policystepfield_set'
+        ),
+        to_attr='active_templates'
+    )
+
+class PolicyQuerySet(OrgScopedQuerySet):
+    def with_active_template(self):
+        return self.prefetch_related(active_template_prefetch())
+
 class Policy(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=512)
@@ -56,6 +110,19 @@ class Policy(models.Model):
         choices=EnforcementType.choices,
         default=EnforcementType.OPTIONAL
     )
+    # Bumped whenever the policy or any of its templates, steps or fields change
+    revision = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    org_lookup = 'org_id'
+    objects = PolicyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='policy_updated_at_idx'),
+            # Keyset pagination of one tenant's policies
+            models.Index(fields=['org', 'id'], name='policy_org_id_idx'),
+        ]
 
     def __str__(self)-> str:
         return f"{self.id} - {self.name}"
@@ -65,8 +132,14 @@ class DeptPolicy(models.Model):
     dept = models.ForeignKey(Dept, on_delete=models.CASCADE)
     policy = models.ForeignKey(Policy, on_delete=models.CASCADE)
 
+    org_lookup = 'policy__org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Dept Policies"
+        constraints = [
+            models.UniqueConstraint(fields=['dept', 'policy'], name='unique_dept_policy'),
+        ]
 
     def __str__(self):
         return f"{self.dept.name} - {self.policy.name}"
@@ -86,9 +159,25 @@ class PolicyTemplate(models.Model):
         blank=True,
         on_delete=models.SET_NULL
     )
+    # Bumped whenever the template or any of its steps or fields change
+    revision = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    org_lookup = 'policy__org_id'
+    objects = OrgScopedQuerySet.as_manager()
 
     class Meta:
-        unique_together = ['policy', 'status']
+        indexes = [
+            models.Index(fields=['updated_at'], name='template_updated_at_idx'),
+        ]
+        constraints = [
+            # Only one ACTIVE template per policy; any number of DRAFT/ARCHIVED ones
+            models.UniqueConstraint(
+                fields=['policy'],
+                condition=models.Q(status=TemplateStatus.ACTIVE),
+                name='unique_active_template_per_policy'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.policy.name} - v{self.version} ({self.status})"
@@ -120,6 +209,14 @@ class FieldValueType(models.TextChoices):
     STRING = 'STRING', 'String'
     DATETIME = 'DATETIME', 'DateTime'
 
+# PolicyStepFieldValue column holding the typed value for each FieldValueType
+FIELD_VALUE_COLUMNS = {
+    FieldValueType.NUMBER: 'value_number',
+    FieldValueType.BOOLEAN: 'value_bool',
+    FieldValueType.STRING: 'value_text',
+    FieldValueType.DATETIME: 'value_datetime',
+}
+
 class PolicyStepField(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     policy_step = models.ForeignKey(PolicyStep, on_delete=models.CASCADE)  # Added this relationship
@@ -137,14 +234,48 @@ class PolicyStepField(models.Model):
 class PolicyAcknowledgment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     policy_template = models.ForeignKey(PolicyTemplate, on_delete=models.CASCADE)
+    # Denormalized from policy_template so open requests can be constrained per policy
+    policy = models.ForeignKey(Policy, on_delete=models.CASCADE)
+    # Denormalized from policy so tenant queries range-scan org-leading indexes
+    org = models.ForeignKey(Org, on_delete=models.CASCADE, db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     is_acknowledged = models.BooleanField(default=False)
     acknowledged_at = models.DateTimeField(null=True, blank=True)
     requested_at = models.DateTimeField(auto_now_add=True)
+    # Deadline for pending requests, renewal date for acknowledged recurring ones
+    due_at = models.DateTimeField(null=True, blank=True)
     expired_at = models.DateTimeField(null=True, blank=True)
     is_recurring = models.BooleanField(default=False)
     is_user_initiated = models.BooleanField(default=False)
 
+    org_lookup = 'org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the acknowledgment list
+            models.Index(fields=['requested_at', 'id'], name='ack_requested_at_id_idx'),
+            # The same per tenant; also serves as the index of the org foreign key
+            models.Index(fields=['org', 'requested_at', 'id'], name='ack_org_requested_at_id_idx'),
+            # Range scan for the expiration sweeper over the requests it may
+            # still act on; same condition as core.sweeper.due_acknowledgments
+            models.Index(
+                fields=['due_at'],
+                condition=(
+                    models.Q(is_acknowledged=False) | models.Q(is_recurring=True)
+                ) & models.Q(expired_at__isnull=True),
+                name='ack_due_at_actionable_idx'
+            ),
+        ]
+        constraints = [
+            # At most one open (unacknowledged, unexpired) request per user and policy
+            models.UniqueConstraint(
+                fields=['user', 'policy'],
+                condition=models.Q(is_acknowledged=False, expired_at__isnull=True),
+                name='unique_open_acknowledgment_per_user_policy'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.policy_template.policy.name} - {self.user}"
 
@@ -162,7 +293,132 @@ class PolicyStepFieldValue(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     policy_acknowledgment_step = models.ForeignKey(PolicyAcknowledgmentStep, on_delete=models.CASCADE)
     policy_step_field = models.ForeignKey(PolicyStepField, on_delete=models.CASCADE)
+    # Canonical text form; the typed column matching the field's type is also set
     field_value = models.TextField()
+    value_number = models.DecimalField(max_digits=30, decimal_places=10, null=True, blank=True)
+    value_bool = models.BooleanField(null=True, blank=True)
+    value_datetime = models.DateTimeField(null=True, blank=True)
+    value_text = models.TextField(null=True, blank=True)
+
+    org_lookup = 'policy_acknowledgment_step__policy_acknowledgment__org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Range predicates on a field's values, e.g. scores below 80
+            models.Index(
+                fields=['policy_step_field', 'value_number'],
+                condition=models.Q(value_number__isnull=False),
+                name='field_value_number_idx'
+            ),
+            models.Index(
+                fields=['policy_step_field', 'value_datetime'],
+                condition=models.Q(value_datetime__isnull=False),
+                name='field_value_datetime_idx'
+            ),
+            models.Index(
+                fields=['policy_step_field', 'value_bool'],
+                condition=models.Q(value_bool__isnull=False),
+                name='field_value_bool_idx'
+            ),
+        ]
+        constraints = [
+            # One value per field of a submitted step; submissions upsert on it
+            models.UniqueConstraint(
+                fields=['policy_acknowledgment_step', 'policy_step_field'],
+                name='unique_step_field_value'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.policy_step_field.field_name}: {self.field_value}"
+class ComplianceSummary(models.Model):
+    """
+    Acknowledgment counters per (org, dept, policy, template), maintained
+    incrementally by core.compliance and rebuilt by rebuild_compliance_summary.
+    requested_count and acknowledged_count cover current requests only: a
+    request leaves them when it expires, is reissued or is renewed, so each
+    user counts once per policy. expired_count keeps the lapsed requests.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    org = models.ForeignKey(Org, on_delete=models.CASCADE)
+    dept = models.ForeignKey(Dept, on_delete=models.CASCADE)
+    policy = models.ForeignKey(Policy, on_delete=models.CASCADE)
+    policy_template = models.ForeignKey(PolicyTemplate, on_delete=models.CASCADE)
+    requested_count = models.PositiveIntegerField(default=0)
+    acknowledged_count = models.PositiveIntegerField(default=0)
+    expired_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    org_lookup = 'org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "Compliance Summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['org', 'dept', 'policy', 'policy_template'],
+                name='unique_compliance_summary_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.policy_id} / {self.dept_id}: {self.acknowledged_count}/{self.requested_count}"
+
+class PendingAcknowledgment(models.Model):
+    """
+    Per-user inbox of open acknowledgment requests, denormalized so "what do I
+    still need to acknowledge?" is one index range scan. A row exists exactly
+    while its request is neither acknowledged nor expired; core.inbox keeps it
+    in step at every write site and rebuild_inbox recomputes it.
+    """
+    acknowledgment = models.OneToOneField(PolicyAcknowledgment, on_delete=models.CASCADE, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    policy = models.ForeignKey(Policy, on_delete=models.CASCADE)
+    policy_template = models.ForeignKey(PolicyTemplate, on_delete=models.CASCADE)
+    policy_name = models.CharField(max_length=512)
+    template_version = models.CharField(max_length=10)
+    requested_at = models.DateTimeField()
+    due_at = models.DateTimeField(null=True, blank=True)
+    steps_total = models.PositiveIntegerField(default=0)
+    steps_acknowledged = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'requested_at', 'acknowledgment'], name='inbox_user_requested_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.policy_name} ({self.steps_acknowledged}/{self.steps_total})"
+
+class Job(models.Model):
+    """
+    Background work run by core.jobs workers. ``visible_at`` is when the job
+    can next be claimed: its enqueue or retry time while QUEUED, the end of
+    the claiming worker's lease while RUNNING.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    org = models.ForeignKey(Org, null=True, blank=True, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=16, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    visible_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    org_lookup = 'org_id'
+    objects = OrgScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'visible_at'], name='job_claim_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.policy_step_field.field_name}: {self.field_value}"
\ No newline at end of file
+        return f"{self.kind} {self.id}: {self.status}"
@@ -0,0 +1,38 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the view's ``pagination_ordering``, so every
+    page is an index range scan from the cursor position rather than an OFFSET.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'pagination_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        The rows paginate_queryset reads for this request, including the one
+        past the page that decides the next link, as an unevaluated queryset
+        for ETags; None when the request is not paginated
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request)
+        offset, reverse, position = cursor if cursor else (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(ordering) if reverse else ordering))
+        if position is not None:
+            order = ordering[0]
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            queryset = queryset.filter(**{f"{order.lstrip('-')}__{lookup}": position})
+        return queryset[offset:offset + page_size + 1]
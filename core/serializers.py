@@ -1,12 +1,34 @@
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Policy, Dept, DeptPolicy, PolicyTemplate, PolicyStep, TemplateStatus, PolicyAcknowledgment
+from .cache import active_template_cache
+from .fieldsets import SparseFieldsMixin
+from .jobs import JOB_HANDLERS
+from .services import MigrationMode, bulk_create_templates
+from .tenancy import request_org_id
+from .models import Policy, Dept, DeptPolicy, PolicyTemplate, PolicyStep, PolicyStepField, TemplateStatus, PolicyAcknowledgment, PendingAcknowledgment, PolicyStepFieldValue, ComplianceSummary, Job
+
+class PolicyStepFieldSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = PolicyStepField
+        fields = ["id", "field_name", "field_key", "field_value_type"]
+
+class PolicyStepSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    fields = PolicyStepFieldSerializer(source='policystepfield_set', many=True, required=False)
 
-class PolicyStepSerializer(serializers.ModelSerializer):
     class Meta:
         model = PolicyStep
-        fields = ["id", "name", "description", "knowledge_document"]
+        fields = ["id", "name", "description", "knowledge_document", "fields"]
 
-class PolicyTemplateReadSerializer(serializers.ModelSerializer):
+    def validate_fields(self, value):
+        keys = [field['field_key'] for field in value]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("Field keys must be unique within a step")
+        return value
+
+class PolicyTemplateReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     steps = PolicyStepSerializer(source='policystep_set', many=True, read_only=True)
     id = serializers.UUIDField(read_only=True)
 
@@ -14,12 +36,31 @@ class PolicyTemplateReadSerializer(serializers.ModelSerializer):
         model = PolicyTemplate
         fields = ["id", "version", "status", "approved_by", "steps"]
 
+class PolicyTemplateBulkCreateSerializer(serializers.ListSerializer):
+    def validate(self, data):
+        """
+        Check every referenced policy exists with a single query
+        """
+        policy_ids = {template['policy_id'] for template in data}
+        policies = Policy.objects.for_org(request_org_id(self.context['request'])).filter(id__in=policy_ids)
+        missing = policy_ids - set(policies.values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                {"policy_id": f"Invalid policy ID(s): {', '.join(sorted(str(i) for i in missing))}"}
+            )
+        return data
+
+    def create(self, validated_data):
+        return bulk_create_templates(validated_data)
+
 class PolicyTemplateCreateSerializer(serializers.ModelSerializer):
     steps = PolicyStepSerializer(many=True)
+    policy_id = serializers.UUIDField(required=False)
     
     class Meta:
         model = PolicyTemplate
-        fields = ['version', 'steps']
+        fields = ['policy_id', 'version', 'steps']
+        list_serializer_class = PolicyTemplateBulkCreateSerializer
 
     def validate(self, data):
         # For nested route, get policy_id from URL
@@ -28,16 +69,21 @@ class PolicyTemplateCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"policy_id": "Policy ID is required"})
         
         if policy_id:
-            data['policy_id'] = policy_id
-            
+            # Compared against UUIDs by PolicyTemplateBulkCreateSerializer
+            try:
+                data['policy_id'] = uuid.UUID(str(policy_id))
+            except ValueError:
+                raise serializers.ValidationError({"policy_id": "Invalid policy ID"})
+
         return data
         
     def validate_policy_id(self, value):
+        if self.parent is not None:
+            # Checked for the whole payload by PolicyTemplateBulkCreateSerializer
+            return value
+        policies = Policy.objects.for_org(request_org_id(self.context['request']))
         try:
-            policy = Policy.objects.get(
-                id=value,
-                org=self.context['request'].user.org
-            )
+            policy = policies.get(id=value)
             return policy.id
         except Policy.DoesNotExist:
             raise serializers.ValidationError("Invalid policy ID")
@@ -51,35 +97,19 @@ class PolicyTemplateCreateSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        steps_data = validated_data.pop('steps')
-        policy_id = validated_data.pop('policy_id')
-        
-        template = PolicyTemplate.objects.create(
-            policy_id=policy_id,
-            status='DRAFT',
-            **validated_data
-        )
-        
-        for step_data in steps_data:
-            fields_data = step_data.pop('fields', [])
-            step = PolicyStep.objects.create(
-                policy_template=template,
-                **step_data
-            )
-            
-            for field_data in fields_data:
-                PolicyStepField.objects.create(
-                    policy_step=step,
-                    **field_data
-                )
-        
-        return template
+        return bulk_create_templates([validated_data])[0]
 
     
 class PolicyTemplateUpdateSerializer(serializers.ModelSerializer):
+    migration = serializers.ChoiceField(
+        choices=MigrationMode.choices,
+        default=MigrationMode.KEEP,
+        write_only=True
+    )
+
     class Meta:
         model = PolicyTemplate
-        fields = ['approved_by']
+        fields = ['approved_by', 'migration']
         
     def validate(self, attrs):
         template = self.instance
@@ -98,30 +128,82 @@ class PolicyTemplateUpdateSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class PolicySerializer(serializers.ModelSerializer):
+def resolve_active_templates(context, policy_ids, versions=None):
+    """
+    Fetch the cached active templates of all listed policies in one call and
+    keep them in the serializer context for PolicySerializer.get_active_template
+    """
+    context.setdefault('active_templates', {}).update(
+        active_template_cache.get_many(policy_ids, versions)
+    )
+
+class PolicyListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        policies = list(data.all() if hasattr(data, 'all') else data)
+        if 'active_template' in self.child.fields:
+            resolve_active_templates(
+                self.context,
+                [policy.id for policy in policies],
+                {policy.id: policy.revision for policy in policies}
+            )
+        return super().to_representation(policies)
+
+class PolicySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     active_template = serializers.SerializerMethodField()
+    expandable_fields = ('active_template',)
+    # Policy.revision also moves with its templates, so no cached template
+    # older than the row is served alongside it
+    cache_key_fields = ('revision',)
 
     class Meta:
         model = Policy
         fields = ["id", "name", "org", "description", "compliance_framework", "enforcement_type", "active_template"]
+        list_serializer_class = PolicyListSerializer
 
     def get_active_template(self, obj):
-        active_template = obj.policytemplate_set.filter(status="ACTIVE").first()
-        return PolicyTemplateReadSerializer(active_template).data if active_template else None
+        resolved = self.context.get('active_templates', {})
+        if obj.id in resolved:
+            template = resolved[obj.id]
+        else:
+            template = active_template_cache.get(obj.id, version=obj.revision)
+        if self.selection is not None:
+            return self.selection.child('active_template').prune(template)
+        return template
     
-class PolicyAcknowledgmentSerializer(serializers.ModelSerializer):
+class PolicyAcknowledgmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PolicyAcknowledgment
         fields = '__all__'
-        read_only_fields = ('id', 'acknowledged_at', 'requested_at')
+        # Requests are created by the view; the user and template are not
+        # re-pointed afterwards, which would also bypass the org checks.
+        # Acknowledgment and expiry go through the acknowledge action and the
+        # sweeper, which keep the compliance summary and the inbox in step.
+        read_only_fields = ('id', 'policy', 'org', 'user', 'policy_template', 'is_acknowledged',
+                            'acknowledged_at', 'requested_at', 'expired_at')
 
 
-class DeptSerializer(serializers.ModelSerializer):
+class PendingAcknowledgmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = PendingAcknowledgment
+        fields = ['acknowledgment', 'policy', 'policy_name', 'policy_template', 'template_version',
+                  'requested_at', 'due_at', 'steps_total', 'steps_acknowledged']
+
+
+class DeptSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Dept
-        fields = ['id', 'name']
+        fields = ['id', 'org', 'name']
+        read_only_fields = ('org',)
+
+class DeptPolicyListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        dept_policies = list(data.all() if hasattr(data, 'all') else data)
+        policy = self.child.fields.get('policy')
+        if isinstance(policy, PolicySerializer) and 'active_template' in policy.fields:
+            resolve_active_templates(self.context, [dept_policy.policy_id for dept_policy in dept_policies])
+        return super().to_representation(dept_policies)
 
-class DeptPolicySerializer(serializers.ModelSerializer):
+class DeptPolicySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     dept = DeptSerializer(read_only=True)
     policy = PolicySerializer(read_only=True)
     dept_id = serializers.UUIDField(write_only=True)
@@ -130,21 +212,99 @@ class DeptPolicySerializer(serializers.ModelSerializer):
     class Meta:
         model = DeptPolicy
         fields = ['id', 'dept', 'policy', 'dept_id', 'policy_id']
+        list_serializer_class = DeptPolicyListSerializer
 
     def validate(self, data):
         """
-        Check that the dept and policy exist
+        Check that the dept and policy exist in the requesting org and belong together
         """
+        org_id = request_org_id(self.context['request'])
         try:
-            dept = Dept.objects.get(id=data['dept_id'])
-            policy = Policy.objects.get(id=data['policy_id'])
+            dept = Dept.objects.for_org(org_id).get(id=data['dept_id'])
+            policy = Policy.objects.for_org(org_id).get(id=data['policy_id'])
         except Dept.DoesNotExist:
             raise serializers.ValidationError({"dept_id": "Department does not exist"})
         except Policy.DoesNotExist:
             raise serializers.ValidationError({"policy_id": "Policy does not exist"})
+        if dept.org_id is not None and dept.org_id != policy.org_id:
+            raise serializers.ValidationError("Department and policy belong to different orgs")
             
         # Check if the combination already exists
         if DeptPolicy.objects.filter(dept=dept, policy=policy).exists():
             raise serializers.ValidationError("This department-policy combination already exists")
             
         return data
+
+
+def acknowledged_percentage(acknowledged, requested):
+    return round(100 * acknowledged / requested, 2) if requested else None
+
+
+class ComplianceSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    acknowledged_percentage = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ComplianceSummary
+        fields = ['org', 'dept', 'policy', 'policy_template', 'requested_count',
+                  'acknowledged_count', 'expired_count', 'acknowledged_percentage', 'updated_at']
+
+    def get_acknowledged_percentage(self, obj):
+        return acknowledged_percentage(obj.acknowledged_count, obj.requested_count)
+
+
+class PolicyStepFieldValueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    policy_acknowledgment = serializers.UUIDField(
+        source='policy_acknowledgment_step.policy_acknowledgment_id', read_only=True
+    )
+    field_key = serializers.CharField(source='policy_step_field.field_key', read_only=True)
+    field_value_type = serializers.CharField(source='policy_step_field.field_value_type', read_only=True)
+
+    class Meta:
+        model = PolicyStepFieldValue
+        fields = ['id', 'policy_acknowledgment', 'policy_acknowledgment_step', 'policy_step_field',
+                  'field_key', 'field_value_type', 'field_value']
+
+
+class StepSubmissionSerializer(serializers.Serializer):
+    step_id = serializers.UUIDField()
+    values = serializers.DictField(required=False, default=dict)
+    step_report_document = serializers.CharField(max_length=512, required=False, allow_blank=True, allow_null=True)
+
+class StepBatchSubmissionSerializer(serializers.Serializer):
+    steps = StepSubmissionSerializer(many=True, allow_empty=False)
+
+
+class BulkAcknowledgeSerializer(serializers.Serializer):
+    # Items are parsed one by one by bulk_acknowledge, so a malformed item
+    # fails alone rather than the whole import
+    items = serializers.ListField(
+        allow_empty=False,
+        max_length=getattr(settings, 'BULK_ACKNOWLEDGE_MAX_ITEMS', 100000)
+    )
+    acknowledged_at = serializers.DateTimeField(required=False)
+
+    def validate_acknowledged_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Cannot be in the future")
+        return value
+
+
+class EffectivePoliciesRequestSerializer(serializers.Serializer):
+    users = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'EFFECTIVE_POLICIES_MAX_USERS', 50000)
+    )
+
+
+class JobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'payload', 'result', 'error', 'attempts', 'max_attempts',
+                  'created_at', 'started_at', 'finished_at']
+
+
+class JobCreateSerializer(serializers.Serializer):
+    # Payloads are checked by the handler when the job runs; a bad one fails the job
+    kind = serializers.ChoiceField(choices=sorted(JOB_HANDLERS))
+    payload = serializers.DictField(required=False, default=dict)
@@ -0,0 +1,505 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from .cache import active_template_cache
+from .compliance import increment_summary, increment_summary_counts, summary_counts
+from .concurrency import lock_policy, retry_on_conflict
+from .inbox import add_to_inbox, inbox_entry, remove_from_inbox
+from .models import (DeptPolicy,
+                     Policy,
+                     User,
+                     PolicyTemplate,
+                     PolicyTemplateLog,
+                     PolicyStep,
+                     PolicyStepField,
+                     TemplateStatus,
+                     PolicyAcknowledgment,
+                     PolicyAcknowledgmentStep,
+                     bump_revision)
+
+BULK_CREATE_BATCH_SIZE = 1000
+BULK_ACKNOWLEDGE_CHUNK_SIZE = 500
+
+
+class MigrationMode:
+    """
+    What happens to open acknowledgments of a template that is archived by activation
+    """
+    KEEP = 'keep'
+    EXPIRE = 'expire'
+    REISSUE = 'reissue'
+
+    choices = [KEEP, EXPIRE, REISSUE]
+
+
+def renewal_due_at(acknowledged_at):
+    """
+    When an acknowledged recurring request comes due again
+    """
+    return acknowledged_at + timedelta(days=settings.ACKNOWLEDGMENT_RECURRENCE_DAYS)
+
+
+def insert_open_acknowledgments(acknowledgments, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Bulk-insert new open requests, skipping those that conflict with an open
+    request of the same user and policy created concurrently. Returns the
+    ones inserted.
+    """
+    PolicyAcknowledgment.objects.bulk_create(acknowledgments, batch_size=batch_size, ignore_conflicts=True)
+    inserted = set()
+    for chunk in chunked([acknowledgment.id for acknowledgment in acknowledgments], batch_size):
+        inserted.update(PolicyAcknowledgment.objects.filter(id__in=chunk).values_list('id', flat=True))
+    return [acknowledgment for acknowledgment in acknowledgments if acknowledgment.id in inserted]
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_acknowledgments(policy_id):
+    """
+    Acknowledgment requests for a policy that are neither acknowledged nor expired
+    """
+    return PolicyAcknowledgment.objects.filter(
+        policy_id=policy_id,
+        is_acknowledged=False,
+        expired_at__isnull=True
+    )
+
+
+@retry_on_conflict
+def request_acknowledgment(policy_id, user, due_at=None, is_recurring=False, is_user_initiated=False):
+    """
+    Request an acknowledgment of the policy's ACTIVE template from one user,
+    with its steps, summary counters and inbox row, unless the user already
+    has an open request. The policy row is locked first so the request
+    cannot interleave with an activation of the same policy; the partial
+    unique constraint on open requests settles anything that gets past it.
+    Returns (acknowledgment, created), or None without an ACTIVE template.
+    """
+    with transaction.atomic():
+        policy = lock_policy(Policy.objects.all(), policy_id)
+        template = active_template_cache.get(policy.id)
+        if template and not PolicyTemplate.objects.filter(
+            id=template['id'], status=TemplateStatus.ACTIVE
+        ).exists():
+            # Cached before an activation that has since committed
+            active_template_cache.invalidate(policy.id)
+            template = active_template_cache.get(policy.id)
+        if not template:
+            return None
+
+        existing = open_acknowledgments(policy.id).filter(user=user).first()
+        if existing:
+            return existing, False
+        try:
+            with transaction.atomic():
+                acknowledgment = PolicyAcknowledgment.objects.create(
+                    policy_template_id=template['id'],
+                    policy=policy,
+                    org_id=policy.org_id,
+                    user=user,
+                    is_recurring=is_recurring,
+                    is_user_initiated=is_user_initiated,
+                    requested_at=timezone.now(),
+                    due_at=due_at
+                )
+        except IntegrityError:
+            return open_acknowledgments(policy.id).get(user=user), False
+
+        PolicyAcknowledgmentStep.objects.bulk_create([
+            PolicyAcknowledgmentStep(
+                policy_acknowledgment=acknowledgment,
+                policy_step_id=step['id']
+            )
+            for step in template['steps']
+        ])
+        increment_summary('requested_count', [
+            (policy.org_id, user.dept_id, policy.id, template['id'])
+        ])
+        add_to_inbox([inbox_entry(acknowledgment, policy.name, template['version'], len(template['steps']))])
+    return acknowledgment, True
+
+
+@retry_on_conflict
+def run_acknowledgment_campaign(policy_id, is_recurring=False, due_at=None, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Request an acknowledgment of the policy's ACTIVE template from every user
+    in a department the policy is assigned to, skipping users who already
+    have an open request, including one created concurrently. Returns the
+    per-run counts and timing, or None without an ACTIVE template.
+    """
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        # Serialises with activation, so the template read below stays ACTIVE
+        try:
+            policy = lock_policy(Policy.objects.all(), policy_id)
+        except Policy.DoesNotExist:
+            return None
+        policy_template = PolicyTemplate.objects.filter(
+            policy_id=policy_id,
+            status=TemplateStatus.ACTIVE
+        ).first()
+        if not policy_template:
+            return None
+
+        step_ids = list(
+            PolicyStep.objects.filter(
+                policy_template=policy_template
+            ).values_list('id', flat=True)
+        )
+
+        targeted_users = User.objects.filter(
+            dept_id__in=DeptPolicy.objects.filter(policy_id=policy_id).values('dept_id')
+        )
+        pending_users = targeted_users.filter(
+            ~Exists(open_acknowledgments(policy_id).filter(user_id=OuterRef('pk')))
+        )
+
+        created_acknowledgments = 0
+        created_steps = 0
+        # Materialised up front so the inserts below cannot feed back into the anti-join
+        users = list(pending_users.values_list('id', 'dept_id'))
+        depts = dict(users)
+        for chunk in chunked(users, batch_size):
+            acknowledgments = insert_open_acknowledgments([
+                PolicyAcknowledgment(
+                    id=uuid.uuid4(),
+                    policy_template_id=policy_template.id,
+                    policy_id=policy_id,
+                    org_id=policy.org_id,
+                    user_id=user_id,
+                    due_at=due_at,
+                    is_recurring=is_recurring
+                )
+                for user_id, _ in chunk
+            ], batch_size)
+            created_acknowledgments += len(acknowledgments)
+
+            steps = [
+                PolicyAcknowledgmentStep(
+                    policy_acknowledgment_id=acknowledgment.id,
+                    policy_step_id=step_id
+                )
+                for acknowledgment in acknowledgments
+                for step_id in step_ids
+            ]
+            PolicyAcknowledgmentStep.objects.bulk_create(steps, batch_size=batch_size)
+            created_steps += len(steps)
+            add_to_inbox([
+                inbox_entry(acknowledgment, policy.name, policy_template.version, len(step_ids))
+                for acknowledgment in acknowledgments
+            ])
+            increment_summary('requested_count', (
+                (policy.org_id, depts[acknowledgment.user_id], policy_id, policy_template.id)
+                for acknowledgment in acknowledgments
+            ))
+
+        targeted_count = targeted_users.count()
+    return {
+        'policy_id': str(policy_id),
+        'policy_template_id': str(policy_template.id),
+        'targeted_users': targeted_count,
+        'skipped_users': targeted_count - created_acknowledgments,
+        'created_acknowledgments': created_acknowledgments,
+        'created_steps': created_steps,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+class BulkAcknowledgeStatus:
+    """
+    Outcome of one item of bulk_acknowledge
+    """
+    ACKNOWLEDGED = 'acknowledged'
+    ALREADY_ACKNOWLEDGED = 'already_acknowledged'
+    EXPIRED = 'expired'
+    NOT_FOUND = 'not_found'
+    DUPLICATE = 'duplicate'
+    INVALID = 'invalid'
+
+    choices = [ACKNOWLEDGED, ALREADY_ACKNOWLEDGED, EXPIRED, NOT_FOUND, DUPLICATE, INVALID]
+
+
+def parse_acknowledgment_ref(item):
+    """
+    ('id', id) for an acknowledgment id or ``{'id': ...}``, ('pair', (user_id,
+    policy_id)) for ``{'user': ..., 'policy': ...}``, (None, error) otherwise
+    """
+    try:
+        if isinstance(item, str):
+            return 'id', uuid.UUID(item)
+        if isinstance(item, dict) and 'id' in item:
+            return 'id', uuid.UUID(str(item['id']))
+        if isinstance(item, dict) and 'user' in item and 'policy' in item:
+            return 'pair', (uuid.UUID(str(item['user'])), uuid.UUID(str(item['policy'])))
+    except ValueError:
+        return None, 'Not a valid UUID'
+    return None, 'Expected an acknowledgment id or a user and a policy'
+
+
+def bulk_acknowledge(items, org_id=None, acknowledged_at=None, chunk_size=BULK_ACKNOWLEDGE_CHUNK_SIZE):
+    """
+    Acknowledge many requests, each given as an acknowledgment id or as a
+    (user, policy) pair standing for the user's open request of the policy.
+    Chunks are processed in their own transactions. Each chunk is validated
+    with one query and acknowledged with one UPDATE, along with its summary
+    counters, inbox rows and any steps still open, which were completed
+    wherever the acknowledgment was collected. Returns one result dict per
+    item, in input order.
+    """
+    acknowledged_at = acknowledged_at or timezone.now()
+    results = []
+    seen = set()
+    for chunk in chunked(items, chunk_size):
+        chunk_results = acknowledge_chunk(chunk, org_id, acknowledged_at, seen)
+        seen.update(result['id'] for result in chunk_results if 'id' in result)
+        results.extend(chunk_results)
+    return results
+
+
+@retry_on_conflict
+def acknowledge_chunk(items, org_id, acknowledged_at, seen):
+    refs = [parse_acknowledgment_ref(item) for item in items]
+    ids = {ref for kind, ref in refs if kind == 'id'}
+    pairs = {ref for kind, ref in refs if kind == 'pair'}
+
+    with transaction.atomic():
+        # Pairs match only their open request, so closed history is not locked
+        open_pairs = Q()
+        for user_id, policy_id in pairs:
+            open_pairs |= Q(user_id=user_id, policy_id=policy_id)
+        if pairs:
+            open_pairs &= Q(is_acknowledged=False, expired_at__isnull=True)
+        candidates = PolicyAcknowledgment.objects.for_org(org_id).filter(Q(id__in=ids) | open_pairs)
+        if connection.features.has_select_for_update:
+            candidates = candidates.select_for_update()
+        by_id = {}
+        by_pair = {}
+        for row in candidates.values_list('id', 'user_id', 'policy_id', 'is_acknowledged', 'expired_at'):
+            by_id[row[0]] = row
+            pair = row[1:3]
+            if pair in pairs and is_open(row):
+                by_pair[pair] = row
+
+        results = []
+        acknowledged = []
+        claimed = set()
+        for kind, ref in refs:
+            if kind is None:
+                results.append({'status': BulkAcknowledgeStatus.INVALID, 'error': ref})
+                continue
+            if kind == 'id':
+                result, row = {}, by_id.get(ref)
+            else:
+                result, row = {'user': str(ref[0]), 'policy': str(ref[1])}, by_pair.get(ref)
+            if row is None:
+                result = {'id': ref} if kind == 'id' else result
+                results.append({**result, 'status': BulkAcknowledgeStatus.NOT_FOUND})
+                continue
+            acknowledgment_id, _, _, is_acknowledged, expired_at = row
+            if acknowledgment_id in seen or acknowledgment_id in claimed:
+                status = BulkAcknowledgeStatus.DUPLICATE
+            elif is_acknowledged:
+                status = BulkAcknowledgeStatus.ALREADY_ACKNOWLEDGED
+            elif expired_at is not None:
+                status = BulkAcknowledgeStatus.EXPIRED
+            else:
+                status = BulkAcknowledgeStatus.ACKNOWLEDGED
+                acknowledged.append(acknowledgment_id)
+            claimed.add(acknowledgment_id)
+            results.append({'id': acknowledgment_id, **result, 'status': status})
+
+        if acknowledged:
+            acknowledgments = PolicyAcknowledgment.objects.filter(id__in=acknowledged)
+            increment_summary_counts('acknowledged_count', summary_counts(acknowledgments))
+            acknowledgments.filter(is_recurring=True).update(due_at=renewal_due_at(acknowledged_at))
+            acknowledgments.update(is_acknowledged=True, acknowledged_at=acknowledged_at)
+            PolicyAcknowledgmentStep.objects.filter(
+                policy_acknowledgment_id__in=acknowledged,
+                is_acknowledged=False
+            ).update(is_acknowledged=True)
+            remove_from_inbox(acknowledged)
+    return results
+
+
+def is_open(row):
+    return not row[3] and row[4] is None
+
+
+@retry_on_conflict
+def activate_template(template_id, approved_by, migration=MigrationMode.KEEP):
+    """
+    Make a DRAFT template its policy's ACTIVE one, archiving the current
+    ACTIVE template and applying ``migration`` to its open acknowledgments.
+    The policy row is locked before either template is read, so concurrent
+    activations and acknowledgment requests of the policy queue up instead
+    of racing; the partial unique constraint on ACTIVE templates backs it.
+    Raises ValidationError unless the template is still a DRAFT. Returns the
+    template and the migration counts.
+    """
+    with transaction.atomic():
+        policy_id = PolicyTemplate.objects.values_list('policy_id', flat=True).get(id=template_id)
+        lock_policy(Policy.objects.all(), policy_id)
+        template = PolicyTemplate.objects.get(id=template_id)
+        if template.status != TemplateStatus.DRAFT:
+            raise ValidationError(["Only templates in DRAFT status can be activated"])
+
+        active_template = PolicyTemplate.objects.filter(
+            policy_id=policy_id,
+            status=TemplateStatus.ACTIVE
+        ).first()
+        if active_template:
+            PolicyTemplateLog.objects.create(
+                policy_template=active_template,
+                prev_status=TemplateStatus.ACTIVE,
+                curr_status=TemplateStatus.ARCHIVED,
+                updated_by=approved_by
+            )
+            active_template.status = TemplateStatus.ARCHIVED
+            active_template.save()
+
+        PolicyTemplateLog.objects.create(
+            policy_template=template,
+            prev_status=template.status,
+            curr_status=TemplateStatus.ACTIVE,
+            updated_by=approved_by
+        )
+        template.status = TemplateStatus.ACTIVE
+        template.approved_by = approved_by
+        template.save()
+
+        migrated = migrate_open_acknowledgments(
+            active_template.id if active_template else None,
+            template.id,
+            migration
+        )
+    return template, migrated
+
+
+def migrate_open_acknowledgments(old_template_id, new_template_id, mode, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Apply an activation migration mode to the open acknowledgments of the
+    archived template. ``expire`` stamps them expired with one UPDATE;
+    ``reissue`` additionally requests the same users to acknowledge the new
+    template, writing the new rows with chunked bulk_create. Must run inside
+    the activation transaction. Returns the per-mode counts.
+    """
+    result = {'mode': mode, 'expired': 0, 'reissued': 0, 'created_steps': 0}
+    if mode == MigrationMode.KEEP or old_template_id is None:
+        return result
+
+    pending = PolicyAcknowledgment.objects.filter(
+        policy_template_id=old_template_id,
+        is_acknowledged=False,
+        expired_at__isnull=True
+    )
+    counts = summary_counts(pending)
+    reissue_rows = []
+    if mode == MigrationMode.REISSUE:
+        reissue_rows = list(pending.values_list(
+            'policy_id', 'org_id', 'user_id', 'due_at', 'is_recurring', 'is_user_initiated'
+        ))
+
+    remove_from_inbox(pending.values('id'))
+    result['expired'] = pending.update(expired_at=timezone.now())
+    increment_summary_counts('expired_count', counts)
+    increment_summary_counts('requested_count', counts, amount=-1)
+    if mode != MigrationMode.REISSUE:
+        return result
+
+    step_ids = list(
+        PolicyStep.objects.filter(
+            policy_template_id=new_template_id
+        ).values_list('id', flat=True)
+    )
+    policy_name, template_version = PolicyTemplate.objects.filter(
+        id=new_template_id
+    ).values_list('policy__name', 'version').get()
+    for chunk in chunked(reissue_rows, batch_size):
+        acknowledgments = [
+            PolicyAcknowledgment(
+                id=uuid.uuid4(),
+                policy_template_id=new_template_id,
+                policy_id=policy_id,
+                org_id=org_id,
+                user_id=user_id,
+                due_at=due_at,
+                is_recurring=is_recurring,
+                is_user_initiated=is_user_initiated
+            )
+            for policy_id, org_id, user_id, due_at, is_recurring, is_user_initiated in chunk
+        ]
+        PolicyAcknowledgment.objects.bulk_create(acknowledgments, batch_size=batch_size)
+        steps = [
+            PolicyAcknowledgmentStep(
+                policy_acknowledgment_id=acknowledgment.id,
+                policy_step_id=step_id
+            )
+            for acknowledgment in acknowledgments
+            for step_id in step_ids
+        ]
+        PolicyAcknowledgmentStep.objects.bulk_create(steps, batch_size=batch_size)
+        add_to_inbox([
+            inbox_entry(acknowledgment, policy_name, template_version, len(step_ids))
+            for acknowledgment in acknowledgments
+        ])
+        result['reissued'] += len(acknowledgments)
+        result['created_steps'] += len(steps)
+
+    increment_summary_counts('requested_count', [
+        ((org_id, dept_id, policy_id, new_template_id), count)
+        for (org_id, dept_id, policy_id, _), count in counts
+    ])
+    return result
+
+
+@transaction.atomic
+def bulk_create_templates(templates_data):
+    """
+    Create DRAFT templates with their nested steps and fields using one
+    bulk_create per model. Each item holds ``policy_id``, ``version`` and
+    ``steps``; each step may hold its fields under ``policystepfield_set``.
+    Primary keys are assigned up front so children can reference parents.
+    """
+    templates, steps, fields = [], [], []
+    for template_data in templates_data:
+        template = PolicyTemplate(
+            id=uuid.uuid4(),
+            policy_id=template_data['policy_id'],
+            version=template_data['version'],
+            status=TemplateStatus.DRAFT
+        )
+        templates.append(template)
+        for step_data in template_data['steps']:
+            step_data = dict(step_data)
+            fields_data = step_data.pop('policystepfield_set', [])
+            step = PolicyStep(id=uuid.uuid4(), policy_template_id=template.id, **step_data)
+            steps.append(step)
+            fields.extend(
+                PolicyStepField(policy_step_id=step.id, **field_data)
+                for field_data in fields_data
+            )
+
+    PolicyTemplate.objects.bulk_create(templates, batch_size=BULK_CREATE_BATCH_SIZE)
+    PolicyStep.objects.bulk_create(steps, batch_size=BULK_CREATE_BATCH_SIZE)
+    PolicyStepField.objects.bulk_create(fields, batch_size=BULK_CREATE_BATCH_SIZE)
+    # bulk_create sends no signals, so bump the policies behind the ETags here
+    bump_revision(Policy, {template.policy_id for template in templates})
+    return templates
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import active_template_cache, dept_policy_cache
+from .models import (DeptPolicy, PendingAcknowledgment, Policy, PolicyTemplate, PolicyStep, PolicyStepField,
+                     TemplateStatus, bump_revision)
+
+
+def template_changed(policy_id, template_id=None):
+    """
+    Bump the revisions behind the ETags and drop the cached active template once committed
+    """
+    if not policy_id:
+        return
+    if template_id:
+        bump_revision(PolicyTemplate, [template_id])
+    bump_revision(Policy, [policy_id])
+    transaction.on_commit(lambda: active_template_cache.invalidate(policy_id))
+
+
+def assignments_changed(policy_id):
+    """
+    Drop the cached effective policies of the departments the policy is assigned to once committed
+    """
+    dept_ids = list(DeptPolicy.objects.filter(policy_id=policy_id).values_list('dept_id', flat=True))
+    if dept_ids:
+        transaction.on_commit(lambda: dept_policy_cache.invalidate_many(dept_ids))
+
+
+@receiver(post_save, sender=Policy)
+def policy_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_revision(Policy, [instance.id])
+        PendingAcknowledgment.objects.filter(policy_id=instance.id).exclude(
+            policy_name=instance.name
+        ).update(policy_name=instance.name)
+        transaction.on_commit(lambda: active_template_cache.invalidate(instance.id))
+        assignments_changed(instance.id)
+
+
+@receiver([post_save, post_delete], sender=PolicyTemplate)
+def invalidate_template(sender, instance, signal, **kwargs):
+    template_changed(instance.policy_id, instance.id if signal is post_save else None)
+    if instance.status in (TemplateStatus.ACTIVE, TemplateStatus.ARCHIVED):
+        # Activation, archiving or removal of the template the departments resolve to
+        assignments_changed(instance.policy_id)
+
+
+@receiver([post_save, post_delete], sender=DeptPolicy)
+def invalidate_dept_policies(sender, instance, **kwargs):
+    transaction.on_commit(lambda: dept_policy_cache.invalidate(instance.dept_id))
+
+
+@receiver([post_save, post_delete], sender=PolicyStep)
+def invalidate_step(sender, instance, **kwargs):
+    template_changed(
+        PolicyTemplate.objects.filter(
+            id=instance.policy_template_id
+        ).values_list('policy_id', flat=True).first(),
+        instance.policy_template_id
+    )
+
+
+@receiver([post_save, post_delete], sender=PolicyStepField)
+def invalidate_step_field(sender, instance, **kwargs):
+    step = PolicyStep.objects.filter(
+        id=instance.policy_step_id
+    ).values_list('policy_template_id', 'policy_template__policy_id').first()
+    if step:
+        template_changed(step[1], step[0])
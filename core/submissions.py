@@ -0,0 +1,245 @@
+import functools
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .compliance import increment_summary, summary_keys
+from .inbox import remove_from_inbox, update_inbox_progress
+from .services import renewal_due_at
+from .models import (FIELD_VALUE_COLUMNS,
+                     FieldValueType,
+                     PolicyStepField,
+                     PolicyAcknowledgment,
+                     PolicyAcknowledgmentStep,
+                     PolicyStepFieldValue)
+
+
+# Bounds of PolicyStepFieldValue.value_number (max_digits=30, decimal_places=10).
+# Integer digits stop at 18 so a quantized value fits the default decimal
+# precision of 28 digits, with headroom for SQLite's float round trip.
+NUMBER_INTEGER_DIGITS = 18
+NUMBER_QUANTUM = Decimal('1e-10')
+
+
+def coerce_number(value):
+    if isinstance(value, bool):
+        raise ValueError('Expected a number')
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('Expected a number')
+    if not number.is_finite():
+        raise ValueError('Expected a finite number')
+    if number and number.adjusted() >= NUMBER_INTEGER_DIGITS:
+        raise ValueError('Number is out of range')
+    try:
+        return str(number), number.quantize(NUMBER_QUANTUM)
+    except InvalidOperation:
+        raise ValueError('Number is out of range')
+
+
+def coerce_boolean(value):
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        value = value.lower() == 'true'
+    if isinstance(value, bool):
+        return ('true' if value else 'false'), value
+    raise ValueError('Expected a boolean')
+
+
+def coerce_string(value):
+    if not isinstance(value, str):
+        raise ValueError('Expected a string')
+    return value, value
+
+
+def coerce_datetime(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError('Expected an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed.isoformat(), parsed
+
+
+# Each coercer returns (canonical text, typed value) or raises ValueError
+FIELD_COERCERS = {
+    FieldValueType.NUMBER: coerce_number,
+    FieldValueType.BOOLEAN: coerce_boolean,
+    FieldValueType.STRING: coerce_string,
+    FieldValueType.DATETIME: coerce_datetime,
+}
+
+
+def field_value_columns(field_value_type, value):
+    """
+    Coerce ``value`` and return the PolicyStepFieldValue columns to store:
+    the text form plus every typed column, with only the one matching
+    ``field_value_type`` set. Raises ValueError for invalid values.
+    """
+    text, typed = FIELD_COERCERS[field_value_type](value)
+    columns = dict.fromkeys(FIELD_VALUE_COLUMNS.values())
+    columns[FIELD_VALUE_COLUMNS[field_value_type]] = typed
+    columns['field_value'] = text
+    return columns
+
+
+VALUE_PREDICATES = ('eq', 'lt', 'lte', 'gt', 'gte')
+RANGE_TYPES = (FieldValueType.NUMBER, FieldValueType.DATETIME)
+
+
+def field_value_predicates(field_value_type, params):
+    """
+    Build filter kwargs on the typed column for the ``eq``/``lt``/``lte``/
+    ``gt``/``gte`` parameters present in ``params``, coercing each operand
+    like a submitted value. Raises ValueError naming the offending parameter.
+    """
+    column = FIELD_VALUE_COLUMNS[field_value_type]
+    predicates = {}
+    for name in VALUE_PREDICATES:
+        operand = params.get(name)
+        if operand is None:
+            continue
+        if name != 'eq' and field_value_type not in RANGE_TYPES:
+            raise ValueError(f'{name} is only supported for NUMBER and DATETIME fields')
+        try:
+            _, typed = FIELD_COERCERS[field_value_type](operand)
+        except ValueError as e:
+            raise ValueError(f'{name}: {e}')
+        predicates[column if name == 'eq' else f'{column}__{name}'] = typed
+    return predicates
+
+
+@functools.lru_cache(maxsize=256)
+def template_validators(template_id, revision):
+    """
+    {policy_step_id: {field_key: (policy_step_field_id, field_value_type)}} for a template.
+    Keyed by revision so edits to the template's fields compile a fresh entry.
+    """
+    validators = {}
+    for step_id, field_id, field_key, field_value_type in PolicyStepField.objects.filter(
+        policy_step__policy_template_id=template_id
+    ).values_list('policy_step_id', 'id', 'field_key', 'field_value_type'):
+        validators.setdefault(step_id, {})[field_key] = (field_id, field_value_type)
+    return validators
+
+
+def validate_values(step_validators, values):
+    """
+    Coerce submitted values for one step; every declared field is required
+    and unknown keys are rejected. Returns [(policy_step_field_id, columns)]
+    with the columns from field_value_columns.
+    """
+    errors = {}
+    coerced = []
+    for key in values.keys() - step_validators.keys():
+        errors[key] = 'Unknown field'
+    for key, (field_id, field_value_type) in step_validators.items():
+        if key not in values:
+            errors[key] = 'This field is required'
+            continue
+        try:
+            coerced.append((field_id, field_value_columns(field_value_type, values[key])))
+        except ValueError as e:
+            errors[key] = str(e)
+    if errors:
+        raise ValidationError(errors)
+    return coerced
+
+
+@transaction.atomic
+def submit_steps(acknowledgment_id, submissions):
+    """
+    Record submitted steps of an acknowledgment and complete it once every
+    step is done. ``submissions`` is a list of dicts with ``step_id`` (the
+    PolicyStep id), ``values`` keyed by field_key and an optional
+    ``step_report_document``. Field values are upserted with one
+    bulk_create and progress is recomputed with one aggregate query.
+    Returns the acknowledgment with (steps_total, steps_acknowledged).
+    """
+    acknowledgment = PolicyAcknowledgment.objects.select_for_update().select_related(
+        'policy_template'
+    ).get(id=acknowledgment_id)
+    if acknowledgment.is_acknowledged:
+        raise ValidationError({'error': 'Policy is already acknowledged'})
+    if acknowledgment.expired_at and acknowledgment.expired_at <= timezone.now():
+        raise ValidationError({'error': 'Policy acknowledgment request has expired'})
+
+    step_ids = [submission['step_id'] for submission in submissions]
+    if len(step_ids) != len(set(step_ids)):
+        raise ValidationError({'steps': 'Each step may only be submitted once per request'})
+    acknowledgment_steps = {
+        step.policy_step_id: step
+        for step in PolicyAcknowledgmentStep.objects.filter(
+            policy_acknowledgment=acknowledgment,
+            policy_step_id__in=step_ids
+        )
+    }
+    missing = [str(step_id) for step_id in step_ids if step_id not in acknowledgment_steps]
+    if missing:
+        raise ValidationError({'steps': f"Not steps of this acknowledgment: {', '.join(missing)}"})
+
+    validators = template_validators(
+        acknowledgment.policy_template_id,
+        acknowledgment.policy_template.revision
+    )
+    errors = {}
+    field_values = []
+    for submission in submissions:
+        acknowledgment_step = acknowledgment_steps[submission['step_id']]
+        try:
+            coerced = validate_values(
+                validators.get(submission['step_id'], {}),
+                submission.get('values', {})
+            )
+        except ValidationError as e:
+            errors[str(submission['step_id'])] = e.detail
+            continue
+        field_values.extend(
+            PolicyStepFieldValue(
+                policy_acknowledgment_step_id=acknowledgment_step.id,
+                policy_step_field_id=field_id,
+                **columns
+            )
+            for field_id, columns in coerced
+        )
+        acknowledgment_step.is_acknowledged = True
+        if 'step_report_document' in submission:
+            acknowledgment_step.step_report_document = submission['step_report_document']
+    if errors:
+        raise ValidationError({'values': errors})
+
+    PolicyStepFieldValue.objects.bulk_create(
+        field_values,
+        update_conflicts=True,
+        unique_fields=['policy_acknowledgment_step', 'policy_step_field'],
+        update_fields=['field_value', *FIELD_VALUE_COLUMNS.values()]
+    )
+    PolicyAcknowledgmentStep.objects.bulk_update(
+        acknowledgment_steps.values(),
+        ['is_acknowledged', 'step_report_document']
+    )
+
+    progress = PolicyAcknowledgmentStep.objects.filter(
+        policy_acknowledgment=acknowledgment
+    ).aggregate(
+        total=Count('id'),
+        acknowledged=Count('id', filter=Q(is_acknowledged=True))
+    )
+    if progress['total'] and progress['acknowledged'] == progress['total']:
+        acknowledgment.is_acknowledged = True
+        acknowledgment.acknowledged_at = timezone.now()
+        if acknowledgment.is_recurring:
+            acknowledgment.due_at = renewal_due_at(acknowledgment.acknowledged_at)
+        acknowledgment.save(update_fields=['is_acknowledged', 'acknowledged_at', 'due_at'])
+        increment_summary(
+            'acknowledged_count',
+            summary_keys(PolicyAcknowledgment.objects.filter(id=acknowledgment.id))
+        )
+        remove_from_inbox([acknowledgment.id])
+    else:
+        update_inbox_progress(acknowledgment.id, progress['acknowledged'])
+    return acknowledgment, progress['total'], progress['acknowledged']
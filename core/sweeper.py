@@ -0,0 +1,131 @@
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .compliance import increment_summary, summary_keys
+from .inbox import add_to_inbox, inbox_entry, remove_from_inbox
+from .services import insert_open_acknowledgments, renewal_due_at
+from .models import (PolicyTemplate,
+                     PolicyStep,
+                     TemplateStatus,
+                     PolicyAcknowledgment,
+                     PolicyAcknowledgmentStep)
+
+SWEEP_BATCH_SIZE = 500
+
+
+def due_acknowledgments(now):
+    """
+    Unexpired requests whose due date has passed and that still need action:
+    pending ones expire, recurring ones are re-issued
+    """
+    return PolicyAcknowledgment.objects.filter(
+        Q(is_acknowledged=False) | Q(is_recurring=True),
+        expired_at__isnull=True,
+        due_at__lte=now
+    )
+
+
+def sweep_batch(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """
+    Expire one batch of due acknowledgments and re-issue the recurring ones
+    against their policy's current ACTIVE template.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED where supported,
+    so concurrent sweepers never process the same row. Returns a dict of
+    counts; ``claimed`` is 0 when nothing is due.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = due_acknowledgments(now).order_by('due_at')
+        if connection.features.has_select_for_update_skip_locked:
+            batch = batch.select_for_update(skip_locked=True)
+        rows = list(batch.values_list('id', 'policy_id', 'user_id', 'is_acknowledged', 'is_recurring')[:batch_size])
+        if not rows:
+            return {'claimed': 0, 'expired': 0, 'reissued': 0}
+
+        ids = [row[0] for row in rows]
+        unacknowledged_ids = [row[0] for row in rows if not row[3]]
+        claimed = PolicyAcknowledgment.objects.filter(id__in=ids)
+        increment_summary('expired_count', summary_keys(claimed.filter(is_acknowledged=False)))
+        # Expired requests and the acknowledgments being renewed stop counting as current
+        increment_summary('requested_count', summary_keys(claimed), amount=-1)
+        increment_summary('acknowledged_count', summary_keys(claimed.filter(is_acknowledged=True)), amount=-1)
+        PolicyAcknowledgment.objects.filter(id__in=ids).update(expired_at=now)
+        remove_from_inbox(unacknowledged_ids)
+
+        reissued = reissue(
+            [(policy_id, user_id) for _, policy_id, user_id, _, is_recurring in rows if is_recurring],
+            due_at=renewal_due_at(now)
+        )
+    return {'claimed': len(rows), 'expired': len(unacknowledged_ids), 'reissued': reissued}
+
+
+def reissue(pairs, due_at):
+    """
+    Bulk-create a recurring request for each (policy_id, user_id) pair against
+    the policy's ACTIVE template, skipping pairs that already have an open request
+    """
+    if not pairs:
+        return 0
+    policy_ids = {policy_id for policy_id, _ in pairs}
+    templates = {
+        policy_id: (template_id, policy_name, version, org_id)
+        for policy_id, template_id, policy_name, version, org_id in PolicyTemplate.objects.filter(
+            policy_id__in=policy_ids,
+            status=TemplateStatus.ACTIVE
+        ).values_list('policy_id', 'id', 'policy__name', 'version', 'policy__org_id')
+    }
+    steps = {}
+    for template_id, step_id in PolicyStep.objects.filter(
+        policy_template_id__in=[template_id for template_id, _, _, _ in templates.values()]
+    ).values_list('policy_template_id', 'id'):
+        steps.setdefault(template_id, []).append(step_id)
+    already_open = set(
+        PolicyAcknowledgment.objects.filter(
+            policy_id__in=policy_ids,
+            user_id__in={user_id for _, user_id in pairs},
+            is_acknowledged=False,
+            expired_at__isnull=True
+        ).values_list('policy_id', 'user_id')
+    )
+
+    acknowledgments = [
+        PolicyAcknowledgment(
+            id=uuid.uuid4(),
+            policy_template_id=templates[policy_id][0],
+            policy_id=policy_id,
+            org_id=templates[policy_id][3],
+            user_id=user_id,
+            due_at=due_at,
+            is_recurring=True
+        )
+        for policy_id, user_id in set(pairs)
+        if policy_id in templates and (policy_id, user_id) not in already_open
+    ]
+    # A request created since already_open was read keeps its place
+    acknowledgments = insert_open_acknowledgments(acknowledgments)
+    PolicyAcknowledgmentStep.objects.bulk_create(
+        PolicyAcknowledgmentStep(
+            policy_acknowledgment_id=acknowledgment.id,
+            policy_step_id=step_id
+        )
+        for acknowledgment in acknowledgments
+        for step_id in steps.get(acknowledgment.policy_template_id, [])
+    )
+    increment_summary(
+        'requested_count',
+        summary_keys(PolicyAcknowledgment.objects.filter(id__in=[a.id for a in acknowledgments]))
+    )
+    add_to_inbox([
+        inbox_entry(
+            acknowledgment,
+            templates[acknowledgment.policy_id][1],
+            templates[acknowledgment.policy_id][2],
+            len(steps.get(acknowledgment.policy_template_id, []))
+        )
+        for acknowledgment in acknowledgments
+    ])
+    return len(acknowledgments)
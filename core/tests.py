@@ -1,3 +1,1709 @@
-from django.test import TestCase
+import gzip
+import json
+import sys
+import tempfile
+import time
+from collections import Counter
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .benchmarking import ApiBenchmark, SerializationBenchmark, compare_to_baseline, latency_summary
+from .cache import LRUBackend, active_template_cache, dept_policy_cache
+from .applicability import resolve_effective_policies
+from .compliance import rebuild_compliance_summary
+from .inbox import open_inbox_entries
+from .management.commands.seed_data import SYNTHETIC_MODELS
+from .jobs import JOB_HANDLERS, Worker, claim_jobs, enqueue, run_job
+from .instrumentation import QueryRecorder, RollingHistogram, fingerprint, registry
+from .services import bulk_acknowledge, insert_open_acknowledgments
+from .sweeper import sweep_batch
+
+from .models import (ComplianceSummary,
+                     Org,
+                     Dept,
+                     DeptPolicy,
+                     User,
+                     Policy,
+                     PolicyTemplate,
+                     PolicyStep,
+                     PolicyStepField,
+                     PolicyAcknowledgment,
+                     PolicyAcknowledgmentStep,
+                     PolicyStepFieldValue,
+                     PendingAcknowledgment,
+                     Job,
+                     JobStatus,
+                     TemplateStatus,
+                     bump_revision)
+
+
+def create_policy(org, name, status=TemplateStatus.ACTIVE, steps=2):
+    policy = Policy.objects.create(name=name, org=org, description=name)
+    template = PolicyTemplate.objects.create(policy=policy, version='1.0.0', status=status)
+    for i in range(steps):
+        step = PolicyStep.objects.create(
+            policy_template=template,
+            name=f'{name} step {i}',
+            description='step'
+        )
+        PolicyStepField.objects.create(
+            policy_step=step,
+            field_name='Score',
+            field_key='score',
+            field_value_type='NUMBER'
+        )
+    return policy
+
+
+class BaseAPITestCase(TestCase):
+    def setUp(self):
+        active_template_cache.clear()
+        dept_policy_cache.clear()
+        self.client = APIClient()
+        self.org = Org.objects.create(name='TechCorp Inc', domain='techcorp.com')
+        self.dept = Dept.objects.create(name='IT', org=self.org)
+        self.user = User.objects.create(
+            username='admin',
+            email='admin@techcorp.com',
+            org=self.org,
+            dept=self.dept
+        )
+        # API requests are scoped to the authenticated user's org
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+
+class PolicyListQueryCountTests(BaseAPITestCase):
+    def test_policy_list_query_count_is_flat(self):
+        create_policy(self.org, 'policy 0')
+        small, _ = self.count_queries('/api/v1/policy/')
+
+        for i in range(1, 20):
+            create_policy(self.org, f'policy {i}')
+        large, response = self.count_queries('/api/v1/policy/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['active_template']['steps']), 2)
+
+    def test_policy_without_active_template(self):
+        create_policy(self.org, 'draft', status=TemplateStatus.DRAFT)
+        _, response = self.count_queries('/api/v1/policy/')
+        self.assertIsNone(response.data['results'][0]['active_template'])
+
+    def test_dept_policy_list_query_count_is_flat(self):
+        DeptPolicy.objects.create(dept=self.dept, policy=create_policy(self.org, 'policy 0'))
+        small, _ = self.count_queries('/api/v1/dept-policies/')
+
+        for i in range(1, 20):
+            DeptPolicy.objects.create(dept=self.dept, policy=create_policy(self.org, f'policy {i}'))
+        large, response = self.count_queries('/api/v1/dept-policies/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 20)
+
+
+class AcknowledgmentCampaignTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'SOC2 policy')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        other_dept = Dept.objects.create(name='HR', org=self.org)
+        for i in range(5):
+            User.objects.create(
+                username=f'user{i}',
+                email=f'user{i}@techcorp.com',
+                org=self.org,
+                dept=self.dept
+            )
+        User.objects.create(username='hr', email='hr@techcorp.com', org=self.org, dept=other_dept)
+        self.url = f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/'
+
+    def test_campaign_fans_out_to_assigned_departments(self):
+        response = self.client.post(self.url, {'batch_size': 2}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['targeted_users'], 6)
+        self.assertEqual(response.data['created_acknowledgments'], 6)
+        self.assertEqual(response.data['created_steps'], 12)
+        self.assertEqual(PolicyAcknowledgment.objects.count(), 6)
+        self.assertEqual(PolicyAcknowledgmentStep.objects.count(), 12)
+
+    def test_campaign_skips_users_with_open_requests(self):
+        self.client.post(self.url, format='json')
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.data['created_acknowledgments'], 0)
+        self.assertEqual(response.data['skipped_users'], 6)
+        self.assertEqual(PolicyAcknowledgment.objects.count(), 6)
+
+    def test_campaign_skips_requests_created_concurrently(self):
+        self.client.post(self.url, format='json')
+        # Requests created after the campaign's anti-join ran hit the unique constraint instead
+        with mock.patch('core.services.open_acknowledgments', return_value=PolicyAcknowledgment.objects.none()):
+            response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created_acknowledgments'], 0)
+        self.assertEqual(response.data['skipped_users'], 6)
+        self.assertEqual(PolicyAcknowledgmentStep.objects.count(), 12)
+        counters = ('policy_template', 'requested_count', 'acknowledged_count', 'expired_count')
+        incremental = sorted(ComplianceSummary.objects.values_list(*counters))
+        rebuild_compliance_summary()
+        self.assertEqual(incremental, sorted(ComplianceSummary.objects.values_list(*counters)))
+
+    def test_campaign_requires_active_template(self):
+        policy = create_policy(self.org, 'draft', status=TemplateStatus.DRAFT)
+        response = self.client.post(f'/api/v1/policy/{policy.id}/acknowledgment-campaign/')
+        self.assertEqual(response.status_code, 404)
+
+
+class HotQueryConstraintTests(BaseAPITestCase):
+    def test_multiple_archived_templates_allowed(self):
+        policy = create_policy(self.org, 'policy', status=TemplateStatus.ARCHIVED)
+        PolicyTemplate.objects.create(policy=policy, version='2.0.0', status=TemplateStatus.ARCHIVED)
+        self.assertEqual(policy.policytemplate_set.count(), 2)
+
+    def test_single_active_template_per_policy(self):
+        policy = create_policy(self.org, 'policy')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PolicyTemplate.objects.create(policy=policy, version='2.0.0', status=TemplateStatus.ACTIVE)
+
+    def test_single_open_acknowledgment_per_user_and_policy(self):
+        policy = create_policy(self.org, 'policy')
+        template = policy.policytemplate_set.get()
+        PolicyAcknowledgment.objects.create(policy_template=template, policy=policy, org=self.org, user=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PolicyAcknowledgment.objects.create(policy_template=template, policy=policy, org=self.org, user=self.user)
+
+
+class SyntheticSeedTests(TestCase):
+    options = {
+        'orgs': 2, 'users_per_org': 6, 'depts_per_org': 2, 'policies': 2,
+        'templates_per_policy': 2, 'steps_per_template': 2, 'fields_per_step': 1,
+        'ack_density': 1.0, 'chunk_size': 7,
+    }
+
+    def seed(self, **options):
+        # Rolled back, so the same dataset can be seeded again
+        with transaction.atomic():
+            call_command('seed_data', stdout=StringIO(), **{**self.options, **options})
+            rows = {
+                model.__name__: sorted(model.objects.values_list('id', flat=True))
+                for model in SYNTHETIC_MODELS
+            }
+            rows['acknowledgments'] = sorted(PolicyAcknowledgment.objects.values_list(
+                'user_id', 'policy_template_id', 'is_acknowledged', 'is_recurring'
+            ))
+            rows['targeted'] = sum(
+                User.objects.filter(dept_id=dept_id).count()
+                for dept_id in DeptPolicy.objects.values_list('dept_id', flat=True)
+            )
+            rows['current'] = PolicyAcknowledgment.objects.filter(expired_at__isnull=True).count()
+            rows['requested'] = sum(ComplianceSummary.objects.values_list('requested_count', flat=True))
+            transaction.set_rollback(True)
+        return rows
+
+    def test_row_counts_follow_options(self):
+        rows = self.seed()
+
+        self.assertEqual(len(rows['Org']), 2)
+        self.assertEqual(len(rows['Dept']), 4)
+        self.assertEqual(len(rows['User']), 12)
+        self.assertEqual(len(rows['Policy']), 4)
+        self.assertEqual(len(rows['PolicyTemplate']), 8)
+        self.assertEqual(len(rows['PolicyStep']), 16)
+        self.assertEqual(len(rows['PolicyStepField']), 16)
+        # At full density every user of an assigned dept gets a request of the ACTIVE template
+        self.assertEqual(len(rows['PolicyAcknowledgment']), rows['targeted'])
+        self.assertEqual(len(rows['PolicyAcknowledgmentStep']), 2 * len(rows['PolicyAcknowledgment']))
+        self.assertEqual(rows['requested'], rows['current'])
+
+    def test_same_seed_produces_same_data(self):
+        self.assertEqual(self.seed(seed=7), self.seed(seed=7))
+        self.assertNotEqual(self.seed(seed=7)['User'], self.seed(seed=8)['User'])
+
+
+class KeysetPaginationTests(BaseAPITestCase):
+    def test_acknowledgments_are_paginated_with_cursor(self):
+        for i in range(5):
+            policy = create_policy(self.org, f'policy {i}')
+            PolicyAcknowledgment.objects.create(
+                policy_template=policy.policytemplate_set.get(),
+                policy=policy,
+                org=self.org,
+                user=self.user
+            )
+
+        seen = []
+        url = '/api/v1/policy-acknowledgments/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+
+class AcknowledgmentExportTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        self.client.post(f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/')
+
+    def test_ndjson_export_has_one_row_per_step(self):
+        response = self.client.get('/api/v1/policy-acknowledgments/export/?status=pending')
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['policy_name'], 'policy')
+        self.assertEqual(rows[0]['user_email'], self.user.email)
+
+    def test_gzip_csv_export(self):
+        response = self.client.get('/api/v1/policy-acknowledgments/export/?output=csv&gzip=1')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertTrue(lines[0].startswith('acknowledgment_id,'))
+        self.assertEqual(len(lines), 3)
+
+    def test_export_filters(self):
+        response = self.client.get('/api/v1/policy-acknowledgments/export/?status=acknowledged')
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        response = self.client.get('/api/v1/policy-acknowledgments/export/?requested_after=yesterday')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/policy-acknowledgments/export/?policy_id=abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            call_command('export_acknowledgments', output='csv', file=f.name, policy_id=str(self.policy.id))
+            self.assertEqual(len(f.read().decode().splitlines()), 3)
+        with self.assertRaisesMessage(CommandError, 'policy_id must be a UUID'):
+            call_command('export_acknowledgments', policy_id='abc')
+
+
+class ComplianceSummaryTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        for i in range(3):
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+        self.client.post(f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/')
+
+    def get_summary(self):
+        response = self.client.get(f'/api/v1/compliance-summary/?policy_id={self.policy.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        return response.data['results'][0]
+
+    def test_counters_follow_campaign_and_acknowledge(self):
+        acknowledgment = PolicyAcknowledgment.objects.first()
+        acknowledgment.policyacknowledgmentstep_set.update(is_acknowledged=True)
+        self.client.put(f'/api/v1/policy-acknowledgments/{acknowledgment.id}/acknowledge/')
+
+        summary = self.get_summary()
+        self.assertEqual(summary['requested_count'], 4)
+        self.assertEqual(summary['acknowledged_count'], 1)
+        self.assertEqual(summary['acknowledged_percentage'], 25.0)
+
+    def test_rebuild_matches_incremental_counters(self):
+        acknowledgment = PolicyAcknowledgment.objects.first()
+        acknowledgment.policyacknowledgmentstep_set.update(is_acknowledged=True)
+        self.client.put(f'/api/v1/policy-acknowledgments/{acknowledgment.id}/acknowledge/')
+        incremental = self.get_summary()
+
+        rebuild_compliance_summary()
+
+        rebuilt = self.get_summary()
+        for field in ('requested_count', 'acknowledged_count', 'expired_count'):
+            self.assertEqual(incremental[field], rebuilt[field])
+
+    def test_plain_update_cannot_change_counted_state(self):
+        acknowledgment = PolicyAcknowledgment.objects.first()
+        response = self.client.patch(
+            f'/api/v1/policy-acknowledgments/{acknowledgment.id}/',
+            {'is_acknowledged': True, 'expired_at': timezone.now().isoformat(), 'is_recurring': True},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        acknowledgment.refresh_from_db()
+        self.assertEqual((acknowledgment.is_acknowledged, acknowledgment.expired_at), (False, None))
+        self.assertTrue(acknowledgment.is_recurring)
+
+        incremental = self.get_summary()
+        rebuild_compliance_summary()
+        rebuilt = self.get_summary()
+        for field in ('requested_count', 'acknowledged_count', 'expired_count'):
+            self.assertEqual(incremental[field], rebuilt[field])
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get('/api/v1/compliance-summary/?policy_id=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('policy_id', response.data)
+
+    def test_by_org_rollup(self):
+        response = self.client.get('/api/v1/compliance-summary/by-org/')
+        self.assertEqual(response.data[0]['requested_count'], 4)
+
+
+class AcknowledgmentSweeperTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        self.template = self.policy.policytemplate_set.get()
+        self.other_user = User.objects.create(username='user', email='user@techcorp.com', org=self.org, dept=self.dept)
+
+    def create_acknowledgment(self, user, due_in_days, **kwargs):
+        return PolicyAcknowledgment.objects.create(
+            policy_template=self.template,
+            policy=self.policy,
+            org=self.org,
+            user=user,
+            due_at=timezone.now() + timedelta(days=due_in_days),
+            **kwargs
+        )
+
+    def test_sweep_expires_due_and_reissues_recurring(self):
+        pending = self.create_acknowledgment(self.user, -1)
+        recurring = self.create_acknowledgment(self.other_user, -1, is_recurring=True, is_acknowledged=True)
+        not_due = self.create_acknowledgment(
+            User.objects.create(username='third', email='third@techcorp.com', org=self.org, dept=self.dept), 10
+        )
+
+        result = sweep_batch()
+
+        self.assertEqual(result, {'claimed': 2, 'expired': 1, 'reissued': 1})
+        pending.refresh_from_db()
+        recurring.refresh_from_db()
+        not_due.refresh_from_db()
+        self.assertIsNotNone(pending.expired_at)
+        self.assertIsNotNone(recurring.expired_at)
+        self.assertIsNone(not_due.expired_at)
+
+        renewed = PolicyAcknowledgment.objects.get(user=self.other_user, expired_at__isnull=True)
+        self.assertTrue(renewed.is_recurring)
+        self.assertGreater(renewed.due_at, timezone.now())
+        self.assertEqual(renewed.policyacknowledgmentstep_set.count(), 2)
+        self.assertEqual(sweep_batch()['claimed'], 0)
+
+    def test_sweep_keeps_only_current_requests_in_the_summary(self):
+        self.create_acknowledgment(self.user, -1)
+        self.create_acknowledgment(self.other_user, -1, is_recurring=True, is_acknowledged=True)
+        rebuild_compliance_summary()
+
+        sweep_batch()
+
+        counters = ('requested_count', 'acknowledged_count', 'expired_count')
+        incremental = ComplianceSummary.objects.values_list(*counters).get()
+        # The lapsed request and the renewed acknowledgment drop out; the renewal is outstanding
+        self.assertEqual(incremental, (1, 0, 1))
+        rebuild_compliance_summary()
+        self.assertEqual(incremental, ComplianceSummary.objects.values_list(*counters).get())
+
+    def test_acknowledging_recurring_request_moves_renewal(self):
+        recurring = self.create_acknowledgment(self.user, 1, is_recurring=True)
+        recurring.policyacknowledgmentstep_set.all().delete()
+        response = self.client.put(f'/api/v1/policy-acknowledgments/{recurring.id}/acknowledge/')
+        self.assertEqual(response.status_code, 200)
+        recurring.refresh_from_db()
+        self.assertEqual(recurring.due_at, recurring.acknowledged_at + timedelta(days=365))
+
+        imported = self.create_acknowledgment(self.other_user, -1, is_recurring=True)
+        acknowledged_at = timezone.now() - timedelta(days=10)
+        bulk_acknowledge([str(imported.id)], acknowledged_at=acknowledged_at)
+        imported.refresh_from_db()
+        self.assertEqual(imported.due_at, acknowledged_at + timedelta(days=365))
+        self.assertEqual(sweep_batch()['claimed'], 0)
+
+    def test_insert_skips_conflicting_open_requests(self):
+        self.create_acknowledgment(self.user, 10)
+        candidates = [
+            PolicyAcknowledgment(policy_template=self.template, policy=self.policy, org=self.org, user=user)
+            for user in (self.user, self.other_user)
+        ]
+        inserted = insert_open_acknowledgments(candidates)
+        self.assertEqual([a.user_id for a in inserted], [self.other_user.id])
+        self.assertEqual(PolicyAcknowledgment.objects.count(), 2)
+
+
+class TemplateActivationMigrationTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        self.old_template = self.policy.policytemplate_set.get()
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        for i in range(3):
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+        self.client.post(f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/')
+
+        self.new_template = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        PolicyStep.objects.create(policy_template=self.new_template, name='new step', description='step')
+
+    def activate(self, migration):
+        return self.client.post(
+            f'/api/v1/policytemplate/{self.new_template.id}/activate/',
+            {'approved_by': str(self.user.id), 'migration': migration},
+            format='json'
+        )
+
+    def test_keep_leaves_open_requests_on_archived_template(self):
+        self.assertEqual(self.activate('keep').status_code, 200)
+        self.assertEqual(
+            PolicyAcknowledgment.objects.filter(policy_template=self.old_template, expired_at__isnull=True).count(),
+            4
+        )
+
+    def test_expire_closes_open_requests(self):
+        self.assertEqual(self.activate('expire').status_code, 200)
+        self.assertFalse(PolicyAcknowledgment.objects.filter(expired_at__isnull=True).exists())
+
+    def test_reissue_moves_open_requests_to_new_template(self):
+        self.assertEqual(self.activate('reissue').status_code, 200)
+        reissued = PolicyAcknowledgment.objects.filter(policy_template=self.new_template)
+        self.assertEqual(reissued.count(), 4)
+        self.assertEqual(PolicyAcknowledgmentStep.objects.filter(policy_acknowledgment__in=reissued).count(), 4)
+        self.assertFalse(
+            PolicyAcknowledgment.objects.filter(policy_template=self.old_template, expired_at__isnull=True).exists()
+        )
+
+    def test_response_reports_the_migration_counts(self):
+        self.assertEqual(self.activate('reissue').json()['migration'], {
+            'mode': 'reissue', 'expired': 4, 'reissued': 4, 'created_steps': 4
+        })
+        self.new_template = PolicyTemplate.objects.create(policy=self.policy, version='3.0.0')
+        self.assertEqual(self.activate('keep').json()['migration'], {
+            'mode': 'keep', 'expired': 0, 'reissued': 0, 'created_steps': 0
+        })
+
+    def test_reissued_requests_count_once_in_the_rollup(self):
+        self.activate('reissue')
+        reissued = PolicyAcknowledgment.objects.filter(policy_template=self.new_template).first()
+        reissued.policyacknowledgmentstep_set.update(is_acknowledged=True)
+        self.client.put(f'/api/v1/policy-acknowledgments/{reissued.id}/acknowledge/')
+
+        rollup = self.client.get('/api/v1/compliance-summary/by-org/').data
+        self.assertEqual(len(rollup), 1)
+        self.assertEqual(rollup[0]['requested_count'], 4)
+        self.assertEqual(rollup[0]['acknowledged_count'], 1)
+        self.assertEqual(rollup[0]['expired_count'], 4)
+        self.assertEqual(rollup[0]['acknowledged_percentage'], 25.0)
+
+        rebuild_compliance_summary()
+        self.assertEqual(self.client.get('/api/v1/compliance-summary/by-org/').data, rollup)
+
+    def test_invalid_migration_mode(self):
+        self.assertEqual(self.activate('drop').status_code, 400)
+
+
+class TemplateBulkCreateTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+
+    def template_payload(self, version, steps=3):
+        return {
+            'policy_id': str(self.policy.id),
+            'version': version,
+            'steps': [
+                {
+                    'name': f'step {i}',
+                    'description': 'step',
+                    'fields': [
+                        {'field_name': 'Score', 'field_key': 'score', 'field_value_type': 'NUMBER'},
+                        {'field_name': 'Done', 'field_key': 'done', 'field_value_type': 'BOOLEAN'},
+                    ]
+                }
+                for i in range(steps)
+            ]
+        }
+
+    def test_create_writes_nested_fields(self):
+        response = self.client.post(
+            f'/api/v1/policy/{self.policy.id}/policytemplate/',
+            self.template_payload('2.0.0'),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['steps']), 3)
+        self.assertEqual(len(response.data['steps'][0]['fields']), 2)
+        self.assertEqual(PolicyStepField.objects.filter(policy_step__policy_template_id=response.data['id']).count(), 6)
+
+    def test_bulk_import_query_count_is_flat(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(
+                '/api/v1/policytemplate/bulk-import/',
+                [self.template_payload('2.0.0', steps=1)],
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(
+                '/api/v1/policytemplate/bulk-import/',
+                [self.template_payload(f'3.0.{i}', steps=2) for i in range(10)],
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_nested_bulk_import_takes_policy_from_url(self):
+        payload = self.template_payload('2.0.0', steps=1)
+        del payload['policy_id']
+        response = self.client.post(
+            f'/api/v1/policy/{self.policy.id}/policytemplate/bulk-import/',
+            [payload, {**payload, 'version': '2.0.1'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(PolicyTemplate.objects.filter(policy=self.policy).count(), 3)
+
+    def test_bulk_import_rejects_unknown_policy(self):
+        payload = self.template_payload('2.0.0')
+        payload['policy_id'] = '00000000-0000-0000-0000-000000000000'
+        response = self.client.post('/api/v1/policytemplate/bulk-import/', [payload], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_duplicate_field_keys_rejected(self):
+        payload = self.template_payload('2.0.0')
+        payload['steps'][0]['fields'][1]['field_key'] = 'score'
+        response = self.client.post('/api/v1/policytemplate/bulk-import/', [payload], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ActiveTemplateCacheTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+
+    def test_warm_policy_list_skips_template_queries(self):
+        cold, _ = self.count_queries('/api/v1/policy/')
+        warm, response = self.count_queries('/api/v1/policy/')
+
+        # Only the ETag version query and the page query remain
+        self.assertEqual(warm, 2)
+        self.assertLess(warm, cold)
+        self.assertEqual(len(response.data['results'][0]['active_template']['steps']), 2)
+        self.assertEqual(active_template_cache.stats()['hits'], 1)
+
+    def test_warm_nested_template_list_makes_no_queries(self):
+        url = f'/api/v1/policy/{self.policy.id}/policytemplate/'
+        self.count_queries(url)
+        warm, response = self.count_queries(url)
+        # Only the org check on the policy and the ETag version query remain
+        self.assertEqual(warm, 2)
+        self.assertEqual(response.data['results'][0]['version'], '1.0.0')
+
+    def test_activation_invalidates_on_commit(self):
+        url = f'/api/v1/policy/{self.policy.id}/policytemplate/'
+        self.client.get(url)
+        template = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/v1/policytemplate/{template.id}/activate/',
+                {'approved_by': str(self.user.id)},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['version'], '2.0.0')
+
+    def test_lru_backend_evicts_least_recently_used(self):
+        backend = LRUBackend(max_entries=2)
+        backend.set_many({'a': 1, 'b': 2})
+        backend.get_many(['a'])
+        backend.set_many({'c': 3})
+        self.assertEqual(backend.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+class ConditionalGetTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+
+    def assert_not_modified_until_change(self, url, change):
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_policy_list(self):
+        self.assert_not_modified_until_change(
+            '/api/v1/policy/',
+            lambda: create_policy(self.org, 'another')
+        )
+
+    def test_policy_detail_changes_with_steps(self):
+        template = self.policy.policytemplate_set.get()
+        self.assert_not_modified_until_change(
+            f'/api/v1/policy/{self.policy.id}/',
+            lambda: PolicyStep.objects.create(policy_template=template, name='new', description='step')
+        )
+
+    def test_stale_cache_entry_is_not_served_under_a_new_etag(self):
+        url = f'/api/v1/policy/{self.policy.id}/'
+        etag = self.client.get(url)['ETag']
+        template = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        # Activated without running the on-commit invalidation, as in another process
+        self.client.post(
+            f'/api/v1/policytemplate/{template.id}/activate/', {'approved_by': str(self.user.id)}, format='json'
+        )
+
+        for url in (url, '/api/v1/policy/'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            active_template = response.data.get('active_template') or response.data['results'][0]['active_template']
+            self.assertEqual(active_template['version'], '2.0.0')
+
+    def test_policy_list_etag_covers_only_the_requested_page(self):
+        for i in range(11):
+            create_policy(self.org, f'policy {i}')
+        ids = sorted(Policy.objects.values_list('id', flat=True))
+        url = '/api/v1/policy/?page_size=5'
+        etag = self.client.get(url)['ETag']
+
+        active_template_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        stats = active_template_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+
+        bump_revision(Policy, [ids[-1]])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # The row past the page decides the next link
+        Policy.objects.filter(id=ids[5]).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        bump_revision(Policy, [ids[2]])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_nested_template_list(self):
+        self.assert_not_modified_until_change(
+            f'/api/v1/policy/{self.policy.id}/policytemplate/',
+            lambda: PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        )
+
+
+class StepSubmissionTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        self.steps = list(PolicyStep.objects.filter(policy_template__policy=self.policy))
+        PolicyStepField.objects.create(
+            policy_step=self.steps[0], field_name='Done', field_key='done', field_value_type='BOOLEAN'
+        )
+        response = self.client.post(
+            '/api/v1/policy-acknowledgments/',
+            {'policy_id': str(self.policy.id), 'user': str(self.user.id)},
+            format='json'
+        )
+        self.acknowledgment_id = response.data['id']
+        self.url = f'/api/v1/policy-acknowledgments/{self.acknowledgment_id}'
+
+    def test_submit_single_step_stores_typed_values(self):
+        response = self.client.post(
+            f'{self.url}/steps/{self.steps[0].id}/submit/',
+            {'values': {'score': 92.5, 'done': True}},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['steps_acknowledged'], 1)
+        self.assertFalse(response.data['is_acknowledged'])
+        self.assertEqual(
+            set(PolicyStepFieldValue.objects.values_list('field_value', flat=True)),
+            {'92.5', 'true'}
+        )
+
+    def test_batch_submission_completes_acknowledgment(self):
+        response = self.client.post(f'{self.url}/steps/submit/', {'steps': [
+            {'step_id': str(self.steps[0].id), 'values': {'score': 80, 'done': 'false'}},
+            {'step_id': str(self.steps[1].id), 'values': {'score': '75'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_acknowledged'])
+        self.assertEqual(response.data['steps_total'], 2)
+
+    def test_resubmission_updates_values(self):
+        step_url = f'{self.url}/steps/{self.steps[1].id}/submit/'
+        self.client.post(step_url, {'values': {'score': 10}}, format='json')
+        self.client.post(step_url, {'values': {'score': 20}}, format='json')
+        self.assertEqual(list(PolicyStepFieldValue.objects.values_list('field_value', flat=True)), ['20'])
+
+    def test_invalid_values_rejected(self):
+        response = self.client.post(
+            f'{self.url}/steps/{self.steps[0].id}/submit/',
+            {'values': {'score': 'high', 'extra': 1}},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['values'][str(self.steps[0].id)]
+        self.assertEqual(set(errors), {'score', 'done', 'extra'})
+        self.assertFalse(PolicyStepFieldValue.objects.exists())
+
+    def test_number_range_boundary(self):
+        step_url = f'{self.url}/steps/{self.steps[1].id}/submit/'
+        response = self.client.post(step_url, {'values': {'score': '999999999999999999.5'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(PolicyStepFieldValue.objects.get().value_number)
+
+        for score in ('9999999999999999999', '99999999999999999999.5'):
+            response = self.client.post(step_url, {'values': {'score': score}}, format='json')
+            self.assertEqual(response.status_code, 400, score)
+            response = self.client.get(f'/api/v1/field-values/?field_key=score&lt={score}')
+            self.assertEqual(response.status_code, 400, score)
+
+    def test_acknowledge_requires_all_steps(self):
+        response = self.client.put(f'{self.url}/acknowledge/')
+        self.assertEqual(response.status_code, 400)
+
+
+class FieldValueFilterTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy', steps=1)
+        self.step = PolicyStep.objects.get(policy_template__policy=self.policy)
+        self.scores = {}
+        for i, score in enumerate([55, 79.5, 80, 95]):
+            user = User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com',
+                                       org=self.org, dept=self.dept)
+            response = self.client.post(
+                '/api/v1/policy-acknowledgments/',
+                {'policy_id': str(self.policy.id), 'user': str(user.id)},
+                format='json'
+            )
+            self.client.post(
+                f"/api/v1/policy-acknowledgments/{response.data['id']}/steps/{self.step.id}/submit/",
+                {'values': {'score': score}},
+                format='json'
+            )
+            self.scores[response.data['id']] = score
+
+    def test_submission_sets_typed_column(self):
+        value = PolicyStepFieldValue.objects.get(field_value='79.5')
+        self.assertEqual(float(value.value_number), 79.5)
+        self.assertIsNone(value.value_text)
+
+    def test_range_filter(self):
+        response = self.client.get(
+            f'/api/v1/field-values/?policy_id={self.policy.id}&field_key=score&lt=80'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(row['field_value'] for row in response.data['results']),
+            ['55', '79.5']
+        )
+        response = self.client.get(
+            f'/api/v1/field-values/?field_key=score&gte=80&lte=90'
+        )
+        self.assertEqual([row['field_value'] for row in response.data['results']], ['80'])
+
+    def test_range_filter_uses_typed_column(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/v1/field-values/?field_key=score&gt=60')
+        self.assertIn('value_number', ctx.captured_queries[-1]['sql'])
+
+    def test_invalid_filters_rejected(self):
+        for query in ('field_key=score&lt=high', 'lt=80', 'field_id=nope'):
+            response = self.client.get(f'/api/v1/field-values/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+class AsyncReadEndpointTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+        self.policies = [create_policy(self.org, f'policy {i}') for i in range(3)]
+        for policy in self.policies[:2]:
+            self.client.post(
+                '/api/v1/policy-acknowledgments/',
+                {'policy_id': str(policy.id), 'user': str(self.user.id)},
+                format='json'
+            )
+
+    async def test_policy_list_matches_sync_route(self):
+        response = await self.async_client.get('/api/v1/async/policy/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(len(page['results']), 2)
+        response = await self.async_client.get(page['next'])
+        rest = response.json()
+        self.assertIsNone(rest['next'])
+
+        sync = (await self.async_client.get('/api/v1/policy/')).json()
+        self.assertEqual(page['results'] + rest['results'], sync['results'])
+
+    async def test_active_template(self):
+        policy = self.policies[0]
+        response = await self.async_client.get(f'/api/v1/async/policy/{policy.id}/active-template/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['steps']), 2)
+        missing = await self.async_client.get(
+            '/api/v1/async/policy/00000000-0000-0000-0000-000000000000/active-template/'
+        )
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_pending_acknowledgments(self):
+        response = await self.async_client.get(
+            f'/api/v1/async/users/{self.user.id}/pending-acknowledgments/?page_size=1'
+        )
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        second = (await self.async_client.get(first['next'])).json()
+        self.assertEqual(
+            {first['results'][0]['policy_name'], second['results'][0]['policy_name']},
+            {'policy 0', 'policy 1'}
+        )
+        self.assertIsNone(second['next'])
+
+        invalid = await self.async_client.get(
+            f'/api/v1/async/users/{self.user.id}/pending-acknowledgments/?cursor=nope'
+        )
+        self.assertEqual(invalid.status_code, 400)
+
+
+class PendingAcknowledgmentInboxTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        for i in range(3):
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+        self.client.force_authenticate(self.user)
+
+    def inbox_rows(self, entries):
+        return sorted(
+            (e.acknowledgment_id, e.user_id, e.policy_template_id, e.policy_name, e.template_version,
+             e.requested_at, e.due_at, e.steps_total, e.steps_acknowledged)
+            for e in entries
+        )
+
+    def assert_inbox_consistent(self):
+        self.assertEqual(
+            self.inbox_rows(PendingAcknowledgment.objects.all()),
+            self.inbox_rows(open_inbox_entries(PolicyAcknowledgment.objects.all()))
+        )
+
+    def test_inbox_follows_step_submission_and_acknowledgment(self):
+        response = self.client.post(
+            '/api/v1/policy-acknowledgments/',
+            {'policy_id': str(self.policy.id), 'user': str(self.user.id)},
+            format='json'
+        )
+        acknowledgment_id = response.data['id']
+        steps = list(PolicyStep.objects.filter(policy_template__policy=self.policy))
+        self.client.post(
+            f'/api/v1/policy-acknowledgments/{acknowledgment_id}/steps/{steps[0].id}/submit/',
+            {'values': {'score': 1}},
+            format='json'
+        )
+        self.assert_inbox_consistent()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/me/pending-acknowledgments/')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        [entry] = response.data['results']
+        self.assertEqual(entry['policy_name'], 'policy')
+        self.assertEqual((entry['steps_total'], entry['steps_acknowledged']), (2, 1))
+
+        self.client.post(
+            f'/api/v1/policy-acknowledgments/{acknowledgment_id}/steps/{steps[1].id}/submit/',
+            {'values': {'score': 2}},
+            format='json'
+        )
+        self.assertFalse(PendingAcknowledgment.objects.exists())
+        self.assertEqual(self.client.get('/api/v1/me/pending-acknowledgments/').data['results'], [])
+
+    def test_inbox_follows_campaign_sweep_and_activation(self):
+        self.client.post(
+            f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/',
+            {'due_at': (timezone.now() - timedelta(days=1)).isoformat()},
+            format='json'
+        )
+        self.assertEqual(PendingAcknowledgment.objects.count(), 4)
+        self.assert_inbox_consistent()
+
+        PolicyAcknowledgment.objects.filter(user=self.user).update(is_recurring=True)
+        sweep_batch()
+        self.assertEqual(list(PendingAcknowledgment.objects.values_list('user_id', flat=True)), [self.user.id])
+        self.assert_inbox_consistent()
+
+        template = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        self.client.post(
+            f'/api/v1/policytemplate/{template.id}/activate/',
+            {'approved_by': str(self.user.id), 'migration': 'reissue'},
+            format='json'
+        )
+        self.assertEqual(
+            list(PendingAcknowledgment.objects.values_list('template_version', flat=True)),
+            ['2.0.0']
+        )
+        self.assert_inbox_consistent()
+
+        self.policy.name = 'renamed'
+        self.policy.save()
+        self.assertEqual(self.client.get('/api/v1/me/pending-acknowledgments/').data['results'][0]['policy_name'], 'renamed')
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/v1/me/pending-acknowledgments/').status_code, (401, 403))
+
+
+@override_settings(REQUEST_METRICS={'ENABLED': True, 'QUERY_BUDGET': 1, 'LATENCY_BUDGET_MS': None})
+class QueryMetricsMiddlewareTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        create_policy(self.org, 'policy')
+
+    def test_server_timing_log_and_metrics_endpoint(self):
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            response = self.client.get('/api/v1/policy/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", serialize;dur=')
+        sample = json.loads(logs.records[0].getMessage())
+        self.assertEqual(sample['endpoint'], 'GET policy-list')
+        self.assertEqual(sample['over_budget'], ['queries'])
+
+        with self.assertLogs('core.metrics', 'INFO'):
+            metrics = self.client.get('/api/v1/_metrics/').data
+        endpoint = metrics['endpoints']['GET policy-list']
+        self.assertEqual(endpoint['requests'], 1)
+        self.assertEqual(endpoint['over_budget'], 1)
+        self.assertEqual(endpoint['queries']['count'], 1)
+
+    def test_duplicate_queries_are_fingerprinted(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND n = 3'),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s, %s, %s) AND n = 7')
+        )
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for policy in Policy.objects.all():
+                list(PolicyTemplate.objects.filter(policy=policy))
+                list(PolicyTemplate.objects.filter(policy=policy))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual([count for _, count in recorder.duplicates()], [2])
+
+    def test_rolling_histogram_ages_out(self):
+        histogram = RollingHistogram((10, 100), window_seconds=60, slots=6)
+        histogram.observe(5, now=1000)
+        histogram.observe(50, now=1030)
+        self.assertEqual(histogram.snapshot(now=1031)['count'], 2)
+        self.assertEqual(histogram.snapshot(now=1031)['p50'], 10)
+        self.assertEqual(histogram.snapshot(now=1065)['count'], 1)
+
+
+class ApiBenchmarkTests(BaseAPITestCase):
+    def test_every_scenario_runs(self):
+        create_policy(self.org, 'policy')
+        results = ApiBenchmark(self.client).run(iterations=2, warmup=0)
+        self.assertEqual(set(results), {name for name, _, _ in ApiBenchmark.scenarios})
+        for result in results.values():
+            self.assertEqual(result['iterations'], 2)
+            self.assertGreater(result['queries'], 0)
+
+    def test_baseline_comparison_flags_extra_queries_and_slowdowns(self):
+        baseline = {'policy-list': {'queries': 2, 'p95_ms': 10.0}}
+        self.assertEqual(
+            compare_to_baseline({'policy-list': {'queries': 2, 'p95_ms': 11.0}}, baseline, 0.2),
+            []
+        )
+        regressions = compare_to_baseline({'policy-list': {'queries': 3, 'p95_ms': 13.0}}, baseline, 0.2)
+        self.assertEqual(len(regressions), 2)
+
+
+class BulkAcknowledgeTests(BaseAPITestCase):
+    url = '/api/v1/policy-acknowledgments/bulk-acknowledge/'
+
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        self.users = [
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+            for i in range(5)
+        ]
+        self.acknowledgment_ids = [
+            self.client.post(
+                '/api/v1/policy-acknowledgments/',
+                {'policy_id': str(self.policy.id), 'user': str(user.id)},
+                format='json'
+            ).json()['id']
+            for user in self.users
+        ]
+
+    def post(self, items, **data):
+        response = self.client.post(self.url, {'items': items, **data}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_per_item_results(self):
+        PolicyAcknowledgment.objects.filter(id=self.acknowledgment_ids[2]).update(expired_at=timezone.now())
+        ids = self.acknowledgment_ids
+        data = self.post([
+            ids[0],
+            {'user': str(self.users[1].id), 'policy': str(self.policy.id)},
+            {'id': ids[2]},
+            ids[0],
+            str(self.policy.id),
+            {'user': str(self.user.id), 'policy': str(self.policy.id)},
+            'not-a-uuid',
+            {'policy': str(self.policy.id)},
+        ])
+        self.assertEqual([result['status'] for result in data['results']], [
+            'acknowledged', 'acknowledged', 'expired', 'duplicate', 'not_found', 'not_found', 'invalid', 'invalid'
+        ])
+        self.assertEqual(data['results'][1]['id'], ids[1])
+        self.assertEqual(data['counts']['acknowledged'], 2)
+        self.assertEqual(self.post([ids[0]])['results'][0]['status'], 'already_acknowledged')
+
+    def test_pairs_match_only_open_requests(self):
+        pair = {'user': str(self.users[0].id), 'policy': str(self.policy.id)}
+        self.post([self.acknowledgment_ids[0]])
+        other_policy = create_policy(self.org, 'other')
+        other = self.client.post(
+            '/api/v1/policy-acknowledgments/',
+            {'policy_id': str(other_policy.id), 'user': str(self.users[1].id)},
+            format='json'
+        ).json()['id']
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.post([pair, {'user': str(self.users[1].id), 'policy': str(other_policy.id)}])
+        self.assertEqual([result['status'] for result in data['results']], ['not_found', 'acknowledged'])
+        self.assertEqual(data['results'][1]['id'], other)
+        # users[1]'s request of the first policy is left alone
+        self.assertFalse(PolicyAcknowledgment.objects.get(id=self.acknowledgment_ids[1]).is_acknowledged)
+        lookup = next(q['sql'] for q in ctx.captured_queries if 'core_policyacknowledgment' in q['sql'])
+        self.assertIn('"expired_at" IS NULL', lookup)
+
+    def test_acknowledgments_summary_and_inbox_are_updated(self):
+        acknowledged_at = '2026-01-02T03:04:05Z'
+        self.client.force_authenticate(self.user)
+        self.post(self.acknowledgment_ids[:3], acknowledged_at=acknowledged_at)
+        acknowledged = PolicyAcknowledgment.objects.filter(is_acknowledged=True)
+        self.assertEqual(set(str(pk) for pk in acknowledged.values_list('id', flat=True)), set(self.acknowledgment_ids[:3]))
+        self.assertEqual({a.acknowledged_at.isoformat() for a in acknowledged}, {'2026-01-02T03:04:05+00:00'})
+        self.assertFalse(PolicyAcknowledgmentStep.objects.filter(
+            policy_acknowledgment__in=acknowledged, is_acknowledged=False
+        ).exists())
+        self.assertEqual(PendingAcknowledgment.objects.count(), 2)
+
+        counters = ('policy_template', 'requested_count', 'acknowledged_count', 'expired_count')
+        incremental = sorted(ComplianceSummary.objects.values_list(*counters))
+        rebuild_compliance_summary()
+        self.assertEqual(incremental, sorted(ComplianceSummary.objects.values_list(*counters)))
+
+    def test_queries_do_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as few:
+            self.post(self.acknowledgment_ids[:1])
+        with CaptureQueriesContext(connection) as many:
+            self.post(self.acknowledgment_ids[1:])
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_chunks_are_applied_independently(self):
+        ids = self.acknowledgment_ids
+        results = bulk_acknowledge([ids[0], ids[1], ids[0], ids[2], ids[3]], chunk_size=2)
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['acknowledged', 'acknowledged', 'duplicate', 'acknowledged', 'acknowledged']
+        )
+
+    def test_other_orgs_acknowledgments_are_not_found(self):
+        other_org = Org.objects.create(name='Other Inc', domain='other.com')
+        other_dept = Dept.objects.create(name='IT', org=other_org)
+        self.client.force_authenticate(User.objects.create(
+            username='other', email='other@other.com', org=other_org, dept=other_dept
+        ))
+        self.assertEqual(self.post(self.acknowledgment_ids)['counts']['not_found'], 5)
+        self.assertFalse(PolicyAcknowledgment.objects.filter(is_acknowledged=True).exists())
+
+    def test_payload_is_validated(self):
+        for data in ({}, {'items': []}, {'items': 'x'}, {'items': ['x'], 'acknowledged_at': '2999-01-01T00:00:00Z'}):
+            self.assertEqual(self.client.post(self.url, data, format='json').status_code, 400)
+
+
+class EffectivePolicyTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'assigned')
+        self.unassigned = create_policy(self.org, 'unassigned')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        self.url = f'/api/v1/users/{self.user.id}/effective-policies/'
+
+    def test_user_gets_their_departments_policies(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'user': str(self.user.id), 'policies': [{
+            'policy': str(self.policy.id),
+            'policy_name': 'assigned',
+            'enforcement_type': self.policy.enforcement_type,
+            'policy_template': str(self.policy.policytemplate_set.get().id),
+            'template_version': '1.0.0',
+        }]})
+        self.assertEqual(self.client.get('/api/v1/users/not-a-uuid/effective-policies/').status_code, 404)
+
+    def test_warm_resolution_is_one_query_for_any_number_of_users(self):
+        users = [self.user] + [
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+            for i in range(20)
+        ]
+        resolve_effective_policies([user.id for user in users])
+        with CaptureQueriesContext(connection) as ctx:
+            resolved = resolve_effective_policies([user.id for user in users])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(resolved), 21)
+        self.assertEqual({policies[0]['policy'] for policies in resolved.values()}, {str(self.policy.id)})
+
+    def test_assignment_and_activation_invalidate_on_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            DeptPolicy.objects.create(dept=self.dept, policy=self.unassigned)
+        self.assertEqual(len(self.client.get(self.url).json()['policies']), 2)
+
+        template = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/v1/policytemplate/{template.id}/activate/', {'approved_by': str(self.user.id)}, format='json'
+            )
+        versions = {p['policy_name']: p['template_version'] for p in self.client.get(self.url).json()['policies']}
+        self.assertEqual(versions, {'assigned': '2.0.0', 'unassigned': '1.0.0'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DeptPolicy.objects.filter(policy=self.unassigned).delete()
+        self.assertEqual(len(self.client.get(self.url).json()['policies']), 1)
+
+    def test_bulk_variant_is_scoped_to_the_org(self):
+        other_org = Org.objects.create(name='Other Inc', domain='other.com')
+        other_dept = Dept.objects.create(name='IT', org=other_org)
+        other_user = User.objects.create(username='other', email='other@other.com', org=other_org, dept=other_dept)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            '/api/v1/users/effective-policies/', {'users': [str(self.user.id), str(other_user.id)]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results']), [str(self.user.id)])
+        self.assertEqual(response.json()['not_found'], [str(other_user.id)])
+        self.assertEqual(self.client.get(f'/api/v1/users/{other_user.id}/effective-policies/').status_code, 404)
+        self.assertEqual(self.client.post('/api/v1/users/effective-policies/', {'users': []}, format='json').status_code, 400)
+
+
+class FastListSerializationTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            policy = create_policy(self.org, f'policy {i} \u2028 caf\u00e9 "quoted"\n\x01')
+            DeptPolicy.objects.create(dept=self.dept, policy=policy)
+            self.client.post(
+                '/api/v1/policy-acknowledgments/',
+                {'policy_id': str(policy.id), 'user': str(self.user.id),
+                 'due_at': '2030-01-02T03:04:05.123456Z'},
+                format='json'
+            )
+            PolicyTemplate.objects.create(policy=policy, version='2.0.0', approved_by=self.user)
+
+    def assert_identical(self, url):
+        """
+        Every page of ``url`` is byte-for-byte the same with and without the fast path
+        """
+        pages = 0
+        while url:
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(url)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+            pages += 1
+            url = response.json()['next']
+        return pages
+
+    def test_acknowledgment_list_is_identical(self):
+        self.assertEqual(self.assert_identical('/api/v1/policy-acknowledgments/?page_size=2'), 2)
+
+    def test_template_list_with_nested_steps_is_identical(self):
+        self.assertEqual(self.assert_identical('/api/v1/policytemplate/?status=ACTIVE&page_size=2'), 2)
+        self.assert_identical('/api/v1/policytemplate/?status=DRAFT')
+
+    def test_dept_policy_list_is_identical(self):
+        self.assertEqual(self.assert_identical('/api/v1/dept-policies/?page_size=2'), 2)
+
+    def test_nested_levels_are_one_query_each(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/v1/policytemplate/?status=ACTIVE')
+        # ETag aggregate and templates, then steps and their fields
+        self.assertEqual(len(ctx.captured_queries), 4)
+
+    def test_micro_benchmark_paths_agree(self):
+        results = SerializationBenchmark(rows=10).run(iterations=1)
+        self.assertEqual(set(results), set(SerializationBenchmark.cases))
+        self.assertEqual(results['policyacknowledgment']['rows'], 3)
+
+
+class SparseFieldsetTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'sparse')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        PolicyAcknowledgment.objects.create(
+            policy=self.policy, policy_template=self.policy.policytemplate_set.get(),
+            user=self.user, org=self.org
+        )
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(url)
+        self.assertEqual(response.content, expected.content)
+        return response.json()
+
+    def test_without_parameters_responses_are_unchanged(self):
+        dept_policy = self.get_json('/api/v1/dept-policies/')['results'][0]
+        self.assertEqual(set(dept_policy), {'id', 'dept', 'policy'})
+        self.assertEqual(len(dept_policy['policy']['active_template']['steps']), 2)
+
+    def test_fields_with_nested_paths(self):
+        dept_policy = self.get_json('/api/v1/dept-policies/?fields=id,policy.name,policy.active_template.version')
+        self.assertEqual(dept_policy['results'][0]['policy'], {
+            'name': 'sparse', 'active_template': {'version': '1.0.0'}
+        })
+        self.assertEqual(set(dept_policy['results'][0]), {'id', 'policy'})
+
+    def test_empty_expand_collapses_relations_to_ids_without_joins(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.get_json('/api/v1/dept-policies/?expand=')
+        self.assertEqual(data['results'][0], {
+            'id': str(DeptPolicy.objects.get().id), 'dept': str(self.dept.id), 'policy': str(self.policy.id)
+        })
+        # The only join is the org scope on the policy; nothing is selected from it
+        selects = [q['sql'].split(' FROM ')[0] for q in ctx.captured_queries]
+        self.assertFalse([sql for sql in selects if '"core_policy"' in sql or '"core_dept"' in sql])
+        self.assertFalse([q for q in ctx.captured_queries if 'JOIN "core_dept"' in q['sql']])
+
+    def test_expand_embeds_only_listed_relations(self):
+        data = self.get_json('/api/v1/dept-policies/?expand=policy')
+        self.assertEqual(data['results'][0]['dept'], str(self.dept.id))
+        self.assertNotIn('active_template', data['results'][0]['policy'])
+        self.assertEqual(data['results'][0]['policy']['name'], 'sparse')
+
+    def test_lean_template_list_skips_step_prefetches(self):
+        full, _ = self.count_queries('/api/v1/policytemplate/?status=ACTIVE')
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            full_drf, _ = self.count_queries('/api/v1/policytemplate/?status=ACTIVE')
+            lean_drf, response = self.count_queries('/api/v1/policytemplate/?status=ACTIVE&fields=id,version')
+        lean, _ = self.count_queries('/api/v1/policytemplate/?status=ACTIVE&fields=id,version')
+        self.assertEqual(response.json()['results'], [{
+            'id': str(self.policy.policytemplate_set.get().id), 'version': '1.0.0'
+        }])
+        self.assertEqual(lean, full - 2)
+        self.assertEqual(lean_drf, full_drf - 2)
+        self.assertEqual(
+            self.get_json('/api/v1/policytemplate/?status=ACTIVE&fields=steps.fields.field_key')['results'],
+            [{'steps': [{'fields': [{'field_key': 'score'}]}] * 2}]
+        )
+
+    def test_only_selected_columns_are_loaded(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/policy/{self.policy.id}/?fields=id,name')
+        self.assertEqual(response.json(), {'id': str(self.policy.id), 'name': 'sparse'})
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries if 'core_policy' in q['sql'])
+        self.assertNotIn('description', sql)
+
+    def test_method_fields_keep_their_columns(self):
+        rebuild_compliance_summary()
+        queries, response = self.count_queries('/api/v1/compliance-summary/?fields=policy,acknowledged_percentage')
+        self.assertEqual(response.json()['results'], [{'policy': str(self.policy.id), 'acknowledged_percentage': 0.0}])
+        self.assertEqual(queries, 1)
+
+    def test_cached_active_template_is_pruned(self):
+        url = f'/api/v1/policy/{self.policy.id}/policytemplate/'
+        self.assertEqual(self.client.get(url + '?fields=version').json()['results'], [{'version': '1.0.0'}])
+        self.assertNotIn('steps', self.client.get(url + '?expand=').json()['results'][0])
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/depts/?fields=nope').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/depts/?expand=name').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/policy-acknowledgments/?fields=policy.name').status_code, 400)
+
+    def test_selection_is_part_of_the_etag(self):
+        url = f'/api/v1/policy/{self.policy.id}/'
+        etag = self.client.get(url).headers['ETag']
+        response = self.client.get(url + '?fields=id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': str(self.policy.id)})
+
+
+class TenantScopingTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'ours')
+        self.other_org = Org.objects.create(name='Other Inc', domain='other.com')
+        self.other_dept = Dept.objects.create(name='IT', org=self.other_org)
+        self.other_user = User.objects.create(
+            username='other', email='other@other.com', org=self.other_org, dept=self.other_dept
+        )
+        self.other_policy = create_policy(self.other_org, 'theirs')
+        for user, policy in ((self.user, self.policy), (self.other_user, self.other_policy)):
+            self.client.force_authenticate(user)
+            self.client.post(
+                '/api/v1/policy-acknowledgments/',
+                {'policy_id': str(policy.id), 'user': str(user.id)},
+                format='json'
+            )
+        self.client.force_authenticate(self.user)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return {str(row['id']) for row in response.data['results']}
+
+    def test_listings_only_show_the_users_org(self):
+        self.assertEqual(self.ids('/api/v1/policy/'), {str(self.policy.id)})
+        self.assertEqual(self.ids('/api/v1/depts/'), {str(self.dept.id)})
+        self.assertEqual(
+            self.ids('/api/v1/policy-acknowledgments/'),
+            {str(a.id) for a in PolicyAcknowledgment.objects.filter(org=self.org)}
+        )
+        response = self.client.get('/api/v1/compliance-summary/')
+        self.assertEqual({row['org'] for row in response.data['results']}, {self.org.id})
+
+    def test_other_orgs_rows_are_not_found(self):
+        other_acknowledgment = PolicyAcknowledgment.objects.get(org=self.other_org)
+        self.assertEqual(self.client.get(f'/api/v1/policy/{self.other_policy.id}/').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/api/v1/policy/{self.other_policy.id}/policytemplate/').status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(f'/api/v1/policy-acknowledgments/{other_acknowledgment.id}/').status_code, 404
+        )
+        response = self.client.post(
+            '/api/v1/policy-acknowledgments/',
+            {'policy_id': str(self.other_policy.id), 'user': str(self.user.id)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(
+            '/api/v1/dept-policies/',
+            {'dept_id': str(self.dept.id), 'policy_id': str(self.other_policy.id)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_nested_template_create_checks_the_policys_org(self):
+        payload = {'version': '2.0.0', 'steps': [{'name': 'step', 'description': 'step'}]}
+        for policy_id in (self.other_policy.id, '00000000-0000-0000-0000-000000000000', 'abc'):
+            for suffix, data in (('', payload), ('bulk-import/', [payload])):
+                response = self.client.post(
+                    f'/api/v1/policy/{policy_id}/policytemplate/{suffix}', data, format='json'
+                )
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(PolicyTemplate.objects.filter(policy=self.other_policy).count(), 1)
+
+    def test_acknowledgment_update_cannot_repoint_user_or_template(self):
+        acknowledgment = PolicyAcknowledgment.objects.get(org=self.org)
+        response = self.client.patch(
+            f'/api/v1/policy-acknowledgments/{acknowledgment.id}/',
+            {
+                'user': str(self.other_user.id),
+                'policy_template': str(self.other_policy.policytemplate_set.get().id),
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        acknowledgment.refresh_from_db()
+        self.assertEqual(acknowledgment.user_id, self.user.id)
+        self.assertEqual(acknowledgment.policy_template.policy_id, self.policy.id)
+
+    def test_created_dept_belongs_to_the_users_org(self):
+        response = self.client.post('/api/v1/depts/', {'name': 'Finance'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Dept.objects.get(id=response.data['id']).org_id, self.org.id)
+
+    def test_scoped_listing_filters_on_the_denormalized_org(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/v1/policy-acknowledgments/')
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('"core_policyacknowledgment"."org_id"', sql)
+        self.assertNotIn('"core_policy"', sql)
+
+    def test_anonymous_requests_are_refused(self):
+        self.client.force_authenticate(None)
+        for url in (
+            '/api/v1/policy/',
+            f'/api/v1/policy/{self.policy.id}/policytemplate/',
+            '/api/v1/policy-acknowledgments/',
+            '/api/v1/compliance-summary/',
+            f'/api/v1/users/{self.user.id}/effective-policies/',
+            '/api/v1/async/policy/',
+            f'/api/v1/async/policy/{self.policy.id}/active-template/',
+            f'/api/v1/async/users/{self.user.id}/pending-acknowledgments/',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 403, url)
+
+
+class BackgroundJobTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = create_policy(self.org, 'policy')
+        DeptPolicy.objects.create(dept=self.dept, policy=self.policy)
+        for i in range(3):
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+
+    def run_jobs(self, worker_id='worker', now=None):
+        return [run_job(job_id, worker_id) for job_id in claim_jobs(worker_id, 10, now=now)]
+
+    def test_async_campaign_returns_accepted_and_runs_in_worker(self):
+        response = self.client.post(
+            f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/?async=1', format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], JobStatus.QUEUED)
+        self.assertTrue(response['Location'].endswith(f"/api/v1/jobs/{response.data['id']}/"))
+        self.assertFalse(PolicyAcknowledgment.objects.exists())
+
+        self.assertEqual(self.run_jobs(), [JobStatus.SUCCEEDED])
+        job = self.client.get(response['Location']).data
+        self.assertEqual(job['status'], JobStatus.SUCCEEDED)
+        self.assertEqual(job['attempts'], 1)
+        self.assertEqual(job['result']['created_acknowledgments'], 4)
+        self.assertEqual(PolicyAcknowledgment.objects.count(), 4)
+
+    def test_async_activation_validates_before_queueing(self):
+        active = self.policy.policytemplate_set.get()
+        url = f'/api/v1/policytemplate/{active.id}/activate/?async=1'
+        response = self.client.post(url, {'approved_by': str(self.user.id)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+        draft = PolicyTemplate.objects.create(policy=self.policy, version='2.0.0')
+        response = self.client.post(
+            f'/api/v1/policytemplate/{draft.id}/activate/?async=1',
+            {'approved_by': str(self.user.id), 'migration': 'expire'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.run_jobs(), [JobStatus.SUCCEEDED])
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, TemplateStatus.ACTIVE)
+        self.assertEqual(Job.objects.get().result['id'], str(draft.id))
+
+    def test_failures_are_retried_with_backoff(self):
+        handler = mock.Mock(side_effect=[RuntimeError('boom'), {'ok': True}])
+        with mock.patch.dict(JOB_HANDLERS, {'flaky': handler}):
+            job = enqueue('flaky', max_attempts=2)
+            with self.assertLogs('core.jobs', 'INFO'):
+                self.assertEqual(self.run_jobs(), [JobStatus.QUEUED])
+            job.refresh_from_db()
+            self.assertEqual(job.error, 'RuntimeError: boom')
+            self.assertEqual(claim_jobs('worker', 10), [])
+
+            self.assertEqual(self.run_jobs(now=job.visible_at), [JobStatus.SUCCEEDED])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (JobStatus.SUCCEEDED, 2, {'ok': True}))
+
+    def test_permanent_errors_are_not_retried(self):
+        draft_only = create_policy(self.org, 'draft', status=TemplateStatus.DRAFT)
+        job = enqueue('acknowledgment_campaign', {'policy_id': str(draft_only.id)}, org_id=self.org.id)
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(self.run_jobs(), [JobStatus.FAILED])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'JobError: No active policy template found for this policy')
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        job = enqueue('rebuild_compliance_summary', org_id=self.org.id, max_attempts=2)
+        self.assertEqual(claim_jobs('dead', 10), [job.id])
+        self.assertEqual(claim_jobs('other', 10), [])
+
+        later = timezone.now() + timedelta(hours=1)
+        self.assertEqual(claim_jobs('other', 10, now=later), [job.id])
+        self.assertIsNone(run_job(job.id, 'dead'))
+        self.assertEqual(run_job(job.id, 'other'), JobStatus.SUCCEEDED)
+
+        # A lease that runs out on the last attempt fails the job
+        job = enqueue('rebuild_compliance_summary', max_attempts=1)
+        claim_jobs('dead', 10)
+        self.assertEqual(claim_jobs('other', 10, now=later), [])
+        self.assertEqual(Job.objects.get(id=job.id).status, JobStatus.FAILED)
+
+    def test_export_job_writes_downloadable_file(self):
+        self.client.post(f'/api/v1/policy/{self.policy.id}/acknowledgment-campaign/')
+        with tempfile.TemporaryDirectory() as export_dir, override_settings(JOBS={'EXPORT_DIR': export_dir}):
+            response = self.client.post(
+                '/api/v1/jobs/', {'kind': 'export', 'payload': {'output': 'csv', 'gzip': True}}, format='json'
+            )
+            self.assertEqual(response.status_code, 202)
+            download = f"/api/v1/jobs/{response.data['id']}/download/"
+            self.assertEqual(self.client.get(download).status_code, 409)
+
+            self.assertEqual(self.run_jobs(), [JobStatus.SUCCEEDED])
+            response = self.client.get(download)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('acknowledgments.csv.gz', response['Content-Disposition'])
+            lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+            self.assertEqual(len(lines), 9)
+
+    def test_unknown_kind_is_rejected(self):
+        response = self.client.post('/api/v1/jobs/', {'kind': 'drop_tables'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_and_job_status_are_org_scoped(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/v1/compliance-summary/rebuild/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().org_id, self.org.id)
+
+        other_org = Org.objects.create(name='Other', domain='other.com')
+        self.client.force_authenticate(User.objects.create(
+            username='other', email='o@other.com', org=other_org,
+            dept=Dept.objects.create(name='IT', org=other_org)
+        ))
+        self.assertEqual(self.client.get(f"/api/v1/jobs/{response.data['id']}/").status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/jobs/').data['results'], [])
+
+
+@override_settings(TRANSACTION_RETRY_ATTEMPTS=50)
+class ConcurrentWriteStressTests(TransactionTestCase):
+    """
+    Fires concurrent acknowledgment requests and activations from a thread
+    pool, each thread on its own database connection
+    """
+    users = 20
+    requests_per_user = 10
+    drafts = 5
+    workers = 8
+
+    def setUp(self):
+        active_template_cache.clear()
+        self.org = Org.objects.create(name='TechCorp Inc', domain='techcorp.com')
+        self.dept = Dept.objects.create(name='IT', org=self.org)
+        self.approver = User.objects.create(username='admin', email='admin@techcorp.com', org=self.org, dept=self.dept)
+        self.user_ids = [
+            str(User.objects.create(
+                username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept
+            ).id)
+            for i in range(self.users)
+        ]
+        self.policy = create_policy(self.org, 'policy')
+        self.draft_ids = [
+            str(PolicyTemplate.objects.create(policy=self.policy, version=f'{i + 2}.0.0').id)
+            for i in range(self.drafts)
+        ]
+
+    def post(self, url, data):
+        try:
+            started = time.perf_counter()
+            client = APIClient()
+            client.force_authenticate(self.approver)
+            response = client.post(url, data, format='json')
+            return url, response.status_code, response.json(), time.perf_counter() - started
+        finally:
+            connection.close()
+
+    def test_parallel_requests_and_activations_keep_invariants(self):
+        calls = [
+            ('/api/v1/policy-acknowledgments/', {'policy_id': str(self.policy.id), 'user': user_id})
+            for user_id in self.user_ids
+            for _ in range(self.requests_per_user)
+        ]
+        for i, draft_id in enumerate(self.draft_ids):
+            # Every draft activated twice; only the first of each pair may win
+            for _ in range(2):
+                calls.insert(
+                    (i * 2 + 1) * len(calls) // (self.drafts * 2 + 1),
+                    (f'/api/v1/policytemplate/{draft_id}/activate/',
+                     {'approved_by': str(self.approver.id), 'migration': 'reissue'})
+                )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as pool:
+            results = list(pool.map(lambda call: self.post(*call), calls))
+        elapsed = time.perf_counter() - started
+
+        summary = latency_summary([latency for _, _, _, latency in results])
+        sys.stderr.write(
+            f'\n{self.id()}: {len(calls)} requests in {elapsed:.2f}s, {len(calls) / elapsed:.0f} req/s, '
+            f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms\n"
+        )
+
+        self.assertEqual(len(results), len(calls))
+        activations = [(code, body) for url, code, body, _ in results if 'activate' in url]
+        requests = [(code, body) for url, code, body, _ in results if 'activate' not in url]
+        self.assertFalse([code for code, _ in activations + requests if code >= 500])
+        self.assertEqual(sum(code == 200 for code, _ in activations), self.drafts)
+        for code, body in requests:
+            self.assertIn(code, (201, 400), body)
+            if code == 400:
+                self.assertEqual(body['error'], 'An active acknowledgment request already exists for this policy')
+        # Each user's first request creates theirs and every retry of it is refused
+        created = Counter(body['user'] for code, body in requests if code == 201)
+        self.assertEqual(created, Counter({user_id: 1 for user_id in self.user_ids}))
+
+        self.assertEqual(
+            PolicyTemplate.objects.filter(policy=self.policy, status=TemplateStatus.ACTIVE).count(), 1
+        )
+        open_requests = PolicyAcknowledgment.objects.filter(is_acknowledged=False, expired_at__isnull=True)
+        self.assertEqual(open_requests.count(), self.users)
+        self.assertEqual(open_requests.values('user').distinct().count(), self.users)
+        self.assertEqual(
+            PendingAcknowledgment.objects.count(), self.users
+        )
+        counters = ('policy_template', 'requested_count', 'acknowledged_count', 'expired_count')
+        incremental = sorted(ComplianceSummary.objects.values_list(*counters))
+        rebuild_compliance_summary()
+        self.assertEqual(incremental, sorted(ComplianceSummary.objects.values_list(*counters)))
+
+
+class JobWorkerPoolTests(TransactionTestCase):
+    """
+    Runs queued jobs through a real worker with a thread pool, each thread
+    on its own database connection
+    """
+
+    def setUp(self):
+        active_template_cache.clear()
+        self.org = Org.objects.create(name='TechCorp Inc', domain='techcorp.com')
+        self.dept = Dept.objects.create(name='IT', org=self.org)
+        for i in range(10):
+            User.objects.create(username=f'user{i}', email=f'user{i}@techcorp.com', org=self.org, dept=self.dept)
+        self.policies = [create_policy(self.org, f'policy {i}') for i in range(5)]
+        for policy in self.policies:
+            DeptPolicy.objects.create(dept=self.dept, policy=policy)
+
+    def test_burst_worker_drains_queue(self):
+        for policy in self.policies:
+            enqueue('acknowledgment_campaign', {'policy_id': str(policy.id)}, org_id=self.org.id)
+            enqueue('rebuild_compliance_summary', org_id=self.org.id)
+
+        counts = Worker(concurrency=4, poll_interval=0.05).run(burst=True)
+
+        self.assertEqual(counts, {JobStatus.SUCCEEDED: 10})
+        self.assertEqual(PolicyAcknowledgment.objects.count(), 50)
+        self.assertFalse(Job.objects.exclude(status=JobStatus.SUCCEEDED).exists())
+        self.assertEqual(Job.objects.filter(locked_by='').count(), 10)
@@ -1,7 +1,10 @@
+from collections import Counter
+
 from django.shortcuts import render
 
 # Create your views here.
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status, serializers
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import (Policy,
@@ -10,25 +13,135 @@ from .models import (Policy,
                      DeptPolicy,
                      User,
                      TemplateStatus,
-                     PolicyTemplateLog,
-                     PolicyAcknowledgment)
+                     PolicyAcknowledgment,
+                     PendingAcknowledgment,
+                     PolicyStepField,
+                     PolicyStepFieldValue,
+                     ComplianceSummary,
+                     Job,
+                     JobStatus)
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Sum, prefetch_related_objects
 from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
 from .serializers import (PolicySerializer,
                           DeptSerializer,
                           DeptPolicySerializer,
                           PolicyTemplateReadSerializer,
                           PolicyTemplateCreateSerializer,
                           PolicyTemplateUpdateSerializer,
-                          PolicyAcknowledgmentSerializer)
+                          PolicyAcknowledgmentSerializer,
+                          PendingAcknowledgmentSerializer,
+                          ComplianceSummarySerializer,
+                          PolicyStepFieldValueSerializer,
+                          StepSubmissionSerializer,
+                          StepBatchSubmissionSerializer,
+                          BulkAcknowledgeSerializer,
+                          EffectivePoliciesRequestSerializer,
+                          JobSerializer,
+                          JobCreateSerializer,
+                          acknowledged_percentage)
+from .compliance import increment_summary, summary_keys
+from .services import (BULK_CREATE_BATCH_SIZE,
+                       BulkAcknowledgeStatus,
+                       activate_template,
+                       bulk_acknowledge,
+                       renewal_due_at,
+                       request_acknowledgment,
+                       run_acknowledgment_campaign)
+from .cache import active_template_cache
+from .applicability import resolve_effective_policies
+from .jobs import enqueue, export_path
+from .instrumentation import metrics_settings, registry as metrics_registry
+from .inbox import refresh_inbox, remove_from_inbox
+from .submissions import VALUE_PREDICATES, field_value_predicates, submit_steps
+from .etags import ConditionalGetMixin, make_etag, page_version, queryset_version
+from .tenancy import OrgScopedMixin, request_org_id
+from .fastserialization import FastListMixin
+from .fieldsets import FieldSelectionMixin
+from .exports import EXPORT_FORMATS, export_file_info, export_queryset, parse_export_filters, stream_export
+
+def row_version(queryset, pk):
+    """
+    (revision, updated_at) of one row by primary key, or None if it does not exist
+    """
+    try:
+        return queryset.filter(pk=pk).values_list('revision', 'updated_at').first()
+    except (DjangoValidationError, ValueError):
+        return None
+
+def wants_async(request):
+    return request.query_params.get('async') in ('1', 'true')
+
+def accepted(request, job):
+    """
+    202 response for a queued job, pointing at its status endpoint
+    """
+    response = Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('job-detail', args=[job.id], request=request)
+    return response
+
+def parse_due_at(data):
+    due_at = data.get('due_at')
+    if not due_at:
+        return None
+    try:
+        return serializers.DateTimeField().to_internal_value(due_at)
+    except serializers.ValidationError as e:
+        raise ValidationError({'due_at': e.detail})
 
-class PolicyViewSet(viewsets.ReadOnlyModelViewSet):
+class PolicyViewSet(OrgScopedMixin, FieldSelectionMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Policy.objects.all()
     serializer_class = PolicySerializer
 
-class PolicyTemplateViewSet(viewsets.ModelViewSet):
+    def get_list_etag(self, request):
+        # Policy.updated_at also moves with its templates, and the embedded
+        # templates are cached per revision, so the page's versions cover the body
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginator.page_queryset(queryset, request, self) if self.paginator else None
+        if page is None:
+            return make_etag(request, self.org_id, *queryset_version(queryset))
+        return make_etag(request, self.org_id, *page_version(page))
+
+    def get_retrieve_etag(self, request):
+        version = row_version(Policy.objects.for_org(self.org_id), self.kwargs['pk'])
+        return make_etag(request, *version) if version else None
+
+    @action(detail=True, methods=['post'], url_path='acknowledgment-campaign')
+    def acknowledgment_campaign(self, request, pk=None):
+        """
+        Request acknowledgment of the policy from every user in its assigned
+        departments. With ``async=1`` the fan-out runs as a background job.
+        """
+        policy = self.get_object()
+        try:
+            batch_size = int(request.data.get('batch_size', BULK_CREATE_BATCH_SIZE))
+        except (TypeError, ValueError):
+            raise ValidationError({'batch_size': 'batch_size must be an integer'})
+        if batch_size < 1:
+            raise ValidationError({'batch_size': 'batch_size must be positive'})
+        campaign = {
+            'is_recurring': request.data.get('is_recurring', False),
+            'due_at': parse_due_at(request.data),
+            'batch_size': batch_size,
+        }
+
+        if wants_async(request):
+            job = enqueue('acknowledgment_campaign', {'policy_id': policy.id, **campaign}, org_id=self.org_id)
+            return accepted(request, job)
+        result = run_acknowledgment_campaign(policy.id, **campaign)
+        if result is None:
+            return Response(
+                {'error': 'No active policy template found for this policy'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(result, status=status.HTTP_201_CREATED)
+
+class PolicyTemplateViewSet(OrgScopedMixin, FieldSelectionMixin, ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
 
     def get_serializer_class(self):
         if self.action in ['create']:
@@ -38,10 +151,13 @@ class PolicyTemplateViewSet(viewsets.ModelViewSet):
     def get_policy(self):
         policy_id = self.kwargs.get('policy_pk')
         if policy_id:
-            return get_object_or_404(
-                Policy.objects.all(),
-                id=policy_id
-            )
+            try:
+                return get_object_or_404(
+                    Policy.objects.for_org(self.org_id),
+                    id=policy_id
+                )
+            except DjangoValidationError:
+                raise Http404
         return None
 
     def get_queryset(self):
@@ -67,20 +183,100 @@ class PolicyTemplateViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_list_etag(self, request):
+        policy_id = self.kwargs.get('policy_pk')
+        if policy_id:
+            # Policy.revision also covers changes to its templates, steps and fields
+            version = row_version(Policy.objects.for_org(self.org_id), policy_id)
+            if not version:
+                return None
+            # Keys the cached ACTIVE template list_templates serves on the same revision
+            self.policy_revision = version[0]
+            return make_etag(request, *version)
+        return make_etag(request, self.org_id, *queryset_version(self.filter_queryset(self.get_queryset())))
+
+    def get_retrieve_etag(self, request):
+        version = row_version(PolicyTemplate.objects.for_org(self.org_id), self.kwargs['pk'])
+        return make_etag(request, *version) if version else None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_etag(request), self.list_templates, request, *args, **kwargs
+        )
+
+    def list_templates(self, request, *args, **kwargs):
+        """
+        The default listing of a policy's templates is its ACTIVE template,
+        which is served from the active template cache
+        """
+        policy_id = self.kwargs.get('policy_pk')
+        if not policy_id or request.query_params.get('status'):
+            return FastListMixin.list(self, request, *args, **kwargs)
+        # The cache is not tenant-aware; check the policy is the caller's
+        self.get_policy()
+        revision = getattr(self, 'policy_revision', None)
+        try:
+            active_templates = active_template_cache.get_many(
+                [policy_id], {policy_id: revision} if revision is not None else None
+            )
+        except ValueError:
+            raise Http404
+        if not active_templates:
+            raise Http404
+        active_template = next(iter(active_templates.values()))
+        if self.field_selection is not None:
+            # Validates the selection against the serializer like the other paths
+            self.get_serializer()
+            active_template = self.field_selection.prune(active_template)
+        return Response({
+            'next': None,
+            'previous': None,
+            'results': [active_template] if active_template else [],
+        })
+
     def create(self, request, *args, **kwargs):
+        # On the nested route the policy comes from the URL, which the
+        # serializer does not scope to the org
+        self.get_policy()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         template = serializer.save()
-        
+
+        prefetch_related_objects([template], 'policystep_set', 'policystep_set__policystepfield_set')
         response_serializer = PolicyTemplateReadSerializer(template)
         return Response(
             response_serializer.data,
             status=status.HTTP_201_CREATED
         )
+
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request, *args, **kwargs):
+        """
+        Create many DRAFT templates, with nested steps and fields, in one transaction
+        """
+        self.get_policy()
+        serializer = PolicyTemplateCreateSerializer(
+            data=request.data,
+            many=True,
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        templates = serializer.save()
+
+        prefetch_related_objects(templates, 'policystep_set', 'policystep_set__policystepfield_set')
+        response_serializer = PolicyTemplateReadSerializer(templates, many=True)
+        return Response(
+            response_serializer.data,
+            status=status.HTTP_201_CREATED
+        )
     
     @action(detail=True, methods=['post'], url_path='activate')
-    @transaction.atomic
     def activate(self, request, *args, **kwargs):
+        """
+        Make the DRAFT template its policy's ACTIVE one. With ``async=1`` the
+        request is validated and the activation, with its migration of open
+        acknowledgments, runs as a background job.
+        """
         template = self.get_object()
         
         serializer = PolicyTemplateUpdateSerializer(
@@ -89,131 +285,238 @@ class PolicyTemplateViewSet(viewsets.ModelViewSet):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        print(serializer.validated_data)
-        
-        active_template = PolicyTemplate.objects.filter(
-            policy=template.policy,
-            status=TemplateStatus.ACTIVE
-        ).first()
-        
-        if active_template:
-            PolicyTemplateLog.objects.create(
-                policy_template=active_template,
-                prev_status=TemplateStatus.ACTIVE,
-                curr_status=TemplateStatus.ARCHIVED,
-                updated_by=serializer.validated_data["approved_by"]
-            )
-            
-            active_template.status = TemplateStatus.ARCHIVED
-            active_template.save()
-        
-        PolicyTemplateLog.objects.create(
-            policy_template=template,
-            prev_status=template.status,
-            curr_status=TemplateStatus.ACTIVE,
-            updated_by=serializer.validated_data["approved_by"]
+
+        if wants_async(request):
+            job = enqueue('activate_template', {
+                'template_id': template.id,
+                'approved_by': serializer.validated_data["approved_by"].id,
+                'migration': serializer.validated_data["migration"],
+            }, org_id=self.org_id)
+            return accepted(request, job)
+
+        template, migrated = activate_template(
+            template.id,
+            serializer.validated_data["approved_by"],
+            serializer.validated_data["migration"]
         )
         
-        template.status = TemplateStatus.ACTIVE
-        template.approved_by = serializer.validated_data["approved_by"]
-        template.save()
-        
         response_serializer = PolicyTemplateReadSerializer(template)
         return Response(
-            response_serializer.data,
+            {**response_serializer.data, 'migration': migrated},
             status=status.HTTP_200_OK
         )
     
-class PolicyAcknowledgmentViewSet(viewsets.ModelViewSet):
+class PolicyAcknowledgmentViewSet(OrgScopedMixin, FieldSelectionMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = PolicyAcknowledgment.objects.all()
     serializer_class = PolicyAcknowledgmentSerializer
+    pagination_ordering = ('requested_at', 'id')
+
+    def get_queryset(self):
+        """
+        Optionally filter by user, and to open requests with ``pending=1``
+        """
+        queryset = PolicyAcknowledgment.objects.all()
+        user_id = self.request.query_params.get('user_id')
+        if user_id:
+            try:
+                queryset = queryset.filter(user_id=user_id)
+            except DjangoValidationError as e:
+                raise ValidationError({'user_id': e.messages})
+        if self.request.query_params.get('pending') in ('1', 'true'):
+            queryset = queryset.filter(is_acknowledged=False, expired_at__isnull=True)
+        return queryset
     
     def create(self, request, *args, **kwargs):
         policy_id = request.data.get('policy_id')
-        user = User.objects.get(id=request.data.get('user'))
+        users = User.objects.filter(org_id=self.org_id)
+        try:
+            user = users.get(id=request.data.get('user'))
+        except (User.DoesNotExist, DjangoValidationError, ValueError):
+            user = None
         
         if not policy_id or not user:
             return Response(
                 {'error': 'policy_id and user are required fields'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        due_at = parse_due_at(request.data)
 
         try:
             
-            policy = get_object_or_404(Policy, id=policy_id)
+            policy = get_object_or_404(Policy.objects.for_org(self.org_id), id=policy_id)
             
-            policy_template = PolicyTemplate.objects.filter(
-                policy=policy,
-                status='ACTIVE'
-            ).first()
+            result = request_acknowledgment(
+                policy.id,
+                user,
+                due_at=due_at,
+                is_recurring=request.data.get('is_recurring', False),
+                is_user_initiated=request.data.get('is_user_initiated', False)
+            )
             
-            if not policy_template:
+            if result is None:
                 return Response(
                     {'error': 'No active policy template found for this policy'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-    
-            existing_acknowledgment = PolicyAcknowledgment.objects.filter(
-                policy_template__policy=policy,
-                user=user,
-                is_acknowledged=False,
-                expired_at__isnull=True
-            ).first()
             
-            if existing_acknowledgment:
+            acknowledgment, created = result
+            if not created:
                 return Response(
                     {'error': 'An active acknowledgment request already exists for this policy'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            acknowledgment = PolicyAcknowledgment.objects.create(**{
-                'policy_template': policy_template,
-                'user': user,
-                'is_recurring': request.data.get('is_recurring', False),
-                'is_user_initiated': request.data.get('is_user_initiated', False),
-                'requested_at': timezone.now()
-            })
-            
             serializer = PolicyAcknowledgmentSerializer(acknowledgment)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
+        except Http404:
+            raise
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        refresh_inbox([serializer.instance.id])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        keys = list(summary_keys(PolicyAcknowledgment.objects.filter(id=instance.id)))
+        if instance.expired_at is None:
+            increment_summary('requested_count', keys, amount=-1)
+            if instance.is_acknowledged:
+                increment_summary('acknowledged_count', keys, amount=-1)
+        elif not instance.is_acknowledged and instance.expired_at <= timezone.now():
+            increment_summary('expired_count', keys, amount=-1)
+        instance.delete()
+
+    @action(detail=True, methods=['post'], url_path=r'steps/(?P<step_id>[^/.]+)/submit')
+    def submit_step(self, request, pk=None, step_id=None):
+        """
+        Submit the field values of one step
+        """
+        serializer = StepSubmissionSerializer(data={**request.data, 'step_id': step_id})
+        serializer.is_valid(raise_exception=True)
+        return self.submission_response([serializer.validated_data])
+
+    @action(detail=True, methods=['post'], url_path='steps/submit')
+    def submit_steps(self, request, pk=None):
+        """
+        Submit the field values of several steps at once
+        """
+        serializer = StepBatchSubmissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.submission_response(serializer.validated_data['steps'])
+
+    def submission_response(self, submissions):
+        acknowledgment, steps_total, steps_acknowledged = submit_steps(
+            self.get_object().id,
+            submissions
+        )
+        return Response({
+            **self.get_serializer(acknowledgment).data,
+            'steps_total': steps_total,
+            'steps_acknowledged': steps_acknowledged,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every matching acknowledgment with its steps and field values.
+        ``output`` selects ndjson (default) or csv; ``gzip=1`` compresses the stream.
+        """
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': f"output must be one of {', '.join(EXPORT_FORMATS)}"})
+        try:
+            filters = parse_export_filters(request.query_params)
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+        filters['org_id'] = self.org_id
+
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        content_type, filename = export_file_info(export_format, compress)
+        response = StreamingHttpResponse(
+            stream_export(export_queryset(**filters), export_format, compress),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @action(detail=True, methods=['put'])
     def acknowledge(self, request, pk=None):
-        try:
-            acknowledgment = self.get_object()
-            
-            if acknowledgment.is_acknowledged:
-                return Response(
-                    {'error': 'Policy is already acknowledged'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if acknowledgment.expired_at and acknowledgment.expired_at < timezone.now():
-                return Response(
-                    {'error': 'Policy acknowledgment request has expired'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
+        acknowledgment = self.get_object()
+
+        if acknowledgment.is_acknowledged:
+            return Response(
+                {'error': 'Policy is already acknowledged'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if acknowledgment.expired_at and acknowledgment.expired_at < timezone.now():
+            return Response(
+                {'error': 'Policy acknowledgment request has expired'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if acknowledgment.policyacknowledgmentstep_set.filter(is_acknowledged=False).exists():
+            return Response(
+                {'error': 'All steps must be submitted before acknowledging'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
             acknowledgment.is_acknowledged = True
             acknowledgment.acknowledged_at = timezone.now()
+            if acknowledgment.is_recurring:
+                acknowledgment.due_at = renewal_due_at(acknowledgment.acknowledged_at)
             acknowledgment.save()
-            
-            serializer = self.get_serializer(acknowledgment)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            increment_summary(
+                'acknowledged_count',
+                summary_keys(PolicyAcknowledgment.objects.filter(id=acknowledgment.id))
             )
+            remove_from_inbox([acknowledgment.id])
+
+        serializer = self.get_serializer(acknowledgment)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-class DeptViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-acknowledge')
+    def acknowledge_batch(self, request):
+        """
+        Acknowledge many requests, given as acknowledgment ids or as
+        ``{"user": ..., "policy": ...}`` pairs, e.g. completions imported from
+        an external LMS. Returns per-status counts and each item's result, in
+        input order.
+        """
+        serializer = BulkAcknowledgeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_acknowledge(
+            serializer.validated_data['items'],
+            org_id=self.org_id,
+            acknowledged_at=serializer.validated_data.get('acknowledged_at')
+        )
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'counts': {name: counts[name] for name in BulkAcknowledgeStatus.choices},
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+class PendingAcknowledgmentViewSet(FieldSelectionMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The requesting user's open acknowledgment requests, oldest first, read
+    from the inbox projection with one index range scan
+    """
+    serializer_class = PendingAcknowledgmentSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_ordering = ('requested_at', 'acknowledgment')
+
+    def get_queryset(self):
+        return PendingAcknowledgment.objects.filter(user=self.request.user)
+
+class DeptViewSet(OrgScopedMixin, FieldSelectionMixin, viewsets.ModelViewSet):
     queryset = Dept.objects.all()
     serializer_class = DeptSerializer
     
@@ -227,7 +530,10 @@ class DeptViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(name__icontains=name)
         return queryset
 
-class DeptPolicyViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        serializer.save(org_id=self.org_id)
+
+class DeptPolicyViewSet(OrgScopedMixin, FieldSelectionMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = DeptPolicy.objects.all()
     serializer_class = DeptPolicySerializer
     
@@ -245,6 +551,21 @@ class DeptPolicyViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(policy_id=policy_id)
         
         return queryset.select_related('dept', 'policy')
+
+    def fill_method_fields(self, data, rows):
+        selection = self.field_selection
+        if selection is not None:
+            if not (selection.includes('policy') and selection.expands('policy')):
+                return data
+            selection = selection.child('policy')
+            if not (selection.includes('active_template') and selection.expands('active_template')):
+                return data
+            selection = selection.child('active_template')
+        templates = active_template_cache.get_many([row['policy__id'] for row in rows])
+        for item, row in zip(data, rows):
+            template = templates.get(row['policy__id'])
+            item['policy']['active_template'] = template if selection is None else selection.prune(template)
+        return data
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -259,4 +580,207 @@ class DeptPolicyViewSet(viewsets.ModelViewSet):
         dept_policy = DeptPolicy.objects.select_related('dept', 'policy').get(id=dept_policy.id)
         response_serializer = self.get_serializer(dept_policy)
         
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+class FieldValueViewSet(OrgScopedMixin, FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = PolicyStepFieldValueSerializer
+
+    def get_queryset(self):
+        """
+        Submitted field values, optionally filtered by field, policy, template,
+        acknowledgment or user. ``eq``, ``lt``, ``lte``, ``gt`` and ``gte``
+        compare against the typed column of the matched fields, so a query like
+        ``?policy_id=...&field_key=score&lt=80`` is a range scan on the
+        (policy_step_field, value_number) index.
+        """
+        params = self.request.query_params
+        queryset = PolicyStepFieldValue.objects.select_related(
+            'policy_step_field', 'policy_acknowledgment_step'
+        )
+        fields = PolicyStepField.objects.all()
+        narrowed = False
+        try:
+            for param, lookup in (
+                ('acknowledgment_id', 'policy_acknowledgment_step__policy_acknowledgment_id'),
+                ('user_id', 'policy_acknowledgment_step__policy_acknowledgment__user_id'),
+            ):
+                if params.get(param):
+                    queryset = queryset.filter(**{lookup: params[param]})
+            for param, lookup in (
+                ('field_id', 'id'),
+                ('field_key', 'field_key'),
+                ('policy_template_id', 'policy_step__policy_template_id'),
+                ('policy_id', 'policy_step__policy_template__policy_id'),
+            ):
+                if params.get(param):
+                    fields = fields.filter(**{lookup: params[param]})
+                    narrowed = True
+        except DjangoValidationError as e:
+            raise ValidationError({'error': e.messages})
+        if not narrowed:
+            if any(name in params for name in VALUE_PREDICATES):
+                raise ValidationError({'error': 'Value filters need field_id or field_key'})
+            return queryset
+
+        fields = list(fields.values_list('id', 'field_value_type'))
+        field_value_types = {field_value_type for _, field_value_type in fields}
+        if len(field_value_types) > 1 and any(name in params for name in VALUE_PREDICATES):
+            raise ValidationError({
+                'error': 'Matched fields have different types; narrow with field_id, policy_id or policy_template_id'
+            })
+        queryset = queryset.filter(policy_step_field_id__in=[field_id for field_id, _ in fields])
+        if field_value_types:
+            try:
+                queryset = queryset.filter(**field_value_predicates(field_value_types.pop(), params))
+            except ValueError as e:
+                raise ValidationError({'error': str(e)})
+        return queryset
+
+class ComplianceSummaryViewSet(OrgScopedMixin, FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ComplianceSummarySerializer
+
+    def get_queryset(self):
+        """
+        Optionally filter by org, department, policy or template
+        """
+        queryset = ComplianceSummary.objects.all()
+        for param in ('org_id', 'dept_id', 'policy_id', 'policy_template_id'):
+            value = self.request.query_params.get(param)
+            if value is not None:
+                try:
+                    queryset = queryset.filter(**{param: value})
+                except DjangoValidationError as e:
+                    raise ValidationError({param: e.messages})
+        return queryset
+
+    @action(detail=False, methods=['get'], url_path='by-org')
+    def by_org(self, request):
+        """
+        Counters rolled up per org and policy across departments and templates
+        """
+        rows = self.filter_queryset(self.get_queryset()).values('org_id', 'policy_id').annotate(
+            requested_count=Sum('requested_count'),
+            acknowledged_count=Sum('acknowledged_count'),
+            expired_count=Sum('expired_count')
+        ).order_by('org_id', 'policy_id')
+        return Response([
+            {
+                'org': row['org_id'],
+                'policy': row['policy_id'],
+                'requested_count': row['requested_count'],
+                'acknowledged_count': row['acknowledged_count'],
+                'expired_count': row['expired_count'],
+                'acknowledged_percentage': acknowledged_percentage(
+                    row['acknowledged_count'], row['requested_count']
+                ),
+            }
+            for row in rows
+        ])
+
+    @action(detail=False, methods=['post'])
+    def rebuild(self, request):
+        """
+        Recompute the summary of the requesting user's org (every org when
+        unscoped) in a background job
+        """
+        return accepted(request, enqueue('rebuild_compliance_summary', org_id=self.org_id))
+
+
+class UserViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['get'], url_path='effective-policies')
+    def effective_policies(self, request, pk=None):
+        """
+        The policies assigned to the user's department, with their ACTIVE
+        template, from the cached per-department lists
+        """
+        try:
+            resolved = resolve_effective_policies([pk], org_id=request_org_id(request))
+        except DjangoValidationError:
+            raise Http404
+        if not resolved:
+            raise Http404
+        user_id, policies = resolved.popitem()
+        return Response({'user': str(user_id), 'policies': policies})
+
+    @action(detail=False, methods=['post'], url_path='effective-policies')
+    def bulk_effective_policies(self, request):
+        """
+        Effective policies of many users, keyed by user id; ids that match no
+        user of the org are listed under ``not_found``
+        """
+        serializer = EffectivePoliciesRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = list(dict.fromkeys(serializer.validated_data['users']))
+        resolved = resolve_effective_policies(user_ids, org_id=request_org_id(request))
+        return Response({
+            'results': {str(user_id): policies for user_id, policies in resolved.items()},
+            'not_found': [str(user_id) for user_id in user_ids if user_id not in resolved],
+        })
+
+class JobViewSet(OrgScopedMixin, FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    pagination_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        """
+        Optionally filter by status or kind
+        """
+        queryset = Job.objects.all()
+        for param in ('status', 'kind'):
+            value = self.request.query_params.get(param)
+            if value is not None:
+                queryset = queryset.filter(**{param: value})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """
+        Queue a job of a registered kind, e.g. ``{"kind": "export", "payload":
+        {"output": "csv", "policy_id": ...}}``; its status is at the Location URL
+        """
+        serializer = JobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue(serializer.validated_data['kind'], serializer.validated_data['payload'], org_id=self.org_id)
+        return accepted(request, job)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        The file written by a succeeded export job
+        """
+        job = self.get_object()
+        if job.kind != 'export':
+            raise Http404
+        if job.status != JobStatus.SUCCEEDED:
+            return Response(
+                {'error': f'Export is {job.status.lower()}', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        path = export_path(job)
+        if path is None:
+            raise Http404
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=job.result['filename'],
+            content_type=job.result['content_type']
+        )
+
+class MetricsViewSet(viewsets.ViewSet):
+    def list(self, request):
+        """
+        Rolling per-endpoint latency, SQL time and query count histograms of
+        this process, recorded by QueryMetricsMiddleware when enabled
+        """
+        return Response({
+            'enabled': metrics_settings()['ENABLED'],
+            **metrics_registry.snapshot(),
+        })
+
+class CacheStatsViewSet(viewsets.ViewSet):
+    def list(self, request):
+        """
+        Hit and miss counters of the active template cache in this process
+        """
+        return Response(active_template_cache.stats())
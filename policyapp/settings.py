@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Inactive unless REQUEST_METRICS['ENABLED']
+    'core.instrumentation.QueryMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'policyapp.urls'
@@ -79,9 +82,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so two
+            # transactions that both read first cannot deadlock upgrading
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file rather than SQLite's shared-cache in-memory database, which
+        # fails concurrent readers at once instead of waiting on the lock
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Attempts for write services (core.concurrency.retry_on_conflict) aborted by
+# a serialization failure, a deadlock or, on SQLite, a locked database
+TRANSACTION_RETRY_ATTEMPTS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -102,6 +117,87 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 AUTH_USER_MODEL = "core.User"
 
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+# Upper bound for the ?page_size= query parameter on list endpoints
+API_MAX_PAGE_SIZE = 1000
+
+# Serve the acknowledgment, template and dept-policy lists from values() rows
+# (core.fastserialization) instead of DRF serializers; the JSON is identical
+FAST_LIST_SERIALIZATION = True
+
+# Read-through cache of serialized ACTIVE templates. BACKEND is 'lru' (per
+# process, MAX_ENTRIES entries) or 'django' (the CACHE_ALIAS cache, shared).
+ACTIVE_TEMPLATE_CACHE = {
+    'BACKEND': 'lru',
+    'MAX_ENTRIES': 1024,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Effective policies of each department (core.applicability), same options
+# as ACTIVE_TEMPLATE_CACHE; one entry per department
+DEPT_POLICY_CACHE = {
+    'BACKEND': 'lru',
+    'MAX_ENTRIES': 10000,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Most user ids one POST /users/effective-policies/ may carry
+EFFECTIVE_POLICIES_MAX_USERS = 50000
+
+# Per-request query/latency metrics (core.instrumentation). Requests over
+# QUERY_BUDGET queries or LATENCY_BUDGET_MS are flagged; BUDGETS overrides
+# both per view name, e.g. {'policy-list': {'queries': 5, 'latency_ms': 200}}.
+# Histograms cover the last WINDOW_SECONDS, split into SLOTS slices.
+REQUEST_METRICS = {
+    'ENABLED': os.environ.get('REQUEST_METRICS_ENABLED') == '1',
+    'QUERY_BUDGET': 20,
+    'LATENCY_BUDGET_MS': 500,
+    'BUDGETS': {},
+    'WINDOW_SECONDS': 300,
+    'SLOTS': 30,
+}
+
+# One JSON line per request from QueryMetricsMiddleware; over-budget ones at WARNING.
+# core.jobs logs job failures and retries.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'core.jobs': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Most items one POST /policy-acknowledgments/bulk-acknowledge/ may carry
+BULK_ACKNOWLEDGE_MAX_ITEMS = 100000
+
+# Days until a recurring acknowledgment re-issued by sweep_acknowledgments comes due
+ACKNOWLEDGMENT_RECURRENCE_DAYS = 365
+
+# Background jobs (core.jobs) and the run_worker defaults. POOL is 'thread' or
+# 'process'. A claimed job stays invisible to other workers for
+# VISIBILITY_TIMEOUT seconds, renewed while it runs; failures are retried up to
+# MAX_ATTEMPTS attempts in all, RETRY_DELAY seconds apart, doubling each time.
+# Export jobs write their files to EXPORT_DIR.
+JOBS = {
+    'POOL': 'thread',
+    'CONCURRENCY': 4,
+    'VISIBILITY_TIMEOUT': 300,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'EXPORT_DIR': BASE_DIR / 'exports',
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -18,23 +18,41 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
+from core import async_views
 from core.views import (PolicyViewSet,
                         PolicyTemplateViewSet,
                         DeptViewSet,
                         DeptPolicyViewSet,
-                        PolicyAcknowledgmentViewSet)
+                        PolicyAcknowledgmentViewSet,
+                        PendingAcknowledgmentViewSet,
+                        FieldValueViewSet,
+                        ComplianceSummaryViewSet,
+                        CacheStatsViewSet,
+                        MetricsViewSet,
+                        UserViewSet,
+                        JobViewSet)
 
 router = DefaultRouter()
 router.register(r'policy', PolicyViewSet, basename='policy')
 router.register(r'policytemplate', PolicyTemplateViewSet, basename='policytemplate')
 router.register(r'policy-acknowledgments', PolicyAcknowledgmentViewSet)
+router.register(r'me/pending-acknowledgments', PendingAcknowledgmentViewSet, basename='pending-acknowledgment')
+router.register(r'users', UserViewSet, basename='user')
 router.register(r'depts', DeptViewSet, basename='dept')
 router.register(r'dept-policies', DeptPolicyViewSet, basename='dept-policy')
+router.register(r'field-values', FieldValueViewSet, basename='field-value')
+router.register(r'compliance-summary', ComplianceSummaryViewSet, basename='compliance-summary')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'cache-stats', CacheStatsViewSet, basename='cache-stats')
+router.register(r'_metrics', MetricsViewSet, basename='metrics')
 policy_router = routers.NestedSimpleRouter(router, r'policy', lookup='policy')
 policy_router.register(r'policytemplate', PolicyTemplateViewSet, basename='policy-template')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/v1/async/policy/', async_views.policy_list),
+    path('api/v1/async/policy/<uuid:policy_id>/active-template/', async_views.active_template),
+    path('api/v1/async/users/<uuid:user_id>/pending-acknowledgments/', async_views.pending_acknowledgments),
     path('api/v1/', include(router.urls)),
     path('api/v1/', include(policy_router.urls))
 ]